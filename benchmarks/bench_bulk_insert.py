@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量插入基准 - 旧的逐行 execute 实现 vs bulk_insert / bulk_upsert (executemany + 分块)
+
+用法: python benchmarks/bench_bulk_insert.py [行数 ...]    默认 100000 1000000
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import DatabaseManager
+
+
+COLUMNS = {"name": "TEXT", "score": "INTEGER", "price": "REAL"}
+
+
+def generate_rows(n: int):
+    """生成器形式的数据源，不一次性占用内存"""
+    for i in range(n):
+        yield {"name": f"item-{i}", "score": i % 997, "price": i * 0.01}
+
+
+def legacy_bulk_insert(db: DatabaseManager, table_name: str, data_list):
+    """旧实现：逐行 cursor.execute，每行重建参数元组"""
+    columns = ', '.join(data_list[0].keys())
+    placeholders = ', '.join(['?' for _ in data_list[0].keys()])
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        for data in data_list:
+            values = list(data.values())
+            cursor.execute(f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", tuple(values))
+
+
+def open_db(tmp: str, name: str) -> DatabaseManager:
+    DatabaseManager._instance = None
+    db = DatabaseManager(os.path.join(tmp, name))
+    db.ensure_table("bench", COLUMNS)
+    db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_bench_name ON bench (name)")
+    return db
+
+
+def run(n: int, tmp: str):
+    print(f"--- {n} 行 ---")
+
+    db = open_db(tmp, f"legacy_{n}.db")
+    start = time.perf_counter()
+    legacy_bulk_insert(db, "bench", list(generate_rows(n)))
+    legacy = time.perf_counter() - start
+    db.close()
+    print(f"旧实现 (execute 循环)   {legacy:8.2f}s  {n / legacy:>10.0f} 行/秒")
+
+    db = open_db(tmp, f"bulk_{n}.db")
+    result = db.bulk_insert("bench", generate_rows(n))
+    print(f"bulk_insert (生成器)    {result['elapsed']:8.2f}s  {result['rows'] / result['elapsed']:>10.0f} 行/秒"
+          f"  ({legacy / result['elapsed']:.2f}x)")
+
+    result = db.bulk_upsert("bench", generate_rows(n), conflict_cols=["name"])
+    print(f"bulk_upsert (全部冲突)  {result['elapsed']:8.2f}s  {result['rows'] / result['elapsed']:>10.0f} 行/秒")
+    db.close()
+    DatabaseManager._instance = None
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            run(n, tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+插件冷启动对比 - 启动时导入并实例化全部插件 vs 只读元数据、首次打开标签页时加载
+
+为 1/10/50 个合成插件（与汇率K线插件一样在模块顶层导入 matplotlib/numpy 并创建图表）
+各启动一个全新的 Python 进程，测量从进程启动到主窗口首次绘制的耗时。
+需要 PyQt6 和 matplotlib；无显示环境时自动使用 offscreen 平台。
+
+用法: python benchmarks/bench_plugin_startup.py [重复次数]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLUGIN_TEMPLATE = '''
+from core.plugin_system import BasePlugin
+from PyQt6.QtWidgets import QWidget, QVBoxLayout
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+import numpy as np
+
+
+class BenchPlugin{index}(BasePlugin):
+    PLUGIN_ID = "bench_plugin_{index}"
+    PLUGIN_NAME = "基准插件{index}"
+    PLUGIN_VERSION = "1.0.0"
+    PLUGIN_DESCRIPTION = "冷启动基准用的合成插件"
+
+    def __init__(self, db, main_window):
+        super().__init__(db, main_window)
+        self.ensure_table("bench_plugin_{index}_data", {{"value": "REAL"}})
+        self._widget = QWidget()
+        layout = QVBoxLayout(self._widget)
+        figure = Figure(figsize=(4, 3))
+        figure.add_subplot(111).plot(np.arange(100), np.random.rand(100))
+        layout.addWidget(FigureCanvas(figure))
+
+    def get_ui(self):
+        return self._widget
+'''
+
+# 子进程：创建主窗口，首次绘制时输出时间戳并退出
+CHILD = '''
+import sys, time
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {tmp!r})
+from PyQt6.QtCore import QEvent, QObject
+from PyQt6.QtWidgets import QApplication
+from core.database import DatabaseManager
+from core.main_window import MainWindow
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            print(time.time(), flush=True)
+            app.quit()
+        return False
+
+app = QApplication(sys.argv)
+DatabaseManager({db!r})
+window = MainWindow()
+if {eager!r}:
+    # 旧行为：显示窗口前导入并实例化全部插件
+    for index in range(window.tab_widget.count()):
+        window._on_tab_changed(index)
+paint_filter = FirstPaint()
+window.installEventFilter(paint_filter)
+window.show()
+app.exec()
+'''
+
+
+def make_plugins(tmp: str, count: int) -> str:
+    plugins_dir = os.path.join(tmp, "plugins")
+    os.makedirs(plugins_dir)
+    for index in range(count):
+        plugin_dir = os.path.join(plugins_dir, f"bench_plugin_{index}")
+        os.makedirs(plugin_dir)
+        with open(os.path.join(plugin_dir, "__init__.py"), "w", encoding="utf-8") as f:
+            f.write(PLUGIN_TEMPLATE.format(index=index))
+    return plugins_dir
+
+
+def first_paint(tmp: str, plugins_dir: str, eager: bool) -> float:
+    """启动子进程，返回进程启动到首次绘制的秒数"""
+    db_path = os.path.join(tmp, "bench.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    code = CHILD.format(root=ROOT, tmp=tmp, db=db_path, eager=eager)
+    env = dict(os.environ, MHTOOLS_PLUGINS_DIR=plugins_dir)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    start = time.time()
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                            check=True).stdout
+    return float(output.strip().splitlines()[-1]) - start
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    print(f"冷启动到首次绘制（单位: 毫秒，{repeat} 次取最小值）")
+    print(f"{'插件数':<8}{'全部导入':>12}{'延迟加载':>12}")
+    for count in (1, 10, 50):
+        with tempfile.TemporaryDirectory() as tmp:
+            plugins_dir = make_plugins(tmp, count)
+            eager = min(first_paint(tmp, plugins_dir, True) for _ in range(repeat))
+            lazy = min(first_paint(tmp, plugins_dir, False) for _ in range(repeat))
+        print(f"{count:<8}{eager * 1000:>12.0f}{lazy * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
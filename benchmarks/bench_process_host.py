@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+计算进程宿主测试 - 计算密集的指标计算放在线程中与放在进程池中时界面线程的卡顿
+
+界面线程用心跳模拟：每 5ms 醒来一次，记录实际间隔。计算持有 GIL 时心跳被推迟，
+最大间隔即界面的最长卡顿。另外对比大数组参数经 pickle 与经共享内存传给子进程的耗时。
+
+用法: python benchmarks/bench_process_host.py [分钟数据年数]
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import process_host
+from core.process_host import ProcessHost
+
+
+HEARTBEAT_INTERVAL = 0.005
+TASKS = 4
+
+
+def indicators(closes, span=30):
+    """EMA（逐点 Python 循环，持有 GIL）+ 滚动标准差"""
+    alpha = 2.0 / (span + 1)
+    ema = np.empty(len(closes))
+    value = float(closes[0])
+    for i, price in enumerate(closes.tolist()):
+        value += alpha * (price - value)
+        ema[i] = value
+    windows = np.lib.stride_tricks.sliding_window_view(closes, span)
+    return ema, windows.std(axis=1)
+
+
+def last(array):
+    """只读取最后一个元素，用于测量参数传输开销"""
+    return float(array[-1])
+
+
+def _heartbeat(stop, gaps):
+    previous = time.perf_counter()
+    while not stop.is_set():
+        time.sleep(HEARTBEAT_INTERVAL)
+        now = time.perf_counter()
+        gaps.append(now - previous - HEARTBEAT_INTERVAL)
+        previous = now
+
+
+def _run(submit, closes):
+    """提交 TASKS 个计算，返回 (总耗时, 最大卡顿, p99 卡顿)"""
+    stop = threading.Event()
+    gaps = []
+    beat = threading.Thread(target=_heartbeat, args=(stop, gaps))
+    beat.start()
+    start = time.perf_counter()
+    futures = [submit(indicators, closes) for _ in range(TASKS)]
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    beat.join()
+    gaps.sort()
+    return elapsed, gaps[-1], gaps[int(len(gaps) * 0.99)]
+
+
+def main():
+    years = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    points = int(years * 365 * 24 * 60)
+    closes = 7.2 + np.cumsum(np.random.default_rng(0).normal(0, 0.001, points))
+    print(f"{TASKS} 个指标计算，每个 {points} 个分钟收盘价（{years:g} 年）\n")
+
+    host = ProcessHost()
+    host.submit(last, [0]).result()   # 预先启动进程池
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = {"线程": _run(executor.submit, closes)}
+    results["进程池"] = _run(host.submit, closes)
+
+    print(f"{'方式':<8}{'总耗时':>10}{'最大卡顿':>12}{'p99卡顿':>12}")
+    for name, (elapsed, worst, p99) in results.items():
+        print(f"{name:<8}{elapsed:>9.2f}s{worst * 1000:>10.1f}ms{p99 * 1000:>10.1f}ms")
+
+    # 大数组参数：pickle vs 共享内存
+    print(f"\n{closes.nbytes / 1024 / 1024:.0f}MB 数组参数传给子进程")
+    for name, threshold in (("pickle", float("inf")), ("共享内存", process_host.SHARED_MEMORY_MIN_BYTES)):
+        process_host.SHARED_MEMORY_MIN_BYTES = threshold
+        start = time.perf_counter()
+        for _ in range(5):
+            host.submit(last, closes).result()
+        print(f"  {name:<8}{(time.perf_counter() - start) / 5 * 1000:>8.1f}ms")
+
+    host.shutdown()
+
+
+if __name__ == "__main__":
+    main()
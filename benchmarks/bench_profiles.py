@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能档位对比 - safe / balanced / fast 下的写入与读取吞吐
+
+合成数据集：逐条自动提交写入（受 synchronous 影响最大）、事务内批量写入、
+按索引的点查询和带排序的范围扫描（受 cache_size / mmap_size / temp_store 影响）
+
+用法: python benchmarks/bench_profiles.py [行数]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import DatabaseManager, PERFORMANCE_PROFILES
+
+
+def run_profile(profile: str, rows: int, tmp: str) -> dict:
+    DatabaseManager._instance = None
+    db = DatabaseManager(os.path.join(tmp, f"{profile}.db"), profile=profile)
+    db.ensure_table("bench", {"name": "TEXT", "category": "INTEGER", "price": "REAL"})
+    db.ensure_index("bench", ["category", "price"])
+    rng = random.Random(42)
+    result = {}
+
+    # 自动提交的单条写入：每条一个事务
+    single = max(rows // 50, 100)
+    start = time.perf_counter()
+    for i in range(single):
+        db.insert("bench", {"name": f"s{i}", "category": i % 100, "price": rng.random()})
+    result["single_write"] = single / (time.perf_counter() - start)
+
+    # 批量写入
+    data = [{"name": f"n{i}", "category": i % 100, "price": rng.random()} for i in range(rows)]
+    start = time.perf_counter()
+    db.bulk_insert("bench", data)
+    result["bulk_write"] = rows / (time.perf_counter() - start)
+
+    # 点查询
+    total = db.count("bench")
+    lookups = max(rows // 10, 1000)
+    ids = [rng.randint(1, total) for _ in range(lookups)]
+    start = time.perf_counter()
+    for row_id in ids:
+        db.select_one("bench", where="id = ?", where_params=(row_id,))
+    result["point_read"] = lookups / (time.perf_counter() - start)
+
+    # 范围扫描 + 排序（排序需要临时 B 树）
+    scans = 50
+    start = time.perf_counter()
+    scanned = 0
+    for i in range(scans):
+        scanned += len(db.select("bench", where="category = ?", where_params=(i,), order_by="name"))
+    result["range_read"] = scanned / (time.perf_counter() - start)
+
+    db.close()
+    DatabaseManager._instance = None
+    return result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    labels = {
+        "single_write": "单条写入",
+        "bulk_write": "批量写入",
+        "point_read": "点查询",
+        "range_read": "范围扫描",
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {profile: run_profile(profile, rows, tmp) for profile in PERFORMANCE_PROFILES}
+
+    print(f"行数: {rows}（单位: 行/秒）")
+    print(f"{'':<10}" + "".join(f"{profile:>14}" for profile in results))
+    for key, label in labels.items():
+        print(f"{label:<8}" + "".join(f"{results[profile][key]:>14,.0f}" for profile in results))
+
+
+if __name__ == "__main__":
+    main()
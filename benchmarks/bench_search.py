@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全局搜索对比 - FTS5 全文索引 vs 各插件自行 LIKE '%x%' 扫描
+
+合成物品表（名称 + 备注），分别统计建索引耗时、罕见词/常见词/多词查询的平均耗时
+
+用法: python benchmarks/bench_search.py [行数]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import DatabaseManager
+
+WORDS = ["强化石", "宝石", "金币", "符文", "灵石", "药品", "宝箱", "铁矿", "兽决", "内丹"] + \
+        [f"材料{i:04d}" for i in range(5000)]
+
+
+def like_search(db: DatabaseManager, query: str, limit: int = 20):
+    """旧做法：每个词对每一列做 LIKE 子串匹配"""
+    conditions, params = [], []
+    for term in query.split():
+        conditions.append("(name LIKE ? OR note LIKE ?)")
+        params += [f"%{term}%", f"%{term}%"]
+    return db.select("items", "id, name", where=" AND ".join(conditions), where_params=tuple(params),
+                     limit=limit)
+
+
+def timed(fn, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = random.Random(42)
+    queries = {
+        "罕见词": "材料4321",
+        "常见词": "宝石",
+        "多词": "强化石 内丹",
+        "不存在": "不存在的物品",
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        DatabaseManager._instance = None
+        db = DatabaseManager(os.path.join(tmp, "bench.db"))
+        db.ensure_table("items", {"name": "TEXT", "note": "TEXT"})
+        db.bulk_insert("items", [
+            {"name": f"物品{i}", "note": " ".join(rng.choice(WORDS) for _ in range(6))}
+            for i in range(rows)
+        ])
+
+        start = time.perf_counter()
+        db.search.register_table("items", ["name", "note"])
+        build = time.perf_counter() - start
+
+        print(f"行数: {rows}，建索引 {build:.2f}s（单位: 毫秒/次）")
+        print(f"{'':<10}{'LIKE 扫描':>12}{'FTS5':>12}")
+        for label, query in queries.items():
+            like_ms = timed(lambda: like_search(db, query), repeat=5)
+            fts_ms = timed(lambda: db.search.search(query))
+            print(f"{label:<10}{like_ms:>12.2f}{fts_ms:>12.2f}")
+
+        db.close()
+        DatabaseManager._instance = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数值列读取对比 - select + 列表推导 + np.array vs select_columns 直接返回数组
+
+统计耗时和 tracemalloc 记录的峰值内存（需要安装 NumPy）
+
+用法: python benchmarks/bench_select_columns.py [行数]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import DatabaseManager
+
+COLUMNS = ["ts", "price", "qty"]
+DTYPES = {"ts": "i8", "price": "f8", "qty": "i8"}
+
+
+def via_rows(db: DatabaseManager) -> dict:
+    """旧写法：取出 Row 列表，再逐列推导成 list 并转数组"""
+    rows = db.select("bench", ", ".join(COLUMNS), order_by="ts")
+    return {name: np.array([row[name] for row in rows], dtype=DTYPES[name]) for name in COLUMNS}
+
+
+def via_columns(db: DatabaseManager) -> dict:
+    return db.select_columns("bench", COLUMNS, order_by="ts", dtypes=DTYPES)
+
+
+def measure(fn, db: DatabaseManager, repeat: int = 3):
+    """返回 (最快耗时, 峰值内存字节)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(db)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(db)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        DatabaseManager._instance = None
+        db = DatabaseManager(os.path.join(tmp, "bench.db"))
+        db.ensure_table("bench", {"ts": "INTEGER", "price": "REAL", "qty": "INTEGER"})
+        db.ensure_index("bench", ["ts"])
+        rng = random.Random(42)
+        db.bulk_insert("bench", [{"ts": i, "price": rng.uniform(6.8, 7.6), "qty": rng.randint(1, 100)}
+                                 for i in range(rows)])
+
+        expected = via_rows(db)
+        got = via_columns(db)
+        assert all(np.array_equal(expected[name], got[name]) for name in COLUMNS)
+
+        results = {
+            "select + 列表推导": measure(via_rows, db),
+            "select_columns": measure(via_columns, db),
+        }
+        db.close()
+        DatabaseManager._instance = None
+
+    print(f"行数: {rows}，列: {', '.join(COLUMNS)}")
+    print(f"{'':<18}{'耗时(ms)':>12}{'峰值内存(MB)':>16}")
+    for label, (elapsed, peak) in results.items():
+        print(f"{label:<18}{elapsed * 1000:>12.1f}{peak / 1024 / 1024:>16.1f}")
+    base, new = results["select + 列表推导"], results["select_columns"]
+    print(f"加速 {base[0] / new[0]:.2f}x，内存 {new[1] / base[1]:.0%}")
+
+
+if __name__ == "__main__":
+    main()
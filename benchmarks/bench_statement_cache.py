@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单行增查微基准 - 每次拼接 SQL 的旧实现 vs 语句缓存后的 insert/select
+
+用法: python benchmarks/bench_statement_cache.py [循环次数]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import DatabaseManager
+
+
+def legacy_insert(db: DatabaseManager, table_name: str, data: dict) -> int:
+    """旧实现：每次调用重新拼接 INSERT"""
+    columns = ', '.join(data.keys())
+    placeholders = ', '.join(['?' for _ in data.keys()])
+    values = list(data.values())
+    return db.execute(f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", tuple(values)).lastrowid
+
+
+def legacy_select(db: DatabaseManager, table_name: str, columns: str = "*", where: str = None,
+                  where_params: tuple = (), order_by: str = None, limit: int = None):
+    """旧实现：每次调用重新拼接 SELECT，LIMIT 直接写入 SQL 文本"""
+    query = f"SELECT {columns} FROM {table_name}"
+    if where:
+        query += f" WHERE {where}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    if limit:
+        query += f" LIMIT {limit}"
+    return db.fetch_all(query, where_params)
+
+
+def timed(label: str, n: int, fn) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / n * 1e6
+    print(f"{label:<28} {per_call:8.2f} µs/次")
+    return per_call
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        DatabaseManager._instance = None
+        db = DatabaseManager(os.path.join(tmp, "bench.db"))
+        db.ensure_table("bench", {"name": "TEXT", "score": "INTEGER", "price": "REAL"})
+
+        def row(i):
+            return {"name": f"n{i}", "score": i, "price": i * 0.5}
+
+        # 插入放在事务里，排除 fsync 干扰，只比较每次调用的开销
+        with db.transaction():
+            old_ins = timed("insert (旧: 每次拼接)", n, lambda i: legacy_insert(db, "bench", row(i)))
+            new_ins = timed("insert (语句缓存)", n, lambda i: db.insert("bench", row(i)))
+
+        old_sel = timed("select (旧: 每次拼接)", n, lambda i: legacy_select(
+            db, "bench", where="id = ?", where_params=(i + 1,), limit=i % 5 + 1))
+        new_sel = timed("select (语句缓存)", n, lambda i: db.select(
+            "bench", where="id = ?", where_params=(i + 1,), limit=i % 5 + 1))
+
+        print(f"insert 每次节省 {old_ins - new_ins:.2f} µs, select 每次节省 {old_sel - new_sel:.2f} µs")
+        db.close()
+        DatabaseManager._instance = None
+
+
+if __name__ == "__main__":
+    main()
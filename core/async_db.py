@@ -0,0 +1,188 @@
+"""
+异步数据库接口 - 在专用工作线程中执行数据库操作，避免阻塞 GUI 线程
+"""
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class _ResultDispatcher(QObject):
+    """把工作线程的结果通过信号转发回 GUI 线程"""
+
+    delivered = pyqtSignal(object, object)  # (回调, 参数)
+
+    def __init__(self):
+        super().__init__()
+        # 对象属于创建它的（GUI）线程，跨线程 emit 时自动排队到该线程执行
+        self.delivered.connect(self._dispatch)
+
+    @staticmethod
+    def _dispatch(callback, value):
+        try:
+            callback(value)
+        except Exception as e:
+            print(f"数据库回调执行失败: {e}")
+
+
+class AsyncDatabase:
+    """
+    异步数据库门面
+
+    所有操作在一个专用工作线程上按提交顺序依次执行（使用该线程自己的连接），
+    返回 concurrent.futures.Future；传入 callback/error_callback 时结果会在
+    GUI 线程中回调。必须在 GUI 线程中首次创建。
+
+    示例:
+        async_db.call("select", "rate_history", order_by="date ASC",
+                      callback=self._draw_chart)
+        async_db.submit(self._save_rows, rows)
+    """
+
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self, db_manager=None):
+        if self._initialized:
+            return
+        self._initialized = True
+
+        self.db = db_manager
+        # 单个工作线程保证操作按提交顺序执行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-worker")
+        self._dispatcher = _ResultDispatcher()
+
+    def submit(self, fn: Callable, *args, callback: Callable[[Any], None] = None,
+               error_callback: Callable[[BaseException], None] = None, **kwargs) -> Future:
+        """在工作线程中执行任意函数"""
+        # 带上提交方的上下文（如诊断用的插件归属）
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, fn, *args, **kwargs)
+        return self.deliver(future, callback, error_callback)
+
+    def deliver(self, future: Future, callback: Callable[[Any], None] = None,
+                error_callback: Callable[[BaseException], None] = None) -> Future:
+        """把其他执行器（如计算进程池）的 Future 结果同样回调到 GUI 线程"""
+        future.add_done_callback(lambda f: self._on_done(f, callback, error_callback))
+        return future
+
+    def call(self, method: str, *args, callback: Callable[[Any], None] = None,
+             error_callback: Callable[[BaseException], None] = None, **kwargs) -> Future:
+        """在工作线程中调用 DatabaseManager 的方法"""
+        return self.submit(getattr(self.db, method), *args,
+                           callback=callback, error_callback=error_callback, **kwargs)
+
+    def _on_done(self, future: Future, callback: Optional[Callable], error_callback: Optional[Callable]):
+        """工作线程中执行 - 把结果/异常交给 GUI 线程"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            if error_callback:
+                self._dispatcher.delivered.emit(error_callback, error)
+            else:
+                print(f"异步数据库操作失败: {error}")
+        elif callback:
+            self._dispatcher.delivered.emit(callback, future.result())
+
+    def shutdown(self, wait: bool = True):
+        """停止工作线程（等待已提交的操作完成）"""
+        self._executor.shutdown(wait=wait)
+        AsyncDatabase._instance = None
+
+
+class ChangeNotifier(QObject):
+    """
+    把数据库变更事件（core.events.ChangeEvent）转到 GUI 线程
+
+    subscribe() 的回调和 changed 信号都在 GUI 线程中触发，可以直接更新界面。
+    只有被关注（watch/subscribe）的表才会发布事件，其余表的写入不收集 rowid；
+    表的最后一个订阅者取消后不再关注该表。必须在 GUI 线程中创建和调用。
+    """
+
+    changed = pyqtSignal(object)    # ChangeEvent
+
+    def __init__(self, db_manager):
+        super().__init__()
+        self.db = db_manager
+        self._dispatcher = _ResultDispatcher()
+        # {表名: 取消总线订阅的函数}，None 表示全部表
+        self._watched: Dict[Optional[str], Callable[[], None]] = {}
+        # {表名: 关注计数}，watch() 和每个 subscribe() 各计一次
+        self._watch_counts: Dict[Optional[str], int] = {}
+        self._subscribers: List[Tuple[Optional[str], Callable]] = []
+
+    def watch(self, table: str = None):
+        """让 changed 信号包含该表（None 为全部表）的事件，持续到 close()"""
+        self._acquire(table)
+
+    def _acquire(self, table: Optional[str]):
+        self._watch_counts[table] = self._watch_counts.get(table, 0) + 1
+        self._sync_bus()
+
+    def _release(self, table: Optional[str]):
+        count = self._watch_counts.get(table, 0) - 1
+        if count > 0:
+            self._watch_counts[table] = count
+        else:
+            self._watch_counts.pop(table, None)
+        self._sync_bus()
+
+    def _sync_bus(self):
+        """按关注计数调整总线订阅；关注全部表时只保留一个全表订阅，避免事件重复"""
+        if None in self._watch_counts:
+            wanted = {None}
+        else:
+            wanted = set(self._watch_counts)
+        for table in [table for table in self._watched if table not in wanted]:
+            self._watched.pop(table)()
+        for table in wanted:
+            if table not in self._watched:
+                self._watched[table] = self.db.changes.subscribe(self._relay, table)
+
+    def subscribe(self, callback: Callable, table: str = None) -> Callable[[], None]:
+        """
+        订阅变更，callback(event) 在 GUI 线程中调用
+
+        Returns:
+            取消订阅的函数
+        """
+        self._acquire(table)
+        entry = (table, callback)
+        self._subscribers.append(entry)
+
+        def unsubscribe():
+            # 按身份查找，同一回调重复订阅时只取消这一次
+            for i, existing in enumerate(self._subscribers):
+                if existing is entry:
+                    del self._subscribers[i]
+                    self._release(table)
+                    return
+        return unsubscribe
+
+    def _relay(self, event):
+        """写入线程中执行 - 转交 GUI 线程"""
+        self._dispatcher.delivered.emit(self._deliver, event)
+
+    def _deliver(self, event):
+        self.changed.emit(event)
+        for table, callback in list(self._subscribers):
+            if table is None or table == event.table:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"变更通知回调执行失败: {e}")
+
+    def close(self):
+        """取消所有总线订阅"""
+        for unsubscribe in self._watched.values():
+            unsubscribe()
+        self._watched.clear()
+        self._watch_counts.clear()
+        self._subscribers.clear()
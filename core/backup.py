@@ -0,0 +1,469 @@
+"""
+数据库备份与恢复 - 基于 SQLite 在线备份 API
+
+按页分步复制，期间其他连接仍可读写，得到的是一致的快照而不是半写入的文件。
+文件名以 .gz 结尾时使用 gzip 压缩；恢复时自动识别压缩格式。
+
+增量备份：完整备份会开启一条备份链并启用变更跟踪（见 DatabaseManager.enable_change_tracking），
+之后的增量备份只写出上次备份以来变化的行。恢复时先恢复完整备份，再按顺序重放增量。
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .database import BACKUP_STATE_TABLE, CHANGELOG_TABLE, SEARCH_SOURCES_TABLE, UNTRACKED_TABLES
+
+# 每步复制的页数
+BACKUP_STEP_PAGES = 256
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_SQLITE_MAGIC = b"SQLite format 3\x00"
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class BackupCancelled(Exception):
+    """备份/恢复被取消"""
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _make_progress(progress: Optional[ProgressCallback], cancel_event: Optional[threading.Event]):
+    """把 (已完成页数, 总页数) 进度回调和取消检查包装成 sqlite3 的 progress 回调"""
+    def on_progress(status, remaining, total):
+        if cancel_event is not None and cancel_event.is_set():
+            # 在回调中抛出异常会中止 backup()
+            raise BackupCancelled()
+        if progress:
+            progress(total - remaining, total)
+    return on_progress
+
+
+def is_compressed(path: str) -> bool:
+    """文件是否为 gzip 压缩"""
+    with open(path, "rb") as f:
+        return f.read(2) == _GZIP_MAGIC
+
+
+@contextmanager
+def _plain_file(path: str):
+    """得到未压缩的数据库文件路径，压缩文件解压到临时文件"""
+    if not is_compressed(path):
+        yield path
+        return
+    fd, tmp_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with gzip.open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        yield tmp_path
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _finish_file(tmp_path: str, dest_path: str, compress: bool):
+    """把临时文件移动（或压缩）到目标位置"""
+    if compress:
+        with open(tmp_path, "rb") as src, gzip.open(dest_path, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, dest_path)
+
+
+# ==================== 备份链状态 ====================
+
+def _read_chain_state(db) -> Dict[str, str]:
+    """读取当前数据库的备份链状态 {chain_id, last_seq, ...}"""
+    if not db.get_table_schema(BACKUP_STATE_TABLE):
+        return {}
+    return {row['key']: row['value'] for row in db.fetch_all(f"SELECT key, value FROM {BACKUP_STATE_TABLE}")}
+
+
+def _store_chain_state(conn: sqlite3.Connection, state: Dict[str, str]):
+    """在 conn 的当前事务中写入备份链状态"""
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {BACKUP_STATE_TABLE} (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute(f"DELETE FROM {BACKUP_STATE_TABLE}")
+    conn.executemany(f"INSERT INTO {BACKUP_STATE_TABLE} (key, value) VALUES (?, ?)",
+                     [(k, str(v)) for k, v in state.items()])
+
+
+def _write_chain_state(db, state: Dict[str, str]):
+    with db.transaction() as conn:
+        _store_chain_state(conn, state)
+    db._refresh_table_schema(BACKUP_STATE_TABLE)
+
+
+def _new_chain(db) -> Dict[str, str]:
+    """
+    新备份链的状态：启用变更跟踪，记录当前变更日志序号作为增量起点
+
+    记录序号后、快照前的写入会同时出现在完整备份和下一次增量中，重放是幂等的，不影响结果
+    """
+    db.enable_change_tracking()
+    return {
+        'chain_id': uuid.uuid4().hex,
+        'last_seq': db.get_changelog_seq(),
+        'created_at': datetime.now().isoformat(),
+    }
+
+
+def _commit_chain(db, state: Dict[str, str]):
+    """完整备份文件已写好 - 当前数据库切换到新备份链，删除已包含在完整备份中的变更日志"""
+    _write_chain_state(db, state)
+    db.prune_changelog(int(state['last_seq']))
+
+
+def _read_file_chain_state(conn: sqlite3.Connection) -> Dict[str, str]:
+    """读取备份文件中的备份链状态"""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (BACKUP_STATE_TABLE,)).fetchone():
+        return {}
+    return dict(conn.execute(f"SELECT key, value FROM {BACKUP_STATE_TABLE}").fetchall())
+
+
+def _reset_chain(db):
+    """恢复后的数据库不再属于原备份链，需要新的完整备份才能继续增量"""
+    _write_chain_state(db, {})
+    db.prune_changelog()
+
+
+def backup_database(db, dest_path: str, compress: bool = None,
+                    progress: ProgressCallback = None, cancel_event: threading.Event = None,
+                    pages: int = BACKUP_STEP_PAGES) -> str:
+    """
+    在线备份数据库到 dest_path，同时开启新的增量备份链
+
+    Args:
+        db: DatabaseManager 实例
+        compress: 是否 gzip 压缩，None 时按 dest_path 是否以 .gz 结尾决定
+        progress: 进度回调 progress(已复制页数, 总页数)，在调用线程中执行
+        cancel_event: 置位后中止备份并抛出 BackupCancelled，不会留下不完整的文件
+
+    Returns:
+        dest_path
+    """
+    if compress is None:
+        compress = dest_path.endswith(".gz")
+
+    # 先提交挂起的组提交写入，使其包含在备份中
+    db.flush()
+
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=dest_dir)
+    os.close(fd)
+    try:
+        # 新备份链的状态只写入备份文件；备份失败或取消时当前数据库仍属于原备份链
+        state = _new_chain(db)
+        target = sqlite3.connect(tmp_path)
+        try:
+            with db.get_connection() as source:
+                source.backup(target, pages=pages, progress=_make_progress(progress, cancel_event))
+            with target:
+                _store_chain_state(target, state)
+                target.execute(f"DELETE FROM {CHANGELOG_TABLE}")
+        finally:
+            target.close()
+
+        _finish_file(tmp_path, dest_path, compress)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    _commit_chain(db, state)
+    return dest_path
+
+
+def incremental_backup(db, dest_path: str, compress: bool = None,
+                       progress: ProgressCallback = None, cancel_event: threading.Event = None) -> str:
+    """
+    增量备份：只写出上次（完整或增量）备份以来变化的行
+
+    文件本身是一个 SQLite 数据库：_backup_meta 记录所属备份链和变更日志序号区间，
+    每个变化的表一张同名表（含 __rowid__ 列），_backup_deleted 记录被删除的行。
+    新建或新开始跟踪的表、WITHOUT ROWID 表整表写出。
+
+    Raises:
+        ValueError: 当前数据库还没有完整备份（没有备份链）
+    """
+    if compress is None:
+        compress = dest_path.endswith(".gz")
+
+    db.flush()
+    # 绕过 ensure_table 创建的新表在快照前补装触发器，本次整表写出
+    db.enable_change_tracking()
+    state = _read_chain_state(db)
+    if not state.get('chain_id'):
+        raise ValueError("尚未进行完整备份，无法进行增量备份")
+    seq_from = int(state['last_seq'])
+
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=dest_dir)
+    os.close(fd)
+    # 独立连接：ATTACH 不影响线程连接上的表结构查询
+    conn = db._create_connection()
+    try:
+        conn.execute("ATTACH DATABASE ? AS inc", (tmp_path,))
+        conn.execute("BEGIN")
+        # 第一次读取时建立快照，之后的读取都基于同一时刻
+        seq_to = conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {CHANGELOG_TABLE}").fetchone()[0]
+        changes = conn.execute(f'''
+            SELECT table_name, MAX(row_id IS NULL) AS full_copy FROM {CHANGELOG_TABLE}
+            WHERE seq > ? AND seq <= ? GROUP BY table_name
+        ''', (seq_from, seq_to)).fetchall()
+        table_sql = {row['name']: row['sql'] for row in conn.execute(
+            "SELECT name, sql FROM main.sqlite_master WHERE type = 'table'")}
+
+        conn.execute("CREATE TABLE inc._backup_meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE inc._backup_tables (name TEXT PRIMARY KEY, sql TEXT, full_copy INTEGER)")
+        conn.execute("CREATE TABLE inc._backup_indexes (name TEXT PRIMARY KEY, tbl_name TEXT, sql TEXT)")
+        conn.execute("CREATE TABLE inc._backup_deleted (table_name TEXT, row_id INTEGER)")
+        # 快照时存在的全部表，恢复时删除不在其中的表
+        conn.execute("CREATE TABLE inc._backup_table_list (name TEXT PRIMARY KEY)")
+        conn.executemany("INSERT INTO inc._backup_table_list (name) VALUES (?)",
+                         [(name,) for name in table_sql if not name.startswith("sqlite_")])
+
+        for i, change in enumerate(changes):
+            if cancel_event is not None and cancel_event.is_set():
+                raise BackupCancelled()
+            table_name, full_copy = change['table_name'], change['full_copy']
+            sql = table_sql.get(table_name)
+            if sql is None:
+                # 表已被删除，由 _backup_table_list 体现
+                continue
+
+            quoted = _quote(table_name)
+            without_rowid = "WITHOUT ROWID" in sql.upper()
+            conn.execute("INSERT INTO inc._backup_tables VALUES (?, ?, ?)", (table_name, sql, full_copy))
+            conn.execute('''
+                INSERT INTO inc._backup_indexes SELECT name, tbl_name, sql FROM main.sqlite_master
+                WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+            ''', (table_name,))
+            if full_copy:
+                rowid = "" if without_rowid else "rowid AS __rowid__, "
+                conn.execute(f"CREATE TABLE inc.{quoted} AS SELECT {rowid}* FROM main.{quoted}")
+            else:
+                changed = f"SELECT row_id FROM {CHANGELOG_TABLE} WHERE table_name = ? AND seq > ? AND seq <= ?"
+                args = (table_name, seq_from, seq_to)
+                conn.execute(f"CREATE TABLE inc.{quoted} AS SELECT rowid AS __rowid__, * FROM main.{quoted} "
+                             f"WHERE rowid IN ({changed})", args)
+                conn.execute(f"INSERT INTO inc._backup_deleted SELECT DISTINCT ?, row_id FROM {CHANGELOG_TABLE} "
+                             f"WHERE table_name = ? AND seq > ? AND seq <= ? "
+                             f"AND row_id NOT IN (SELECT rowid FROM main.{quoted})", (table_name,) + args)
+            if progress:
+                progress(i + 1, len(changes))
+
+        conn.executemany("INSERT INTO inc._backup_meta (key, value) VALUES (?, ?)", [
+            ('kind', 'incremental'),
+            ('chain_id', state['chain_id']),
+            ('seq_from', str(seq_from)),
+            ('seq_to', str(seq_to)),
+            ('created_at', datetime.now().isoformat()),
+        ])
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE inc")
+        conn.close()
+        conn = None
+
+        _finish_file(tmp_path, dest_path, compress)
+    finally:
+        if conn is not None:
+            conn.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    state['last_seq'] = seq_to
+    _write_chain_state(db, state)
+    db.prune_changelog(seq_to)
+    return dest_path
+
+
+def read_backup_info(path: str) -> Optional[Dict[str, str]]:
+    """读取增量备份文件的元数据，完整备份返回 None"""
+    with _plain_file(path) as plain:
+        conn = sqlite3.connect(plain)
+        try:
+            has_meta = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '_backup_meta'").fetchone()
+            if not has_meta:
+                return None
+            return dict(conn.execute("SELECT key, value FROM _backup_meta").fetchall())
+        finally:
+            conn.close()
+
+
+def _apply_increment(db, path: str):
+    """在单个事务中把一个增量文件重放到当前数据库"""
+    conn = db._create_connection()
+    try:
+        conn.execute("ATTACH DATABASE ? AS inc", (path,))
+        conn.execute("BEGIN IMMEDIATE")
+        dropped = conn.execute('''
+            SELECT name FROM main.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\'
+            AND name NOT IN (SELECT name FROM inc._backup_table_list)
+        ''').fetchall()
+        for table in dropped:
+            if table['name'] not in UNTRACKED_TABLES:
+                conn.execute(f"DROP TABLE main.{_quote(table['name'])}")
+
+        for table in conn.execute("SELECT name, sql, full_copy FROM inc._backup_tables").fetchall():
+            name, sql, full_copy = table['name'], table['sql'], table['full_copy']
+            quoted = _quote(name)
+            main_cols = conn.execute(f"PRAGMA main.table_info({quoted})").fetchall()
+            if not main_cols:
+                conn.execute(sql)
+                main_cols = conn.execute(f"PRAGMA main.table_info({quoted})").fetchall()
+            existing = {col['name'] for col in main_cols}
+            inc_cols = [col for col in conn.execute(f"PRAGMA inc.table_info({quoted})").fetchall()
+                        if col['name'] != '__rowid__']
+            for col in inc_cols:
+                if col['name'] not in existing:
+                    conn.execute(f"ALTER TABLE main.{quoted} ADD COLUMN {_quote(col['name'])} {col['type']}")
+
+            columns = [_quote(col['name']) for col in inc_cols]
+            select_cols = list(columns)
+            has_rowid = any(col['name'] == '__rowid__'
+                            for col in conn.execute(f"PRAGMA inc.table_info({quoted})"))
+            pk_cols = [col for col in main_cols if col['pk']]
+            # INTEGER PRIMARY KEY 列就是 rowid，不能再单独指定 rowid
+            rowid_alias = len(pk_cols) == 1 and pk_cols[0]['type'].upper() == "INTEGER"
+            if has_rowid and not rowid_alias:
+                columns.append("rowid")
+                select_cols.append("__rowid__")
+
+            if full_copy:
+                conn.execute(f"DELETE FROM main.{quoted}")
+            else:
+                conn.execute(f"DELETE FROM main.{quoted} WHERE rowid IN "
+                             f"(SELECT row_id FROM inc._backup_deleted WHERE table_name = ?)", (name,))
+            conn.execute(f"INSERT OR REPLACE INTO main.{quoted} ({', '.join(columns)}) "
+                         f"SELECT {', '.join(select_cols)} FROM inc.{quoted}")
+
+        for index in conn.execute("SELECT name, sql FROM inc._backup_indexes").fetchall():
+            exists = conn.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'index' AND name = ?",
+                                  (index['name'],)).fetchone()
+            if not exists:
+                conn.execute(index['sql'])
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE inc")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _check_increments(state: Dict[str, str], paths: Sequence[str]) -> List[str]:
+    """
+    校验增量文件属于完整备份的备份链（state 为完整备份中的备份链状态）且首尾相接
+
+    Returns:
+        按重放顺序排列的增量文件
+    """
+    if not state.get('chain_id'):
+        raise ValueError("完整备份不包含备份链信息，无法应用增量备份")
+
+    infos = []
+    for path in paths:
+        info = read_backup_info(path)
+        if info is None or info.get('kind') != 'incremental':
+            raise ValueError(f"不是增量备份文件: {os.path.basename(path)}")
+        if info['chain_id'] != state['chain_id']:
+            raise ValueError(f"增量备份不属于该完整备份: {os.path.basename(path)}")
+        infos.append((int(info['seq_from']), int(info['seq_to']), path))
+    infos.sort()
+
+    last_seq = int(state['last_seq'])
+    for seq_from, seq_to, path in infos:
+        if seq_from != last_seq:
+            raise ValueError("增量备份不连续，缺少中间的增量文件")
+        last_seq = seq_to
+    return [path for _, _, path in infos]
+
+
+def _restore_increments(db, paths: Sequence[str], progress: Optional[ProgressCallback],
+                        cancel_event: Optional[threading.Event]):
+    """按顺序重放已校验的增量文件"""
+    for i, path in enumerate(paths):
+        if cancel_event is not None and cancel_event.is_set():
+            raise BackupCancelled()
+        with _plain_file(path) as plain:
+            _apply_increment(db, plain)
+        if progress:
+            progress(i + 1, len(paths))
+
+
+def restore_database(db, src_path: str, progress: ProgressCallback = None,
+                     cancel_event: threading.Event = None, pages: int = BACKUP_STEP_PAGES,
+                     increments: Sequence[str] = ()):
+    """
+    从 backup_database 生成的文件（压缩或未压缩）恢复，覆盖当前数据库内容
+
+    increments: 该完整备份之后的增量备份文件，顺序不限，必须首尾相接；
+        在覆盖当前数据库之前先全部校验，不符合时不改动当前数据库
+    恢复完成后清空读缓存、语句缓存并重新加载表结构注册表，重建全文索引
+    """
+    with _plain_file(src_path) as plain:
+        with open(plain, "rb") as f:
+            if f.read(len(_SQLITE_MAGIC)) != _SQLITE_MAGIC:
+                raise ValueError("不是有效的数据库备份文件")
+
+        source = sqlite3.connect(plain)
+        try:
+            if source.execute("SELECT 1 FROM sqlite_master WHERE name = '_backup_meta'").fetchone():
+                raise ValueError("这是增量备份文件，请同时选择对应的完整备份")
+            if source.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                raise ValueError("备份文件已损坏")
+            if increments:
+                increments = _check_increments(_read_file_chain_state(source), increments)
+            db.flush()
+            with db.get_connection() as target:
+                source.backup(target, pages=pages, progress=_make_progress(progress, cancel_event))
+        finally:
+            source.close()
+
+    db.reload()
+    try:
+        if increments:
+            _restore_increments(db, increments, progress, cancel_event)
+    finally:
+        db.reload()
+        _reset_chain(db)
+        # 全文索引不参与增量备份，按恢复后的数据重建；尚未使用检索时标记为下次登记时重建
+        if db._search is not None:
+            db.search.rebuild_all()
+        elif db.get_table_schema(SEARCH_SOURCES_TABLE):
+            db.execute(f"UPDATE {SEARCH_SOURCES_TABLE} SET signature = NULL")
+
+
+def restore_files(db, paths: Sequence[str], progress: ProgressCallback = None,
+                  cancel_event: threading.Event = None) -> str:
+    """
+    从一组备份文件恢复：其中恰好一个完整备份，其余为它之后的增量备份
+
+    Returns:
+        完整备份的路径
+    """
+    if len(paths) == 1:
+        restore_database(db, paths[0], progress=progress, cancel_event=cancel_event)
+        return paths[0]
+
+    bases: List[str] = []
+    increments: List[str] = []
+    for path in paths:
+        (bases if read_backup_info(path) is None else increments).append(path)
+    if len(bases) != 1:
+        raise ValueError("请选择一个完整备份及其之后的增量备份")
+    restore_database(db, bases[0], progress=progress, cancel_event=cancel_event, increments=increments)
+    return bases[0]
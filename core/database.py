@@ -5,41 +5,488 @@
 import sqlite3
 import json
 import os
-from typing import Any, Dict, List, Optional, Tuple
+import re
+import copy
+import threading
+import time
+import sys
+import itertools
+import operator
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from datetime import datetime
 from contextlib import contextmanager
 
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖，仅 select_columns 使用
+    np = None
+
+from .cache import LRUCache
+from .diagnostics import QueryProfiler, plugin_context
+from .events import ChangeBus, ChangeEvent
+
+# 合法的表名/列名
+_IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+# 索引列定义: 列名 [ASC|DESC]
+_INDEX_COLUMN_RE = re.compile(r'^([A-Za-z_][A-Za-z0-9_]*)(\s+(?:ASC|DESC))?$', re.IGNORECASE)
+# WHERE 子句中的等值条件列 / 范围条件列（查询计划建议用）
+_EQ_COLUMN_RE = re.compile(r'\b([A-Za-z_][A-Za-z0-9_]*)\s*(?:==?|\bIN\b|\bIS\b)', re.IGNORECASE)
+_RANGE_COLUMN_RE = re.compile(r'\b([A-Za-z_][A-Za-z0-9_]*)\s*(?:<=?|>=?|\bBETWEEN\b|\bLIKE\b)', re.IGNORECASE)
+
+# 性能档位 - 连接级 PRAGMA
+# safe: 每次提交都同步到磁盘；balanced: WAL 下 NORMAL 同步（断电可能丢最后几个事务，不会损坏）
+# fast: 不等待磁盘同步，适合可随时重建的数据。journal_mode 都使用 WAL，多线程连接池依赖它
+PERFORMANCE_PROFILES: Dict[str, Dict[str, Any]] = {
+    'safe': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -2000,            # 负数单位为 KiB，约 2MB
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+    },
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,           # 约 16MB
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -64000,           # 约 64MB
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+DEFAULT_PROFILE = 'balanced'
+# 保存所选档位的全局数据键
+PROFILE_SETTING_KEY = 'db_performance_profile'
+
+# 变更日志表（增量备份用）及不参与变更跟踪的表
+CHANGELOG_TABLE = "_system_changelog"
+BACKUP_STATE_TABLE = "_system_backup_state"
+# 全文检索表（FTS5 虚表及其影子表、文档映射、来源登记），属于可重建的派生数据
+SEARCH_TABLE = "_system_search"
+SEARCH_DOCS_TABLE = "_system_search_docs"
+SEARCH_SOURCES_TABLE = "_system_search_sources"
+SEARCH_TABLES = (SEARCH_TABLE, SEARCH_DOCS_TABLE, SEARCH_SOURCES_TABLE) + tuple(
+    f"{SEARCH_TABLE}_{shadow}" for shadow in ('data', 'idx', 'content', 'docsize', 'config'))
+# 插件发现缓存（插件目录 -> 源文件指纹和元数据），可随时重建
+PLUGIN_CACHE_TABLE = "_system_plugin_cache"
+UNTRACKED_TABLES = (CHANGELOG_TABLE, BACKUP_STATE_TABLE, PLUGIN_CACHE_TABLE) + SEARCH_TABLES
+
 
 class DatabaseManager:
     """统一的数据库管理器"""
 
     _instance = None
 
-    def __new__(cls):
+    # 默认忙等待超时（秒） - 写锁被占用时等待而不是立即报 "database is locked"
+    DEFAULT_BUSY_TIMEOUT = 5.0
+
+    # 全局数据/动态数据读缓存的最大条目数
+    CACHE_SIZE = 1024
+
+    # 生成的 SQL 语句缓存上限，超出后整体清空重建
+    STATEMENT_CACHE_SIZE = 2048
+
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._initialized = False
         return cls._instance
 
-    def __init__(self):
+    def __init__(self, db_path: str = None, busy_timeout: float = None, profile: str = None):
         if self._initialized:
             return
         self._initialized = True
 
         # 数据库路径
-        self.db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "game_assistant.db")
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.db_path = db_path or os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), "data", "game_assistant.db"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.busy_timeout = self.DEFAULT_BUSY_TIMEOUT if busy_timeout is None else busy_timeout
+
+        # 连接池 - 每个线程一个连接，WAL 模式下读写互不阻塞
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
+
+        # 性能档位 - 优先级: 参数 > 环境变量 MHTOOLS_DB_PROFILE > 已保存的设置 > 默认
+        # 切换档位时版本号递增，各线程的连接在下次使用时重新应用 PRAGMA
+        explicit_profile = profile or os.environ.get("MHTOOLS_DB_PROFILE")
+        if explicit_profile is not None and explicit_profile not in PERFORMANCE_PROFILES:
+            print(f"未知的数据库性能档位: {explicit_profile}，使用 {DEFAULT_PROFILE}")
+            explicit_profile = None
+        self._profile = explicit_profile or DEFAULT_PROFILE
+        self._profile_version = 0
+
+        # 组提交 - 开启后事务外的写入在定时器到期时一次性提交
+        self._group_commit_interval: Optional[float] = None
+        self._group_pending: set = set()
+        self._group_timer: Optional[threading.Timer] = None
+        self._group_lock = threading.RLock()
+
+        # 全局数据/动态数据的解码值缓存，写入时失效
+        self._cache = LRUCache(self.CACHE_SIZE)
+        # 事务中被写过的缓存键，事务结束（提交或回滚）时再次失效
+        self._dirty_keys: Dict[sqlite3.Connection, set] = {}
+
+        # 通用增删改查生成的 SQL，按 (操作, 表, 列...) 缓存
+        self._sql_cache: Dict[tuple, str] = {}
+
+        # 表结构注册表 {表名: {列名: 类型}} 与各表的结构版本，启动时从数据库加载一次
+        self._schema: Dict[str, Dict[str, str]] = {}
+        self._schema_versions: Dict[str, int] = {}
+
+        # 查询计划顾问（开发模式） - 对 select/count 的查询执行 EXPLAIN QUERY PLAN
+        # 报告全表扫描和临时 B 树排序；环境变量 MHTOOLS_QUERY_ADVISOR=1 开启
+        self.query_advisor = os.environ.get("MHTOOLS_QUERY_ADVISOR") == "1"
+        self._advised_queries: set = set()
+        self._query_advice: List[Dict[str, Any]] = []
 
-        # 连接池
-        self._local = sqlite3.connect(self.db_path, check_same_thread=False)
-        self._local.row_factory = sqlite3.Row
+        # 查询耗时记录（按插件归属），供诊断窗口使用
+        self.profiler = QueryProfiler()
+
+        # 时间序列存储，首次访问 timeseries 时创建
+        self._timeseries = None
+        # 全文检索索引，首次访问 search 时创建
+        self._search = None
+
+        # 变更事件总线；事务内产生的事件暂存，提交后发布
+        self.changes = ChangeBus()
+        self._pending_events: Dict[sqlite3.Connection, List[ChangeEvent]] = {}
 
         # 初始化数据库
         self._init_db()
 
+        if explicit_profile is None:
+            saved = self.get_global_data(PROFILE_SETTING_KEY)
+            if saved in PERFORMANCE_PROFILES and saved != self._profile:
+                self.set_performance_profile(saved, persist=False)
+
+    # ==================== 连接池 ====================
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """为当前线程创建新连接"""
+        is_new = not os.path.exists(self.db_path) or os.path.getsize(self.db_path) == 0
+        # isolation_level=None: 由 transaction() 显式控制事务，事务外每条语句自动提交
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout,
+                               check_same_thread=False, isolation_level=None,
+                               cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        if is_new:
+            # 新数据库启用增量回收，清理过期数据后用 incremental_vacuum 释放空间；
+            # 必须在切换 WAL 和建表之前设置，已有数据库由 reclaim_space 转换
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._apply_profile(conn)
+        return conn
+
+    def _apply_profile(self, conn: sqlite3.Connection):
+        """把当前性能档位的 PRAGMA 应用到连接"""
+        for pragma, value in PERFORMANCE_PROFILES[self._profile].items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """获取当前线程的连接，不存在则创建"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._create_connection()
+            self._local.conn = conn
+            self._local.profile_version = self._profile_version
+            with self._pool_lock:
+                self._connections.append(conn)
+        elif self._local.profile_version != self._profile_version and not conn.in_transaction:
+            # 档位已切换，事务外重新应用（journal_mode 不能在事务中修改）
+            self._local.profile_version = self._profile_version
+            self._apply_profile(conn)
+        return conn
+
+    def get_performance_profile(self) -> str:
+        """当前性能档位名"""
+        return self._profile
+
+    def set_performance_profile(self, name: str, persist: bool = True):
+        """
+        切换性能档位（safe/balanced/fast），已打开的连接在各自线程下次访问数据库时生效
+        persist: 保存到全局数据，下次启动沿用（环境变量 MHTOOLS_DB_PROFILE 优先）
+        """
+        if name not in PERFORMANCE_PROFILES:
+            raise ValueError(f"未知的性能档位: {name!r}，可选 {', '.join(PERFORMANCE_PROFILES)}")
+        self._profile = name
+        self._profile_version += 1
+        if persist:
+            self.set_global_data(PROFILE_SETTING_KEY, name)
+
+    def get_connection_pragmas(self) -> Dict[str, Any]:
+        """当前线程连接实际生效的 PRAGMA 值（诊断用）"""
+        conn = self._get_conn()
+        return {pragma: conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+                for pragma in PERFORMANCE_PROFILES[self._profile]}
+
+    @contextmanager
+    def snapshot(self):
+        """
+        只读快照 - 打开独立的只读连接（mode=ro）并开启读事务，块内看到的是进入时已提交的数据
+
+        WAL 模式下读不阻塞写：长时间的统计/导出可以在工作线程中进行，
+        期间其他线程照常写入，快照看不到这些写入，也看不到未提交的事务。
+        退出时关闭连接；连接只能在创建它的线程中使用
+        示例:
+            with db.snapshot() as conn:
+                rows = conn.execute("SELECT category, SUM(price) FROM trades GROUP BY category").fetchall()
+        """
+        # 组提交中挂起的写入对调用方而言已完成，先提交使快照可见
+        self.flush()
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout,
+                               check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            for pragma in ('cache_size', 'mmap_size', 'temp_store'):
+                conn.execute(f"PRAGMA {pragma}={PERFORMANCE_PROFILES[self._profile][pragma]}")
+            # 读事务从第一次读取开始，立即读一次固定快照时间点
+            conn.execute("BEGIN")
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.close()
+
+    def release_connection(self):
+        """关闭并移出当前线程的连接 - 临时工作线程结束前调用"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._flush_group_commit(conn)
+        self._local.conn = None
+        with self._pool_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+    # ==================== 事务 ====================
+
+    @contextmanager
+    def transaction(self):
+        """
+        事务上下文 - 块内所有写入在退出时一次提交，异常时回滚
+        支持嵌套，内层事务使用 SAVEPOINT 实现
+
+        最外层以 BEGIN IMMEDIATE 开始，进入时就取得写锁（忙时按 busy_timeout 等待）。
+        延迟事务先读后写时，若其他连接在中间提交过，WAL 无法把旧的读快照升级为写锁，
+        写入会立即以 "database is locked" 失败且不经过忙等待重试
+
+        示例:
+            with db.transaction():
+                db.insert(...)
+                db.update(...)
+        """
+        conn = self._get_conn()
+        depth = getattr(self._local, "tx_depth", 0)
+
+        if depth == 0:
+            # 先提交本连接上尚未刷新的组提交写入
+            self._flush_group_commit(conn)
+            conn.execute("BEGIN IMMEDIATE")
+        else:
+            conn.execute(f"SAVEPOINT sp_{depth}")
+        self._local.tx_depth = depth + 1
+        event_mark = len(self._pending_events.get(conn, ()))
+
+        try:
+            yield conn
+        except BaseException:
+            self._local.tx_depth = depth
+            if depth == 0:
+                conn.rollback()
+                self._release_dirty_keys(conn)
+                self._release_events(conn, publish=False)
+            else:
+                conn.execute(f"ROLLBACK TO sp_{depth}")
+                conn.execute(f"RELEASE sp_{depth}")
+                # 丢弃回滚部分产生的事件
+                with self._group_lock:
+                    del self._pending_events.get(conn, [])[event_mark:]
+            raise
+        else:
+            self._local.tx_depth = depth
+            if depth == 0:
+                conn.commit()
+                self._release_dirty_keys(conn)
+                self._release_events(conn)
+            else:
+                conn.execute(f"RELEASE sp_{depth}")
+
+    # 批量写入的别名
+    batch = transaction
+
+    def in_transaction(self) -> bool:
+        """当前线程是否处于 transaction() 块内"""
+        return getattr(self._local, "tx_depth", 0) > 0
+
+    def set_group_commit(self, interval: Optional[float]):
+        """
+        设置组提交模式
+        interval: 刷新间隔（秒），None 或 0 关闭；关闭时立即提交所有挂起写入
+
+        开启后 transaction() 之外的写入不再逐条提交，而是累积到定时器到期时
+        一次提交，以少量持久性延迟换取写吞吐。其他线程在刷新前看不到这些写入。
+        """
+        with self._group_lock:
+            self._group_commit_interval = interval or None
+            if not self._group_commit_interval:
+                self.flush()
+
+    def flush(self):
+        """立即提交所有挂起的组提交写入"""
+        with self._group_lock:
+            if self._group_timer:
+                self._group_timer.cancel()
+                self._group_timer = None
+            pending, self._group_pending = self._group_pending, set()
+            for conn in pending:
+                try:
+                    if conn.in_transaction:
+                        conn.commit()
+                except sqlite3.Error as e:
+                    print(f"组提交失败: {e}")
+                self._release_dirty_keys(conn)
+        # 在锁外发布，回调中可以再访问数据库
+        for conn in pending:
+            self._release_events(conn)
+
+    def _flush_group_commit(self, conn: sqlite3.Connection):
+        """提交指定连接上挂起的组提交写入"""
+        with self._group_lock:
+            if conn not in self._group_pending:
+                return
+            self._group_pending.discard(conn)
+            if conn.in_transaction:
+                conn.commit()
+            self._release_dirty_keys(conn)
+        self._release_events(conn)
+
+    def _execute_grouped(self, conn: sqlite3.Connection, query: str, params: tuple) -> sqlite3.Cursor:
+        """
+        组提交模式下执行写入 - 延迟到定时器统一提交
+
+        语句在锁外执行：其他连接挂起的组提交事务持有写锁时，本次写入在忙等待中
+        等到定时器提交它们即可继续，而不是占着锁让定时器无法提交直到超时。
+        执行期间本连接不在待提交集合中，定时器不会同时提交它
+        """
+        with self._group_lock:
+            self._group_pending.discard(conn)
+        try:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            cursor = conn.execute(query, params)
+        finally:
+            with self._group_lock:
+                if conn.in_transaction:
+                    self._group_pending.add(conn)
+                if self._group_pending and self._group_timer is None:
+                    self._group_timer = threading.Timer(self._group_commit_interval, self._flush_from_timer)
+                    self._group_timer.daemon = True
+                    self._group_timer.start()
+        return cursor
+
+    def _flush_from_timer(self):
+        """定时器线程中执行 - 刷新后关闭变更回调在该线程中打开的连接"""
+        try:
+            self.flush()
+        finally:
+            self.release_connection()
+
+    # ==================== 变更事件 ====================
+
+    def _notify(self, table_name: str, op: str, rowids: Iterable[int] = (),
+                keys: Iterable[str] = (), since: int = None):
+        """记录一次写入；当前连接有未提交的事务时暂存，提交后发布"""
+        if not self.changes.has_listeners(table_name):
+            return
+        event = ChangeEvent(table_name, op, tuple(rowids), tuple(keys), since)
+        conn = self._get_conn()
+        if conn.in_transaction:
+            with self._group_lock:
+                self._pending_events.setdefault(conn, []).append(event)
+        else:
+            self.changes.publish(event)
+
+    def _release_events(self, conn: sqlite3.Connection, publish: bool = True):
+        """事务结束时发布（提交）或丢弃（回滚）暂存的事件"""
+        with self._group_lock:
+            events = self._pending_events.pop(conn, None)
+        if publish:
+            for event in events or ():
+                self.changes.publish(event)
+
+    # ==================== 读缓存 ====================
+
+    def _invalidate_cache(self, cache_key: tuple):
+        """写入后使缓存失效；事务未提交时记下，提交/回滚后再失效一次"""
+        self._cache.invalidate(cache_key)
+        conn = self._get_conn()
+        if conn.in_transaction:
+            with self._group_lock:
+                self._dirty_keys.setdefault(conn, set()).add(cache_key)
+
+    def _release_dirty_keys(self, conn: sqlite3.Connection):
+        with self._group_lock:
+            keys = self._dirty_keys.pop(conn, None)
+        for key in keys or ():
+            self._cache.invalidate(key)
+
+    def _cache_lookup(self, cache_key: tuple) -> Any:
+        """
+        读缓存 - 当前连接有未提交的事务（含组提交挂起）时返回 MISSING 直接查库：
+        缓存只反映已提交的数据，其他线程可能在本事务写入后回填了旧值
+        """
+        if self._get_conn().in_transaction:
+            return LRUCache.MISSING
+        return self._cache.get(cache_key)
+
+    def _cache_fill(self, cache_key: tuple, value: Any, generation: int):
+        """回填缓存 - 当前连接有未提交写入时不回填，避免其他线程读到脏数据"""
+        if not self._get_conn().in_transaction:
+            self._cache.put(cache_key, value, generation)
+
+    @staticmethod
+    def _cache_copy(value: Any) -> Any:
+        """可变容器返回副本，防止调用方修改缓存内容"""
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
+
+    def cache_stats(self) -> Dict[str, int]:
+        """读缓存统计 - {'hits', 'misses', 'size', 'maxsize'}"""
+        return self._cache.stats()
+
+    def clear_cache(self):
+        """清空读缓存（绕过 DatabaseManager 直接改库后调用）"""
+        self._cache.clear()
+
+    def reload(self):
+        """数据库内容被整体替换（如从备份恢复）后，清空所有缓存并重新加载表结构"""
+        self._cache.clear()
+        self._sql_cache.clear()
+        self._advised_queries.clear()
+        self._timeseries = None
+        self._load_schema()
+        if self._search is not None:
+            # 恢复的数据库中可能没有检索表
+            self._search._init_tables()
+
     def _init_db(self):
         """初始化数据库 - 创建必要的系统表"""
-        cursor = self._local.cursor()
+        conn = self._get_conn()
+        cursor = conn.cursor()
 
         # 插件表 - 记录已注册的插件
         cursor.execute('''
@@ -54,6 +501,15 @@ class DatabaseManager:
             )
         ''')
 
+        # 插件发现缓存 - 插件目录未变化时直接使用缓存的元数据
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {PLUGIN_CACHE_TABLE} (
+                directory TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        ''')
+
         # 全局数据表 - 存储全局配置和数据
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS _system_global_data (
@@ -78,12 +534,28 @@ class DatabaseManager:
             )
         ''')
 
-        self._local.commit()
+        # 按分类查询并按更新时间排序
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx__system_dynamic_data_category_updated_at
+            ON _system_dynamic_data (category, updated_at)
+        ''')
+
+        # 表结构版本表 - 记录插件声明的表结构版本，用于迁移
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS _system_schema_versions (
+                table_name TEXT PRIMARY KEY,
+                owner TEXT,
+                version INTEGER NOT NULL,
+                updated_at TEXT
+            )
+        ''')
+
+        self._load_schema()
 
     @contextmanager
     def get_connection(self):
-        """获取数据库连接"""
-        conn = self._local
+        """获取当前线程的数据库连接"""
+        conn = self._get_conn()
         try:
             yield conn
         except Exception:
@@ -91,23 +563,38 @@ class DatabaseManager:
             raise
 
     def execute(self, query: str, params: tuple = ()) -> sqlite3.Cursor:
-        """执行SQL查询"""
-        cursor = self._local.cursor()
-        cursor.execute(query, params)
-        self._local.commit()
+        """执行SQL查询 - 事务外自动提交，transaction() 内延迟到块结束提交"""
+        start = time.perf_counter()
+        conn = self._get_conn()
+        if self._group_commit_interval and not self.in_transaction():
+            cursor = self._execute_grouped(conn, query, params)
+        else:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+        self.profiler.record(query, time.perf_counter() - start, cursor.rowcount)
         return cursor
 
     def fetch_all(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
         """获取所有结果"""
-        cursor = self._local.cursor()
+        start = time.perf_counter()
+        cursor = self._get_conn().cursor()
         cursor.execute(query, params)
-        return cursor.fetchall()
+        rows = cursor.fetchall()
+        self.profiler.record(query, time.perf_counter() - start, len(rows))
+        return rows
 
     def fetch_one(self, query: str, params: tuple = ()) -> Optional[sqlite3.Row]:
         """获取单条结果"""
-        cursor = self._local.cursor()
+        start = time.perf_counter()
+        cursor = self._get_conn().cursor()
         cursor.execute(query, params)
-        return cursor.fetchone()
+        row = cursor.fetchone()
+        self.profiler.record(query, time.perf_counter() - start, 1 if row else 0)
+        return row
+
+    def plugin_context(self, plugin_id: Optional[str]):
+        """上下文管理器 - 其中执行的查询在诊断记录中归属到 plugin_id"""
+        return plugin_context(plugin_id)
 
     # ==================== 插件数据管理 ====================
 
@@ -131,25 +618,105 @@ class DatabaseManager:
         rows = self.fetch_all("SELECT * FROM _system_plugins ORDER BY last_used DESC")
         return [dict(row) for row in rows]
 
+    def get_plugin_cache(self) -> Dict[str, Tuple[str, Any]]:
+        """读取插件发现缓存 {插件目录名: (指纹, 元数据)}"""
+        rows = self.fetch_all(f"SELECT directory, fingerprint, metadata FROM {PLUGIN_CACHE_TABLE}")
+        return {row['directory']: (row['fingerprint'], json.loads(row['metadata'])) for row in rows}
+
+    def update_plugin_cache(self, entries: Dict[str, Tuple[str, Any]], removed: Iterable[str] = ()):
+        """写入变化的插件缓存条目并删除已不存在的插件目录"""
+        with self.transaction() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {PLUGIN_CACHE_TABLE} (directory, fingerprint, metadata) VALUES (?, ?, ?)",
+                [(directory, fingerprint, json.dumps(metadata, ensure_ascii=False))
+                 for directory, (fingerprint, metadata) in entries.items()])
+            conn.executemany(f"DELETE FROM {PLUGIN_CACHE_TABLE} WHERE directory = ?",
+                             [(directory,) for directory in removed])
+
     # ==================== 动态表管理 ====================
 
-    def ensure_table(self, table_name: str, columns: Dict[str, str]):
+    def _load_schema(self):
+        """从数据库加载所有表结构和版本到注册表"""
+        conn = self._get_conn()
+        self._schema.clear()
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+        for row in rows:
+            self._refresh_table_schema(row['name'])
+        self._schema_versions = {
+            row['table_name']: row['version']
+            for row in conn.execute("SELECT table_name, version FROM _system_schema_versions")
+        }
+
+    def _refresh_table_schema(self, table_name: str) -> Dict[str, str]:
+        """重新读取单个表的结构；表不存在时从注册表移除并返回空字典"""
+        quoted = table_name.replace('"', '""')
+        rows = self._get_conn().execute(f'PRAGMA table_info("{quoted}")').fetchall()
+        columns = {row['name']: row['type'] for row in rows}
+        if columns:
+            self._schema[table_name] = columns
+        else:
+            self._schema.pop(table_name, None)
+        return columns
+
+    def get_table_schema(self, table_name: str) -> Dict[str, str]:
+        """获取表结构 {列名: 类型}，表不存在返回空字典"""
+        return dict(self._get_table_columns(table_name))
+
+    def get_schema_version(self, table_name: str) -> int:
+        """获取表结构版本，未登记返回 0"""
+        return self._schema_versions.get(table_name, 0)
+
+    def ensure_table(self, table_name: str, columns: Dict[str, str], owner: str = None,
+                     version: int = None, migrate: Callable[[int, int], None] = None):
         """
-        确保表存在，不存在则创建
+        确保表存在且包含声明的列
         columns: {'列名': '数据类型', ...}
         示例: {'name': 'TEXT', 'value': 'REAL', 'data': 'TEXT'}
-        """
-        cursor = self._local.cursor()
 
-        # 检查表是否存在
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-        if cursor.fetchone():
+        表已存在时缺少的列通过 ALTER TABLE ADD COLUMN 自动补齐（新增列不能带
+        UNIQUE/PRIMARY KEY，NOT NULL 需带 DEFAULT）。
+        owner/version: 登记表结构版本（通常为插件ID和插件的 SCHEMA_VERSION），
+        已登记版本低于 version 时在同一事务中调用 migrate(旧版本, 新版本)
+        """
+        # 快速路径：注册表中已有且列齐全、版本不需升级
+        existing = self._schema.get(table_name)
+        if (existing is not None
+                and all(col in existing for col in columns)
+                and (version is None or self._schema_versions.get(table_name, 0) >= version)):
             return
 
-        # 构建建表SQL
-        cols_sql = ', '.join([f"{col} {dtype}" for col, dtype in columns.items()])
-        cursor.execute(f"CREATE TABLE {table_name} (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols_sql})")
-        self._local.commit()
+        self._validate_identifiers(table_name, ())
+        for col in columns:
+            if not _IDENTIFIER_RE.match(col):
+                raise ValueError(f"非法列名: {col!r}")
+
+        with self.transaction() as conn:
+            # 表可能是绕过 ensure_table 创建的，以数据库为准
+            existing = self._refresh_table_schema(table_name)
+            if not existing:
+                cols_sql = ', '.join([f"{col} {dtype}" for col, dtype in columns.items()])
+                conn.execute(f"CREATE TABLE {table_name} (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols_sql})")
+                if self.is_change_tracking_enabled():
+                    self._install_change_triggers(conn, table_name)
+            else:
+                for col, dtype in columns.items():
+                    if col not in existing:
+                        conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {col} {dtype}")
+                        print(f"表 {table_name} 新增列: {col} {dtype}")
+
+            if version is not None:
+                old_version = self._schema_versions.get(table_name, 0)
+                if old_version < version:
+                    if existing and old_version and migrate:
+                        migrate(old_version, version)
+                    conn.execute('''
+                        INSERT OR REPLACE INTO _system_schema_versions (table_name, owner, version, updated_at)
+                        VALUES (?, ?, ?, ?)
+                    ''', (table_name, owner, version, datetime.now().isoformat()))
+
+        self._refresh_table_schema(table_name)
+        if version is not None:
+            self._schema_versions[table_name] = max(version, self._schema_versions.get(table_name, 0))
 
     def drop_table(self, table_name: str):
         """删除表"""
@@ -157,43 +724,310 @@ class DatabaseManager:
         if table_name.startswith('_system_'):
             return
         self.execute(f"DROP TABLE IF EXISTS {table_name}")
+        self.execute("DELETE FROM _system_schema_versions WHERE table_name = ?", (table_name,))
+        self._schema.pop(table_name, None)
+        self._schema_versions.pop(table_name, None)
+
+    # ==================== 变更跟踪 ====================
+
+    def is_change_tracking_enabled(self) -> bool:
+        """是否已启用变更跟踪（增量备份依赖）"""
+        return CHANGELOG_TABLE in self._schema
+
+    def enable_change_tracking(self) -> List[str]:
+        """
+        为所有尚未跟踪的表安装变更触发器，返回本次新开始跟踪的表
+        触发器把 (表, rowid, 操作) 写入 _system_changelog；新跟踪的表额外写入
+        一条 row_id 为 NULL 的标记，表示该表需要整表备份一次
+        """
+        conn = self._get_conn()
+        with self.transaction():
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {CHANGELOG_TABLE} (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    table_name TEXT NOT NULL,
+                    row_id INTEGER,
+                    op TEXT NOT NULL
+                )
+            ''')
+            tracked = {row['tbl_name'] for row in conn.execute(
+                "SELECT tbl_name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '\\_chg\\_%' ESCAPE '\\'"
+            )}
+            tables = [row['name'] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\'"
+            )]
+            new_tables = [t for t in tables if t not in tracked and t not in UNTRACKED_TABLES]
+            for table_name in new_tables:
+                self._install_change_triggers(conn, table_name)
+        self._refresh_table_schema(CHANGELOG_TABLE)
+        return new_tables
+
+    @staticmethod
+    def _install_change_triggers(conn: sqlite3.Connection, table_name: str):
+        """为单个表安装 INSERT/UPDATE/DELETE 变更触发器"""
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                           (table_name,)).fetchone()
+        # WITHOUT ROWID 表没有 rowid，记为整表变更
+        without_rowid = bool(row and row[0] and "WITHOUT ROWID" in row[0].upper())
+        new_id = "NULL" if without_rowid else "NEW.rowid"
+        old_id = "NULL" if without_rowid else "OLD.rowid"
+        quoted = '"' + table_name.replace('"', '""') + '"'
+        literal = "'" + table_name.replace("'", "''") + "'"
+
+        def log(row_id, op):
+            return f"INSERT INTO {CHANGELOG_TABLE} (table_name, row_id, op) VALUES ({literal}, {row_id}, '{op}');"
+
+        def trigger_name(op):
+            return '"' + f"_chg_{table_name}_{op}".replace('"', '""') + '"'
+
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {trigger_name('ins')} AFTER INSERT ON {quoted} "
+                     f"BEGIN {log(new_id, 'I')} END")
+        update_body = log(new_id, 'U')
+        if not without_rowid:
+            # rowid 被修改时旧 rowid 也要记录，恢复时才能删掉旧行
+            update_body += (f" INSERT INTO {CHANGELOG_TABLE} (table_name, row_id, op)"
+                            f" SELECT {literal}, OLD.rowid, 'U' WHERE OLD.rowid != NEW.rowid;")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {trigger_name('upd')} AFTER UPDATE ON {quoted} "
+                     f"BEGIN {update_body} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {trigger_name('del')} AFTER DELETE ON {quoted} "
+                     f"BEGIN {log(old_id, 'D')} END")
+        conn.execute(f"INSERT INTO {CHANGELOG_TABLE} (table_name, row_id, op) VALUES (?, NULL, 'T')",
+                     (table_name,))
+
+    def get_changelog_seq(self) -> int:
+        """当前变更日志的最大序号，未启用跟踪时为 0"""
+        if not self.is_change_tracking_enabled():
+            return 0
+        row = self.fetch_one(f"SELECT COALESCE(MAX(seq), 0) AS seq FROM {CHANGELOG_TABLE}")
+        return row['seq']
+
+    def prune_changelog(self, upto_seq: int = None):
+        """删除序号 <= upto_seq 的变更日志，None 时全部删除"""
+        if not self.is_change_tracking_enabled():
+            return
+        if upto_seq is None:
+            self.execute(f"DELETE FROM {CHANGELOG_TABLE}")
+        else:
+            self.execute(f"DELETE FROM {CHANGELOG_TABLE} WHERE seq <= ?", (upto_seq,))
+
+    # ==================== 索引管理 ====================
+
+    def ensure_index(self, table_name: str, columns: Union[str, Sequence[str]],
+                     unique: bool = False, name: str = None) -> str:
+        """
+        确保索引存在，返回索引名
+        columns: 列名或列名列表，可带 ASC/DESC，如 ["category", "updated_at DESC"]
+        示例: db.ensure_index("rmb_rate_history", "record_date")
+        """
+        if isinstance(columns, str):
+            columns = [columns]
+        col_names = []
+        for col in columns:
+            match = _INDEX_COLUMN_RE.match(col.strip())
+            if not match:
+                raise ValueError(f"非法索引列: {col!r}")
+            col_names.append(match.group(1))
+        self._validate_identifiers(table_name, col_names)
+
+        name = name or f"idx_{table_name}_{'_'.join(col_names)}"
+        if not _IDENTIFIER_RE.match(name):
+            raise ValueError(f"非法索引名: {name!r}")
+
+        cols_sql = ', '.join(col.strip() for col in columns)
+        self.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+                     f"ON {table_name} ({cols_sql})")
+        return name
+
+    def drop_index(self, name: str):
+        """删除索引"""
+        if not _IDENTIFIER_RE.match(name):
+            raise ValueError(f"非法索引名: {name!r}")
+        self.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def get_indexes(self, table_name: str) -> List[Dict[str, Any]]:
+        """获取表上的索引 [{'name', 'unique', 'columns'}]"""
+        self._validate_identifiers(table_name)
+        conn = self._get_conn()
+        indexes = []
+        for row in conn.execute(f"PRAGMA index_list({table_name})").fetchall():
+            cols = [c['name'] for c in conn.execute(f"PRAGMA index_info({row['name']})").fetchall()]
+            indexes.append({'name': row['name'], 'unique': bool(row['unique']), 'columns': cols})
+        return indexes
+
+    # ==================== 查询计划顾问 ====================
+
+    def enable_query_advisor(self, enabled: bool = True):
+        """开启/关闭查询计划顾问（开发模式）"""
+        self.query_advisor = enabled
+        if enabled:
+            self._advised_queries.clear()
+
+    def get_query_advice(self) -> List[Dict[str, Any]]:
+        """
+        获取查询计划顾问的报告
+        [{'table', 'sql', 'problems': [...], 'suggestion': 'db.ensure_index(...)' 或 None}]
+        """
+        return list(self._query_advice)
+
+    def _advise(self, table_name: str, sql: str, params: tuple, where: Optional[str],
+                order_by: Optional[str]):
+        """对每条不同的查询执行一次 EXPLAIN QUERY PLAN 并报告问题"""
+        if sql in self._advised_queries:
+            return
+        self._advised_queries.add(sql)
+        # 无条件、无排序的查询只能全表扫描，不需要建议；SQLite 内部表无法建索引
+        if (not where and not order_by) or table_name.startswith("sqlite_"):
+            return
+
+        try:
+            plan = self._get_conn().execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        except sqlite3.Error:
+            return
+
+        problems = []
+        for row in plan:
+            detail = row['detail']
+            if detail.startswith("SCAN") and "USING" not in detail:
+                problems.append(f"全表扫描: {detail}")
+            elif "TEMP B-TREE" in detail:
+                problems.append(f"临时 B 树排序: {detail}")
+        if not problems:
+            return
+
+        # 建议索引: 等值条件列在前，其次是第一个范围条件列或排序列
+        known = self._get_table_columns(table_name)
+        index_cols: List[str] = []
+
+        def add(col):
+            if col in known and col not in index_cols:
+                index_cols.append(col)
+
+        if where:
+            for col in _EQ_COLUMN_RE.findall(where):
+                add(col)
+            ranges = [col for col in _RANGE_COLUMN_RE.findall(where) if col in known]
+            if ranges:
+                add(ranges[0])
+        if order_by:
+            for part in order_by.split(','):
+                match = _INDEX_COLUMN_RE.match(part.strip())
+                if match:
+                    add(match.group(1))
+
+        suggestion = f"db.ensure_index({table_name!r}, {index_cols!r})" if index_cols else None
+        report = {'table': table_name, 'sql': sql, 'problems': problems, 'suggestion': suggestion}
+        self._query_advice.append(report)
+        print(f"[查询计划] {sql}\n    " + "\n    ".join(problems)
+              + (f"\n    建议: {suggestion}" if suggestion else ""))
+
+    # ==================== SQL 语句缓存 ====================
+
+    def _get_table_columns(self, table_name: str, refresh: bool = False) -> Dict[str, str]:
+        """表的列（来自注册表）；未登记时查询一次数据库，表不存在返回空字典"""
+        columns = None if refresh else self._schema.get(table_name)
+        if columns is None:
+            columns = self._refresh_table_schema(table_name)
+        return columns
+
+    def _validate_identifiers(self, table_name: str, columns: Iterable[str] = ()):
+        """校验表名/列名；表已存在时列必须属于该表"""
+        if not _IDENTIFIER_RE.match(table_name):
+            raise ValueError(f"非法表名: {table_name!r}")
+        columns = tuple(columns)
+        for col in columns:
+            if not _IDENTIFIER_RE.match(col):
+                raise ValueError(f"非法列名: {col!r}")
+
+        known = self._get_table_columns(table_name)
+        if known and not all(col in known for col in columns):
+            # 表结构可能在外部被修改过，刷新一次再判断
+            known = self._get_table_columns(table_name, refresh=True)
+            unknown = [col for col in columns if col not in known]
+            if unknown:
+                raise ValueError(f"表 {table_name} 不存在列: {', '.join(unknown)}")
+
+    def _cache_statement(self, key: tuple, table_name: str, columns: Iterable[str], sql: str) -> str:
+        """校验标识符并缓存生成的 SQL（仅在缓存未命中时调用）"""
+        self._validate_identifiers(table_name, columns)
+        if len(self._sql_cache) >= self.STATEMENT_CACHE_SIZE:
+            self._sql_cache.clear()
+        self._sql_cache[key] = sql
+        return sql
+
+    def _insert_sql(self, table_name: str, columns: Tuple[str, ...]) -> str:
+        key = ('insert', table_name, columns)
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            placeholders = ', '.join('?' * len(columns))
+            sql = self._cache_statement(
+                key, table_name, columns,
+                f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+            )
+        return sql
 
     # ==================== 通用数据操作 ====================
 
     def insert(self, table_name: str, data: Dict[str, Any]) -> int:
         """插入数据"""
-        columns = ', '.join(data.keys())
-        placeholders = ', '.join(['?' for _ in data.keys()])
-        values = list(data.values())
-
-        cursor = self.execute(
-            f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})",
-            tuple(values)
-        )
+        sql = self._insert_sql(table_name, tuple(data))
+        cursor = self.execute(sql, tuple(data.values()))
+        self._notify(table_name, 'insert', (cursor.lastrowid,))
         return cursor.lastrowid
 
     def update(self, table_name: str, data: Dict[str, Any], where: str, where_params: tuple = ()):
         """更新数据"""
-        set_clause = ', '.join([f"{k} = ?" for k in data.keys()])
-        values = list(data.values()) + list(where_params)
-        self.execute(f"UPDATE {table_name} SET {set_clause} WHERE {where}", tuple(values))
+        columns = tuple(data)
+        key = ('update', table_name, columns, where)
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            set_clause = ', '.join([f"{k} = ?" for k in columns])
+            sql = self._cache_statement(key, table_name, columns,
+                                        f"UPDATE {table_name} SET {set_clause} WHERE {where}")
+        params = tuple(data.values()) + tuple(where_params)
+        if self.changes.has_listeners(table_name):
+            # 有订阅者时才取回受影响的 rowid
+            rowids = [row[0] for row in self.execute(f"{sql} RETURNING rowid", params).fetchall()]
+            self._notify(table_name, 'update', rowids)
+        else:
+            self.execute(sql, params)
 
     def delete(self, table_name: str, where: str, where_params: tuple = ()):
         """删除数据"""
-        self.execute(f"DELETE FROM {table_name} WHERE {where}", where_params)
+        key = ('delete', table_name, where)
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            sql = self._cache_statement(key, table_name, (), f"DELETE FROM {table_name} WHERE {where}")
+        if self.changes.has_listeners(table_name):
+            rowids = [row[0] for row in self.execute(f"{sql} RETURNING rowid", where_params).fetchall()]
+            self._notify(table_name, 'delete', rowids)
+        else:
+            self.execute(sql, where_params)
+
+    def _select_sql(self, table_name: str, columns: str, where: Optional[str],
+                    order_by: Optional[str], with_limit: bool) -> str:
+        """生成（并缓存）SELECT 语句；LIMIT 以参数绑定，不同的 limit 值共用同一条语句"""
+        key = ('select', table_name, columns, where, order_by, with_limit)
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            query = f"SELECT {columns} FROM {table_name}"
+            if where:
+                query += f" WHERE {where}"
+            if order_by:
+                query += f" ORDER BY {order_by}"
+            if with_limit:
+                query += " LIMIT ?"
+            sql = self._cache_statement(key, table_name, (), query)
+        return sql
 
     def select(self, table_name: str, columns: str = "*", where: str = None,
                where_params: tuple = (), order_by: str = None, limit: int = None) -> List[sqlite3.Row]:
         """查询数据"""
-        query = f"SELECT {columns} FROM {table_name}"
-        if where:
-            query += f" WHERE {where}"
-        if order_by:
-            query += f" ORDER BY {order_by}"
+        sql = self._select_sql(table_name, columns, where, order_by, bool(limit))
         if limit:
-            query += f" LIMIT {limit}"
-
-        return self.fetch_all(query, where_params)
+            where_params = tuple(where_params) + (int(limit),)
+        if self.query_advisor:
+            self._advise(table_name, sql, where_params, where, order_by)
+        return self.fetch_all(sql, where_params)
 
     def select_one(self, table_name: str, columns: str = "*", where: str = None,
                    where_params: tuple = ()) -> Optional[sqlite3.Row]:
@@ -201,6 +1035,148 @@ class DatabaseManager:
         results = self.select(table_name, columns, where, where_params, limit=1)
         return results[0] if results else None
 
+    # ==================== 流式查询与分页 ====================
+
+    # iter_select 每次从游标取出的行数
+    ITER_BATCH_SIZE = 500
+
+    def iter_select(self, table_name: str, columns: str = "*", where: str = None,
+                    where_params: tuple = (), order_by: str = None,
+                    batch_size: int = None) -> Iterator[sqlite3.Row]:
+        """
+        流式查询 - 从游标按批 fetchmany 逐行产出，内存占用与表大小无关
+
+        游标在迭代期间保持打开；迭代结束或生成器被关闭时释放
+        示例:
+            for row in db.iter_select("rate_history", order_by="date ASC"):
+                ...
+        """
+        sql = self._select_sql(table_name, columns, where, order_by, False)
+        if self.query_advisor:
+            self._advise(table_name, sql, where_params, where, order_by)
+        batch_size = batch_size or self.ITER_BATCH_SIZE
+        # 只统计数据库侧耗时（执行 + fetchmany），不含调用方处理每行的时间
+        start = time.perf_counter()
+        cursor = self._get_conn().execute(sql, where_params)
+        elapsed = time.perf_counter() - start
+        total = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - start
+                if not rows:
+                    break
+                total += len(rows)
+                yield from rows
+        finally:
+            cursor.close()
+            self.profiler.record(sql, elapsed, total)
+
+    def select_page(self, table_name: str, key: str = "id", after: Any = None, page_size: int = 100,
+                    columns: str = "*", where: str = None, where_params: tuple = (),
+                    descending: bool = False) -> List[sqlite3.Row]:
+        """
+        键集分页 - 返回 key 大于（descending 时小于）after 的下一页
+
+        key 必须唯一且出现在 columns 中；下一页传入本页最后一行的 key 值。
+        与 OFFSET 分页不同，翻到第 N 页的代价不随 N 增长（key 上需有索引/主键）
+        """
+        if not _IDENTIFIER_RE.match(key):
+            raise ValueError(f"非法列名: {key!r}")
+
+        conditions = [f"({where})"] if where else []
+        params = list(where_params)
+        if after is not None:
+            conditions.append(f"{key} {'<' if descending else '>'} ?")
+            params.append(after)
+        order_by = f"{key} {'DESC' if descending else 'ASC'}"
+
+        where = " AND ".join(conditions) or None
+        sql = self._select_sql(table_name, columns, where, order_by, True)
+        params.append(int(page_size))
+        if self.query_advisor:
+            self._advise(table_name, sql, tuple(params), where, order_by)
+        return self.fetch_all(sql, tuple(params))
+
+    def iter_pages(self, table_name: str, key: str = "id", page_size: int = 100,
+                   **kwargs) -> Iterator[List[sqlite3.Row]]:
+        """
+        按键集分页逐页产出，每页是独立的短查询，不长时间占用游标
+        其余参数同 select_page
+        """
+        after = kwargs.pop('after', None)
+        while True:
+            page = self.select_page(table_name, key=key, after=after, page_size=page_size, **kwargs)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            after = page[-1][key]
+
+    # ==================== 列式查询 ====================
+
+    # select_columns 每次从游标取出的行数
+    COLUMN_CHUNK_SIZE = 4096
+
+    def select_columns(self, table_name: str, columns: Sequence[str], where: str = None,
+                       where_params: tuple = (), order_by: str = None, limit: int = None,
+                       dtypes: Dict[str, Any] = None, chunk_size: int = None) -> Dict[str, Any]:
+        """
+        列式查询 - 返回 {列名: numpy 数组}，适合数值分析与绘图
+
+        游标按块 fetchmany 出普通元组（不创建 sqlite3.Row），每块按列直接转成数组后拼接。
+        dtypes 指定各列的 numpy dtype（如 {"price": "f8", "ts": "i8"}），未指定的列由 numpy 推断；
+        浮点列中的 NULL 读成 NaN，整数列不能含 NULL。未安装 NumPy 时每列返回 list
+        示例:
+            cols = db.select_columns("trades", ["ts", "price"], where="ts >= ?", where_params=(t0,),
+                                     order_by="ts", dtypes={"ts": "i8", "price": "f8"})
+        """
+        columns = list(columns)
+        if not columns:
+            raise ValueError("至少需要一列")
+        dtypes = dtypes or {}
+        sql = self._select_sql(table_name, ", ".join(columns), where, order_by, bool(limit))
+        if limit:
+            where_params = tuple(where_params) + (int(limit),)
+        if self.query_advisor:
+            self._advise(table_name, sql, where_params, where, order_by)
+        chunk_size = chunk_size or self.COLUMN_CHUNK_SIZE
+
+        chunks: List[List[Any]] = [[] for _ in columns]
+        start = time.perf_counter()
+        cursor = self._get_conn().cursor()
+        cursor.row_factory = None   # 普通元组，避免逐行构造 Row
+        total = 0
+        try:
+            cursor.execute(sql, where_params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                total += len(rows)
+                for i, values in enumerate(zip(*rows)):
+                    if np is None:
+                        chunks[i].extend(values)
+                    else:
+                        chunks[i].append(np.array(values, dtype=dtypes.get(columns[i])))
+        finally:
+            cursor.close()
+            self.profiler.record(sql, time.perf_counter() - start, total)
+
+        if np is None:
+            return dict(zip(columns, chunks))
+        result = {}
+        for name, parts in zip(columns, chunks):
+            if not parts:
+                result[name] = np.empty(0, dtype=dtypes.get(name, np.float64))
+            elif len(parts) == 1:
+                result[name] = parts[0]
+            else:
+                result[name] = np.concatenate(parts)
+        return result
+
     # ==================== 全局数据管理 ====================
 
     def set_global_data(self, key: str, value: Any, data_type: str = "json"):
@@ -215,20 +1191,34 @@ class DatabaseManager:
             INSERT OR REPLACE INTO _system_global_data (key, value, data_type, updated_at)
             VALUES (?, ?, ?, ?)
         ''', (key, stored_value, data_type, now))
+        self._invalidate_cache(('global', key))
+        self._notify('_system_global_data', 'upsert', keys=(key,))
 
     def get_global_data(self, key: str, default: Any = None, data_type: str = "json") -> Any:
-        """获取全局数据"""
-        row = self.select_one("_system_global_data", where="key=?", where_params=(key,))
-        if not row:
-            return default
+        """获取全局数据 - 优先读缓存"""
+        cache_key = ('global', key)
+        # 缓存内容: (原始字符串, JSON 解码值) 或 MISSING(库中无此键)
+        cached = self._cache_lookup(cache_key)
+        if cached is LRUCache.MISSING:
+            generation = self._cache.generation
+            row = self.select_one("_system_global_data", where="key=?", where_params=(key,))
+            cached = self._decode_global(row['value']) if row else None
+            self._cache_fill(cache_key, cached, generation)
 
-        value = row['value']
+        if cached is None:
+            return default
         if data_type == "json":
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return value
-        return value
+            return self._cache_copy(cached[1])
+        return cached[0]
+
+    @staticmethod
+    def _decode_global(value: Any) -> tuple:
+        """全局数据缓存格式: (原始字符串, JSON 解码值)"""
+        try:
+            decoded = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            decoded = value
+        return value, decoded
 
     # ==================== 动态分类数据 ====================
 
@@ -245,17 +1235,30 @@ class DatabaseManager:
             (category, data_key, data_value, data_type, created_at, updated_at)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (category, data_key, stored_value, data_type, now, now))
+        self._invalidate_cache(('dynamic', category, data_key))
+        self._notify('_system_dynamic_data', 'upsert', keys=(f"{category}/{data_key}",))
 
     def get_dynamic_data(self, category: str, data_key: str, default: Any = None) -> Any:
-        """获取动态数据"""
-        row = self.select_one(
-            "_system_dynamic_data",
-            where="category=? AND data_key=?",
-            where_params=(category, data_key)
-        )
-        if not row:
+        """获取动态数据 - 优先读缓存"""
+        cache_key = ('dynamic', category, data_key)
+        # 缓存内容: (解码值,) 或 None(库中无此键)
+        cached = self._cache_lookup(cache_key)
+        if cached is LRUCache.MISSING:
+            generation = self._cache.generation
+            row = self.select_one(
+                "_system_dynamic_data",
+                where="category=? AND data_key=?",
+                where_params=(category, data_key)
+            )
+            cached = (self._decode_dynamic(row),) if row else None
+            self._cache_fill(cache_key, cached, generation)
+
+        if cached is None:
             return default
+        return self._cache_copy(cached[0])
 
+    @staticmethod
+    def _decode_dynamic(row: sqlite3.Row) -> Any:
         value = row['data_value']
         if row['data_type'] == "json":
             try:
@@ -274,37 +1277,276 @@ class DatabaseManager:
         )
         return [dict(row) for row in rows]
 
-    # ==================== 批量操作 ====================
+    # ==================== 批量键值读写 ====================
+
+    # IN (...) 每次最多绑定的参数个数，低于 SQLite 的变量数上限
+    IN_CHUNK_SIZE = 500
+
+    def get_many(self, keys: Iterable[str], default: Any = None, category: str = None) -> Dict[str, Any]:
+        """
+        批量读取键值 - 未命中缓存的键用一条 IN (...) 查询取回
+        category 为 None 时读取全局数据，否则读取该分类下的动态数据
+
+        Returns:
+            {键: 值}，不存在的键对应 default
+        """
+        keys = list(dict.fromkeys(keys))
+        result: Dict[str, Any] = {}
+        missing = []
+        for key in keys:
+            cache_key = ('global', key) if category is None else ('dynamic', category, key)
+            cached = self._cache_lookup(cache_key)
+            if cached is LRUCache.MISSING:
+                missing.append(key)
+            elif cached is None:
+                result[key] = default
+            else:
+                result[key] = self._cache_copy(cached[-1])
+
+        generation = self._cache.generation
+        for i in range(0, len(missing), self.IN_CHUNK_SIZE):
+            chunk = missing[i:i + self.IN_CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            if category is None:
+                rows = self.fetch_all(
+                    f"SELECT key, value FROM _system_global_data WHERE key IN ({placeholders})",
+                    tuple(chunk)
+                )
+                found = {row['key']: self._decode_global(row['value']) for row in rows}
+            else:
+                rows = self.fetch_all(
+                    f"SELECT data_key, data_value, data_type FROM _system_dynamic_data "
+                    f"WHERE category = ? AND data_key IN ({placeholders})",
+                    (category,) + tuple(chunk)
+                )
+                found = {row['data_key']: (self._decode_dynamic(row),) for row in rows}
 
-    def bulk_insert(self, table_name: str, data_list: List[Dict[str, Any]]):
-        """批量插入"""
-        if not data_list:
+            for key in chunk:
+                cached = found.get(key)
+                cache_key = ('global', key) if category is None else ('dynamic', category, key)
+                self._cache_fill(cache_key, cached, generation)
+                result[key] = default if cached is None else self._cache_copy(cached[-1])
+
+        return {key: result[key] for key in keys}
+
+    def set_many(self, mapping: Dict[str, Any], category: str = None, data_type: str = "json"):
+        """
+        批量写入键值 - 一次 executemany，一个事务
+        category 为 None 时写入全局数据，否则写入该分类下的动态数据
+        """
+        if not mapping:
             return
+        now = datetime.now().isoformat()
+        if data_type == "json":
+            encoded = {k: json.dumps(v, ensure_ascii=False) for k, v in mapping.items()}
+        else:
+            encoded = {k: str(v) for k, v in mapping.items()}
 
-        cursor = self._local.cursor()
-        columns = ', '.join(data_list[0].keys())
-        placeholders = ', '.join(['?' for _ in data_list[0].keys()])
+        start = time.perf_counter()
+        with self.transaction() as conn:
+            if category is None:
+                sql = '''
+                    INSERT OR REPLACE INTO _system_global_data (key, value, data_type, updated_at)
+                    VALUES (?, ?, ?, ?)
+                '''
+                conn.executemany(sql, [(k, v, data_type, now) for k, v in encoded.items()])
+                for key in encoded:
+                    self._invalidate_cache(('global', key))
+                self._notify('_system_global_data', 'upsert', keys=encoded)
+            else:
+                sql = '''
+                    INSERT OR REPLACE INTO _system_dynamic_data
+                    (category, data_key, data_value, data_type, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                '''
+                conn.executemany(sql, [(category, k, v, data_type, now, now) for k, v in encoded.items()])
+                for key in encoded:
+                    self._invalidate_cache(('dynamic', category, key))
+                self._notify('_system_dynamic_data', 'upsert', keys=[f"{category}/{k}" for k in encoded])
+        self.profiler.record(sql, time.perf_counter() - start, len(encoded))
 
-        for data in data_list:
-            values = list(data.values())
-            cursor.execute(f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", tuple(values))
+    def get_category_prefix(self, category: str, prefix: str = "") -> Dict[str, Any]:
+        """
+        读取分类下键名以 prefix 开头的所有动态数据 {键: 值}
+        使用 (category, data_key) 唯一索引做范围查询，不做 LIKE 扫描
+        """
+        # 前缀范围 [prefix, 去掉末尾 U+10FFFF 后最后一个字符 +1)；全是 U+10FFFF 时没有上界
+        stem = prefix.rstrip(chr(sys.maxunicode))
+        if stem:
+            upper = stem[:-1] + chr(ord(stem[-1]) + 1)
+            rows = self.fetch_all(
+                "SELECT data_key, data_value, data_type FROM _system_dynamic_data "
+                "WHERE category = ? AND data_key >= ? AND data_key < ? ORDER BY data_key",
+                (category, prefix, upper)
+            )
+        elif prefix:
+            rows = self.fetch_all(
+                "SELECT data_key, data_value, data_type FROM _system_dynamic_data "
+                "WHERE category = ? AND data_key >= ? ORDER BY data_key",
+                (category, prefix)
+            )
+        else:
+            rows = self.fetch_all(
+                "SELECT data_key, data_value, data_type FROM _system_dynamic_data "
+                "WHERE category = ? ORDER BY data_key",
+                (category,)
+            )
+
+        generation = self._cache.generation
+        result = {}
+        for row in rows:
+            value = self._decode_dynamic(row)
+            self._cache_fill(('dynamic', category, row['data_key']), (value,), generation)
+            result[row['data_key']] = self._cache_copy(value)
+        return result
+
+    # ==================== 时间序列 ====================
+
+    @property
+    def timeseries(self):
+        """时间序列存储（TimeSeriesStore），首次访问时创建块表"""
+        if self._timeseries is None:
+            from .timeseries import TimeSeriesStore
+            self._timeseries = TimeSeriesStore(self)
+        return self._timeseries
+
+    # ==================== 全文检索 ====================
+
+    @property
+    def search(self):
+        """全文检索索引（SearchIndex），首次访问时创建 FTS5 表"""
+        if self._search is None:
+            from .search import SearchIndex
+            self._search = SearchIndex(self)
+        return self._search
+
+    def reclaim_space(self):
+        """
+        回收空闲页（删除大量数据后调用）
+        数据库不是 auto_vacuum=INCREMENTAL 时先一次性转换（执行 VACUUM），之后只需 incremental_vacuum
+        """
+        if self.in_transaction():
+            return
+        self.flush()
+        conn = self._get_conn()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print("转换数据库为增量回收模式（VACUUM）")
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+
+    # ==================== 批量操作 ====================
+
+    # 批量写入时每次 executemany 处理的行数
+    BULK_CHUNK_SIZE = 10000
 
-        self._local.commit()
+    def bulk_insert(self, table_name: str, data_list: Iterable[Dict[str, Any]],
+                    chunk_size: int = None) -> Dict[str, Any]:
+        """
+        批量插入 - 在一个事务内按块调用 executemany
+        data_list 可以是列表或生成器，按块消费，不会整体载入内存
+        所有行必须与第一行的列一致
+
+        Returns:
+            {'rows': 写入行数, 'elapsed': 耗时（秒）}
+        """
+        result = self._bulk_write(table_name, data_list, chunk_size, self._insert_sql)
+        if result['rows']:
+            self._notify(table_name, 'insert')
+        return result
+
+    def bulk_upsert(self, table_name: str, data_list: Iterable[Dict[str, Any]],
+                    conflict_cols: Sequence[str], chunk_size: int = None) -> Dict[str, Any]:
+        """
+        批量插入或更新 - 与 conflict_cols 冲突的行更新其余列
+        conflict_cols 必须对应表上的 UNIQUE 约束或唯一索引
+
+        Returns:
+            {'rows': 写入行数, 'elapsed': 耗时（秒）}
+        """
+        conflict_cols = tuple(conflict_cols)
+
+        def build_sql(table: str, columns: Tuple[str, ...]) -> str:
+            key = ('upsert', table, columns, conflict_cols)
+            sql = self._sql_cache.get(key)
+            if sql is not None:
+                return sql
+            sql = self._insert_sql(table, columns)
+            updates = [c for c in columns if c not in conflict_cols]
+            target = ', '.join(conflict_cols)
+            if not updates:
+                sql = f"{sql} ON CONFLICT ({target}) DO NOTHING"
+            else:
+                set_clause = ', '.join(f"{c} = excluded.{c}" for c in updates)
+                sql = f"{sql} ON CONFLICT ({target}) DO UPDATE SET {set_clause}"
+            return self._cache_statement(key, table, conflict_cols, sql)
+
+        result = self._bulk_write(table_name, data_list, chunk_size, build_sql)
+        if result['rows']:
+            self._notify(table_name, 'upsert')
+        return result
+
+    def _bulk_write(self, table_name: str, data_list: Iterable[Dict[str, Any]],
+                    chunk_size: Optional[int], build_sql) -> Dict[str, Any]:
+        """按块执行 executemany 的通用实现"""
+        start = time.perf_counter()
+        rows_iter = iter(data_list)
+        first = next(rows_iter, None)
+        if first is None:
+            return {'rows': 0, 'elapsed': 0.0}
+
+        columns = tuple(first.keys())
+        column_set = frozenset(columns)
+        ncols = len(columns)
+        sql = build_sql(table_name, columns)
+        getter = operator.itemgetter(*columns)
+
+        def to_params(index: int, row: Dict[str, Any]) -> tuple:
+            # 列数相同但列名不同时 itemgetter 会抛 KeyError，统一按列不一致报告
+            if row.keys() != column_set:
+                raise ValueError(f"批量写入 {table_name}: 第 {index} 行的列 {list(row)} 与首行 {list(columns)} 不一致")
+            values = getter(row)
+            return values if ncols > 1 else (values,)
+
+        params_iter = itertools.starmap(to_params, enumerate(itertools.chain((first,), rows_iter)))
+        chunk_size = chunk_size or self.BULK_CHUNK_SIZE
+        total = 0
+
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            while True:
+                chunk = list(itertools.islice(params_iter, chunk_size))
+                if not chunk:
+                    break
+                cursor.executemany(sql, chunk)
+                total += len(chunk)
+
+        elapsed = time.perf_counter() - start
+        self.profiler.record(sql, elapsed, total)
+        return {'rows': total, 'elapsed': elapsed}
 
     def clear_table(self, table_name: str):
         """清空表数据"""
         if table_name.startswith('_system_'):
             return
         self.execute(f"DELETE FROM {table_name}")
+        self._notify(table_name, 'delete')
 
     # ==================== 统计查询 ====================
 
     def count(self, table_name: str, where: str = None, where_params: tuple = ()) -> int:
         """统计数量"""
-        query = f"SELECT COUNT(*) as count FROM {table_name}"
-        if where:
-            query += f" WHERE {where}"
-        row = self.fetch_one(query, where_params)
+        key = ('count', table_name, where)
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            query = f"SELECT COUNT(*) as count FROM {table_name}"
+            if where:
+                query += f" WHERE {where}"
+            sql = self._cache_statement(key, table_name, (), query)
+        if self.query_advisor:
+            self._advise(table_name, sql, where_params, where, None)
+        row = self.fetch_one(sql, where_params)
         return row['count'] if row else 0
 
     def execute_sql(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
@@ -312,6 +1554,13 @@ class DatabaseManager:
         return self.fetch_all(sql, params)
 
     def close(self):
-        """关闭数据库连接"""
-        if self._local:
-            self._local.close()
+        """关闭连接池中的所有连接"""
+        self.flush()
+        with self._pool_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
@@ -0,0 +1,141 @@
+"""
+查询诊断 - 记录每条 SQL 的耗时、行数和发起插件，支持慢查询日志
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+# 当前发起数据库操作的插件ID，由 PluginManager 在调用插件代码时设置
+_current_plugin: ContextVar[Optional[str]] = ContextVar("current_plugin", default=None)
+
+
+@contextmanager
+def plugin_context(plugin_id: Optional[str]):
+    """在此上下文中执行的查询归属到 plugin_id"""
+    token = _current_plugin.set(plugin_id)
+    try:
+        yield
+    finally:
+        _current_plugin.reset(token)
+
+
+def current_plugin() -> Optional[str]:
+    """当前上下文的插件ID"""
+    return _current_plugin.get()
+
+
+class QueryProfiler:
+    """
+    查询性能记录器
+
+    - 最近的查询保存在环形缓冲区中
+    - 按 (插件, SQL) 聚合次数/总耗时/最大耗时/行数
+    - 超过慢查询阈值的查询打印日志并单独保留
+    """
+
+    RING_SIZE = 2000
+    SLOW_LOG_SIZE = 200
+    DEFAULT_SLOW_MS = 100.0
+
+    def __init__(self, slow_threshold_ms: float = None):
+        if slow_threshold_ms is None:
+            slow_threshold_ms = float(os.environ.get("MHTOOLS_SLOW_QUERY_MS", self.DEFAULT_SLOW_MS))
+        self.slow_threshold_ms = slow_threshold_ms
+        self.enabled = True
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空所有记录"""
+        with self._lock:
+            self._recent: deque = deque(maxlen=self.RING_SIZE)
+            self._slow: deque = deque(maxlen=self.SLOW_LOG_SIZE)
+            # (插件, SQL) -> [次数, 总耗时, 最大耗时, 总行数]
+            self._stats: Dict[tuple, list] = {}
+
+    def record(self, sql: str, elapsed: float, rows: int):
+        """记录一次查询（elapsed 单位为秒）"""
+        if not self.enabled:
+            return
+        plugin_id = _current_plugin.get()
+        key = (plugin_id, sql)
+        entry = (time.time(), plugin_id, sql, elapsed, rows)
+        with self._lock:
+            self._recent.append(entry)
+            stat = self._stats.get(key)
+            if stat is None:
+                self._stats[key] = [1, elapsed, elapsed, max(rows, 0)]
+            else:
+                stat[0] += 1
+                stat[1] += elapsed
+                if elapsed > stat[2]:
+                    stat[2] = elapsed
+                stat[3] += max(rows, 0)
+
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms >= self.slow_threshold_ms:
+            with self._lock:
+                self._slow.append(entry)
+            print(f"[慢查询] {elapsed_ms:.1f}ms 插件={plugin_id or '-'} 行数={rows} SQL: {' '.join(sql.split())}")
+
+    def _top(self, sort_index: int, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._stats.items())
+        items.sort(key=lambda item: item[1][sort_index], reverse=True)
+        return [
+            {
+                'plugin_id': plugin_id,
+                'sql': ' '.join(sql.split()),
+                'count': count,
+                'total_ms': total * 1000,
+                'avg_ms': total * 1000 / count,
+                'max_ms': max_elapsed * 1000,
+                'rows': rows,
+            }
+            for (plugin_id, sql), (count, total, max_elapsed, rows) in items[:limit]
+        ]
+
+    def top_by_total_time(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """按总耗时排序的查询"""
+        return self._top(1, limit)
+
+    def top_by_count(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """按执行次数排序的查询"""
+        return self._top(0, limit)
+
+    def per_plugin(self) -> Dict[Optional[str], Dict[str, float]]:
+        """按插件汇总 {插件ID: {'count', 'total_ms'}}"""
+        result: Dict[Optional[str], Dict[str, float]] = {}
+        with self._lock:
+            for (plugin_id, _), (count, total, _, _) in self._stats.items():
+                summary = result.setdefault(plugin_id, {'count': 0, 'total_ms': 0.0})
+                summary['count'] += count
+                summary['total_ms'] += total * 1000
+        return result
+
+    def recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """最近的查询（新的在前）"""
+        with self._lock:
+            entries = list(self._recent)[-limit:]
+        return [self._entry_dict(e) for e in reversed(entries)]
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """慢查询日志（新的在前）"""
+        with self._lock:
+            entries = list(self._slow)
+        return [self._entry_dict(e) for e in reversed(entries)]
+
+    @staticmethod
+    def _entry_dict(entry: tuple) -> Dict[str, Any]:
+        timestamp, plugin_id, sql, elapsed, rows = entry
+        return {
+            'time': timestamp,
+            'plugin_id': plugin_id,
+            'sql': ' '.join(sql.split()),
+            'elapsed_ms': elapsed * 1000,
+            'rows': rows,
+        }
@@ -0,0 +1,70 @@
+"""
+数据变更事件总线 - DatabaseManager 的写入操作提交后发布 (表, 操作, rowid) 事件
+
+回调在执行写入的线程中同步调用；事务内的写入在提交后才发布，回滚则丢弃。
+GUI 中请使用 async_db.ChangeNotifier / BasePlugin.subscribe_changes，回调会转到界面线程。
+"""
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class ChangeEvent(NamedTuple):
+    """
+    一次写入产生的变更
+
+    table: 表名
+    op: 'insert' / 'update' / 'delete' / 'upsert'
+    rowids: 受影响行的 rowid（批量写入等无法得知时为空）
+    keys: 键值数据的键（全局数据为 key，动态数据为 "分类/键"，时间序列为序列名）
+    since: 时间序列中受影响的最早时间戳
+    """
+    table: str
+    op: str
+    rowids: Tuple[int, ...] = ()
+    keys: Tuple[str, ...] = ()
+    since: Optional[int] = None
+
+
+ChangeCallback = Callable[[ChangeEvent], None]
+
+
+class ChangeBus:
+    """按表订阅的变更事件分发器"""
+
+    def __init__(self):
+        # {表名: [回调]}，表名为 None 表示订阅全部
+        self._listeners: Dict[Optional[str], List[ChangeCallback]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: ChangeCallback, table: str = None) -> Callable[[], None]:
+        """
+        订阅变更事件，table 为 None 时订阅所有表
+
+        Returns:
+            取消订阅的函数
+        """
+        with self._lock:
+            self._listeners.setdefault(table, []).append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                listeners = self._listeners.get(table, [])
+                if callback in listeners:
+                    listeners.remove(callback)
+                if not listeners:
+                    self._listeners.pop(table, None)
+        return unsubscribe
+
+    def has_listeners(self, table: str) -> bool:
+        """是否有人关心该表的变更 - 没有时写入方可以跳过收集 rowid"""
+        return table in self._listeners or None in self._listeners
+
+    def publish(self, event: ChangeEvent):
+        """把事件分发给订阅者，单个回调出错不影响其他回调"""
+        with self._lock:
+            callbacks = self._listeners.get(event.table, []) + self._listeners.get(None, [])
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"变更事件回调执行失败: {e}")
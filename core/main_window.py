@@ -18,13 +18,15 @@ from PyQt6.QtGui import (
 主窗口 - 框架的UI入口
 """
 import os
+import threading
 from typing import Dict, Any
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTabWidget,
     QToolBar, QLabel, QLineEdit, QPushButton, QFrame, QStatusBar,
-    QMenuBar, QMenu, QMessageBox, QTabBar, QGraphicsDropShadowEffect
+    QMenuBar, QMenu, QMessageBox, QTabBar, QGraphicsDropShadowEffect,
+    QDialog, QTableWidget, QTableWidgetItem, QAbstractItemView
 )
-from PyQt6.QtCore import Qt, QSize, pyqtSignal, QMarginsF
+from PyQt6.QtCore import Qt, QSize, pyqtSignal, QMarginsF, QThread, QTimer
 from PyQt6.QtGui import (
     QIcon, QAction, QFont, QFontDatabase, QPixmap, QPainter, QColor,
     QLinearGradient, QPalette
@@ -68,6 +70,9 @@ class Theme:
 class GlobalHeader(QWidget):
     """全局数据/功能栏 - 位于UI顶部"""
 
+    # RMB汇率时间序列名（保留策略由汇率K线插件设置）
+    RMB_RATE_SERIES = "rate_history"
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.main_window = parent
@@ -101,6 +106,26 @@ class GlobalHeader(QWidget):
         # 弹性空间
         layout.addStretch()
 
+        # 全局搜索框（回车搜索插件及插件数据）
+        self.search_edit = QLineEdit()
+        self.search_edit.setFixedSize(220, 30)
+        self.search_edit.setPlaceholderText("🔍 搜索插件和数据（回车）")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setStyleSheet(f"""
+            QLineEdit {{
+                border: 1px solid {Theme.BORDER};
+                border-radius: 8px;
+                padding: 2px 8px;
+                font-size: 13px;
+                color: {Theme.TEXT_PRIMARY};
+                background-color: {Theme.BG_INPUT};
+            }}
+            QLineEdit:focus {{
+                border-color: {Theme.PRIMARY};
+            }}
+        """)
+        layout.addWidget(self.search_edit)
+
         # 整体背景
         self.setStyleSheet(f"""
             GlobalHeader {{
@@ -177,11 +202,13 @@ class GlobalHeader(QWidget):
             "rate": "REAL NOT NULL",
             "record_date": "TEXT NOT NULL"
         })
+        db.ensure_index("rmb_rate_history", "record_date")
 
-        # 加载三个数据
+        # 加载三个数据（一次查询）
         data_keys = ['rmb_rate', 'stamina_cost', 'energy_cost']
+        values = db.get_many([f"global_{key}" for key in data_keys], "")
         for key in data_keys:
-            value = db.get_global_data(f"global_{key}", "")
+            value = values[f"global_{key}"]
             if value and key in self._inputs:
                 self._inputs[key].setText(str(value))
 
@@ -194,32 +221,46 @@ class GlobalHeader(QWidget):
         if not self.main_window or not self.main_window.db:
             return
 
-        try:
-            db = self.main_window.db
+        db = self.main_window.db
 
+        def write():
             # RMB汇率需要记录历史
             if key == 'rmb_rate':
+                import time
                 from datetime import datetime
                 today = datetime.now().strftime("%Y-%m-%d")
 
-                # 保存最新值
-                db.set_global_data(f"global_{key}", value)
-
-                # 检查今天是否已有记录，有则更新，无则插入
-                existing = db.select_one(
-                    "rmb_rate_history",
-                    where="record_date=?",
-                    where_params=(today,)
-                )
-                if existing:
-                    db.update("rmb_rate_history", {"rate": value}, "record_date=?", (today,))
-                else:
-                    db.insert("rmb_rate_history", {"rate": value, "record_date": today})
+                with db.transaction():
+                    # 保存最新值
+                    db.set_global_data(f"global_{key}", value)
+                    # 每次修改都记入时间序列（日内多点，汇率K线插件展示同一序列）
+                    try:
+                        db.timeseries.append(self.RMB_RATE_SERIES, int(time.time()), float(value))
+                    except ValueError:
+                        pass
+
+                    # 检查今天是否已有记录，有则更新，无则插入
+                    existing = db.select_one(
+                        "rmb_rate_history",
+                        where="record_date=?",
+                        where_params=(today,)
+                    )
+                    if existing:
+                        db.update("rmb_rate_history", {"rate": value}, "record_date=?", (today,))
+                    else:
+                        db.insert("rmb_rate_history", {"rate": value, "record_date": today})
 
             else:
                 db.set_global_data(f"global_{key}", value)
-        except Exception:
-            # 数据库可能已关闭，忽略错误
+
+        def on_error(e):
+            print(f"保存全局数据 {key} 失败: {e}")
+            self.main_window.statusBar().showMessage(f"保存失败: {e}")
+
+        # 在数据库工作线程中写入，不阻塞界面；数据库已关闭时不再提交
+        try:
+            self.main_window.async_db.submit(write, error_callback=on_error)
+        except RuntimeError:
             pass
 
     def get_rmb_rate(self):
@@ -241,19 +282,170 @@ class GlobalHeader(QWidget):
         return ""
 
 
+class BackupWorker(QThread):
+    """在后台线程执行备份/恢复，报告进度并支持取消"""
+
+    progress = pyqtSignal(int, int)     # (已完成页数, 总页数)
+    succeeded = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, task, db, path, parent=None):
+        super().__init__(parent)
+        self._task = task
+        self._db = db
+        self._path = path
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求取消"""
+        self._cancel_event.set()
+
+    def run(self):
+        from .backup import BackupCancelled
+        try:
+            self._task(self._db, self._path,
+                       progress=self.progress.emit, cancel_event=self._cancel_event)
+            self.succeeded.emit(self._path)
+        except BackupCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            # 关闭本线程使用的连接
+            self._db.release_connection()
+
+
+class DiagnosticsDialog(QDialog):
+    """数据库诊断窗口 - 按总耗时/次数排列的查询、慢查询日志、缓存统计"""
+
+    COLUMNS = ["插件", "次数", "总耗时(ms)", "平均(ms)", "最大(ms)", "行数", "SQL"]
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.setWindowTitle("数据库诊断")
+        self.resize(900, 560)
+
+        layout = QVBoxLayout(self)
+
+        self._summary = QLabel()
+        self._summary.setStyleSheet(f"color: {Theme.TEXT_SECONDARY}; font-size: 12px;")
+        layout.addWidget(self._summary)
+
+        tabs = QTabWidget()
+        self._by_total = self._create_table(self.COLUMNS)
+        self._by_count = self._create_table(self.COLUMNS)
+        self._slow = self._create_table(["时间", "插件", "耗时(ms)", "行数", "SQL"])
+        tabs.addTab(self._by_total, "按总耗时")
+        tabs.addTab(self._by_count, "按次数")
+        tabs.addTab(self._slow, "慢查询")
+        layout.addWidget(tabs)
+
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        refresh_btn = QPushButton("刷新")
+        refresh_btn.clicked.connect(self.refresh)
+        reset_btn = QPushButton("清空统计")
+        reset_btn.clicked.connect(self._reset)
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(refresh_btn)
+        btn_layout.addWidget(reset_btn)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+        self.refresh()
+
+    @staticmethod
+    def _create_table(headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setStretchLastSection(True)
+        return table
+
+    @staticmethod
+    def _fill_table(table, rows):
+        table.setRowCount(len(rows))
+        for r, values in enumerate(rows):
+            for c, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if c == len(values) - 1:
+                    item.setToolTip(value)
+                table.setItem(r, c, item)
+        table.resizeColumnsToContents()
+
+    def refresh(self):
+        """重新读取统计数据"""
+        profiler = self.db.profiler
+
+        def stat_rows(stats):
+            return [
+                [s['plugin_id'] or "-", str(s['count']), f"{s['total_ms']:.1f}",
+                 f"{s['avg_ms']:.2f}", f"{s['max_ms']:.2f}", str(s['rows']), s['sql']]
+                for s in stats
+            ]
+
+        self._fill_table(self._by_total, stat_rows(profiler.top_by_total_time(50)))
+        self._fill_table(self._by_count, stat_rows(profiler.top_by_count(50)))
+
+        from datetime import datetime
+        self._fill_table(self._slow, [
+            [datetime.fromtimestamp(q['time']).strftime("%H:%M:%S"), q['plugin_id'] or "-",
+             f"{q['elapsed_ms']:.1f}", str(q['rows']), q['sql']]
+            for q in profiler.slow_queries()
+        ])
+
+        cache = self.db.cache_stats()
+        per_plugin = profiler.per_plugin()
+        plugins_text = "  ".join(
+            f"{pid or '-'}: {v['count']}次/{v['total_ms']:.0f}ms"
+            for pid, v in sorted(per_plugin.items(), key=lambda kv: -kv[1]['total_ms'])
+        )
+        pragmas = self.db.get_connection_pragmas()
+        pragmas_text = ", ".join(f"{k}={v}" for k, v in pragmas.items())
+        self._summary.setText(
+            f"性能档位: {self.db.get_performance_profile()} ({pragmas_text})\n"
+            f"慢查询阈值: {profiler.slow_threshold_ms:.0f}ms | "
+            f"读缓存: 命中 {cache['hits']} / 未命中 {cache['misses']} ({cache['size']}/{cache['maxsize']})\n"
+            f"按插件: {plugins_text or '无'}"
+        )
+
+    def _reset(self):
+        self.db.profiler.reset()
+        self.refresh()
+
+
 class MainWindow(QMainWindow):
     """主窗口"""
 
+    # 时间序列维护间隔
+    MAINTENANCE_INTERVAL_MS = 60 * 60 * 1000
+
+    # 插件后台准备完成（从准备线程发出，排队到界面线程处理）
+    plugin_prepared = pyqtSignal(str)
+
+    # 插件文件变化后等待这么久再重载，合并编辑器保存时的连续写入
+    HOT_RELOAD_DELAY_MS = 300
+
     def __init__(self):
         super().__init__()
 
         # 导入核心组件
         from .database import DatabaseManager
+        from .async_db import AsyncDatabase, ChangeNotifier
         from .plugin_system import PluginManager
 
         # 初始化管理器
         self.db = DatabaseManager()
+        self.async_db = AsyncDatabase(self.db)
+        # 数据变更通知（界面线程），插件通过 subscribe_changes 订阅
+        self.db_notifier = ChangeNotifier(self.db)
         self.plugin_manager = PluginManager(self.db, self)
+        self.plugin_prepared.connect(self._on_plugin_prepared)
 
         # 设置窗口属性
         self.setWindowTitle("游戏助手")
@@ -267,9 +459,32 @@ class MainWindow(QMainWindow):
         self._create_menu_bar()
         self._create_central_widget()
 
+        # 监视插件源码，修改后只热重载对应插件
+        self._setup_plugin_watcher()
+
         # 加载插件
         self._load_plugins()
 
+        # 时间序列汇总与清理 - 启动后稍等执行一次，之后定期在数据库工作线程中执行
+        self._maintenance_timer = QTimer(self)
+        self._maintenance_timer.timeout.connect(self._run_db_maintenance)
+        self._maintenance_timer.start(self.MAINTENANCE_INTERVAL_MS)
+        QTimer.singleShot(30 * 1000, self._run_db_maintenance)
+
+    def _run_db_maintenance(self):
+        """在数据库工作线程中执行时间序列汇总、过期数据清理和空间回收"""
+        def on_done(removed):
+            total = sum(removed.values())
+            if total:
+                print(f"时间序列维护完成，清理原始点 {total} 个")
+
+        try:
+            self.async_db.submit(lambda: self.db.timeseries.run_maintenance(),
+                                 callback=on_done,
+                                 error_callback=lambda e: print(f"时间序列维护失败: {e}"))
+        except RuntimeError:
+            pass
+
     def _apply_global_styles(self):
         """应用全局样式"""
         self.setStyleSheet(f"""
@@ -363,6 +578,14 @@ class MainWindow(QMainWindow):
         export_action.triggered.connect(self.export_data)
         file_menu.addAction(export_action)
 
+        incremental_action = QAction("增量备份", self)
+        incremental_action.triggered.connect(self.incremental_backup)
+        file_menu.addAction(incremental_action)
+
+        import_action = QAction("导入数据", self)
+        import_action.triggered.connect(self.import_data)
+        file_menu.addAction(import_action)
+
         file_menu.addSeparator()
 
         exit_action = QAction("退出", self)
@@ -378,6 +601,10 @@ class MainWindow(QMainWindow):
         settings_action.triggered.connect(self.open_settings)
         tools_menu.addAction(settings_action)
 
+        diagnostics_action = QAction("数据库诊断", self)
+        diagnostics_action.triggered.connect(self.open_diagnostics)
+        tools_menu.addAction(diagnostics_action)
+
         # 帮助菜单
         help_menu = menubar.addMenu("帮助")
 
@@ -397,6 +624,8 @@ class MainWindow(QMainWindow):
 
         # 全局标题栏
         self.header = GlobalHeader(self)
+        self.header.search_edit.returnPressed.connect(
+            lambda: self.search_plugins(self.header.search_edit.text()))
         layout.addWidget(self.header)
 
         # 标签页部件
@@ -406,6 +635,8 @@ class MainWindow(QMainWindow):
         self.tab_widget.setTabsClosable(False)
         # 禁用拖拽排序
         self.tab_widget.setMovable(False)
+        # 切换标签页时通知对应插件
+        self.tab_widget.currentChanged.connect(self._on_tab_changed)
 
         layout.addWidget(self.tab_widget)
 
@@ -414,35 +645,179 @@ class MainWindow(QMainWindow):
         self.statusBar().addPermanentWidget(QLabel("游戏助手 v1.0.0"))
 
     def _load_plugins(self):
-        """加载所有插件"""
-        # 发现插件
+        """
+        发现插件并创建标签页 - 插件在后台线程中按依赖顺序并行导入和准备，
+        界面在其标签页首次打开时才在界面线程中创建
+        """
+        # 发现插件（不导入插件模块）
         plugin_ids = self.plugin_manager.discover_plugins()
 
-        # 加载插件并创建标签页
+        # 建立标签页期间不触发切换，避免逐个加载插件
+        self.tab_widget.blockSignals(True)
         for plugin_id in plugin_ids:
-            plugin = self.plugin_manager.load_plugin(plugin_id)
-            if plugin:
-                self._add_plugin_tab(plugin)
+            self._add_plugin_tab(plugin_id)
+        self.tab_widget.blockSignals(False)
 
         # 如果没有插件，添加一个欢迎页面
         if self.tab_widget.count() == 0:
             self._add_welcome_tab()
-
-        self.statusBar().showMessage(f"已加载 {len(self.plugin_manager.get_all_plugins())} 个插件")
-
-    def _add_plugin_tab(self, plugin):
-        """添加插件标签页"""
-        ui = plugin.get_ui()
+        else:
+            # 后台准备，当前标签页的插件准备好后再创建其界面
+            self.plugin_manager.prepare_plugins(
+                plugin_ids, on_ready=lambda plugin_id: self.plugin_prepared.emit(plugin_id))
+            QTimer.singleShot(0, lambda: self._on_tab_changed(self.tab_widget.currentIndex()))
+
+        self.statusBar().showMessage(f"发现 {len(plugin_ids)} 个插件")
+        self._watch_plugin_files()
+
+    def _add_plugin_tab(self, plugin_id):
+        """添加插件标签页 - 插件未加载时先放占位页"""
+        info = self.plugin_manager.get_plugin_info(plugin_id)
+        plugin = self.plugin_manager.get_plugin(plugin_id)
+        ui = plugin.get_ui() if plugin else self._create_placeholder(info.name)
         if ui:
             # 创建标签页
-            index = self.tab_widget.addTab(ui, plugin.PLUGIN_NAME)
+            index = self.tab_widget.addTab(ui, info.name)
             self.tab_widget.setCurrentIndex(index)
 
             # 存储插件引用
             self.tab_widget.tabBar().setTabData(index, {
-                'plugin_id': plugin.PLUGIN_ID
+                'plugin_id': plugin_id,
+                'placeholder': plugin is None
             })
 
+    def _create_placeholder(self, name):
+        """未加载插件的占位页"""
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        label = QLabel(f"正在加载 {name}...")
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        label.setStyleSheet(f"font-size: 14px; color: {Theme.TEXT_SECONDARY};")
+        layout.addWidget(label)
+        return widget
+
+    def _activate_plugin_tab(self, index, plugin_id):
+        """首次打开标签页 - 加载插件并用插件界面替换占位页"""
+        info = self.plugin_manager.get_plugin_info(plugin_id)
+        self.statusBar().showMessage(f"正在加载 {info.name}...")
+        plugin = self.plugin_manager.load_plugin(plugin_id)
+        ui = plugin.get_ui() if plugin else None
+        if ui is None:
+            # 加载失败，保留占位页并提示，不再重试
+            placeholder = self.tab_widget.widget(index)
+            placeholder.findChild(QLabel).setText(f"插件 {info.name} 加载失败")
+            self.tab_widget.tabBar().setTabData(index, {'plugin_id': plugin_id, 'placeholder': False})
+            self.statusBar().showMessage(f"插件 {info.name} 加载失败")
+            return
+
+        placeholder = self.tab_widget.widget(index)
+        self.tab_widget.blockSignals(True)
+        self.tab_widget.removeTab(index)
+        self.tab_widget.insertTab(index, ui, info.name)
+        self.tab_widget.tabBar().setTabData(index, {'plugin_id': plugin_id, 'placeholder': False})
+        self.tab_widget.setCurrentIndex(index)
+        self.tab_widget.blockSignals(False)
+        placeholder.deleteLater()
+        self.statusBar().showMessage(f"已加载 {info.name}")
+
+    # ==================== 插件热重载 ====================
+
+    def _setup_plugin_watcher(self):
+        """创建插件文件监视器"""
+        from PyQt6.QtCore import QFileSystemWatcher
+
+        self._plugin_watcher = QFileSystemWatcher(self)
+        self._plugin_watcher.fileChanged.connect(self._on_plugin_path_changed)
+        self._plugin_watcher.directoryChanged.connect(self._on_plugin_path_changed)
+        # 待重载的插件包（目录名）
+        self._pending_reloads = set()
+        self._reload_timer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.setInterval(self.HOT_RELOAD_DELAY_MS)
+        self._reload_timer.timeout.connect(self._reload_changed_plugins)
+
+    def _watch_plugin_files(self):
+        """把新出现的插件文件加入监视（编辑器替换保存的文件会被移出监视，重载后重新加入）"""
+        watched = set(self._plugin_watcher.files()) | set(self._plugin_watcher.directories())
+        paths = [path for path in self.plugin_manager.watch_paths() if path not in watched]
+        if paths:
+            self._plugin_watcher.addPaths(paths)
+
+    def _on_plugin_path_changed(self, path):
+        """插件文件或目录变化 - 记下所属插件包，稍后统一重载"""
+        item = self.plugin_manager.package_for_path(path)
+        if item is not None:
+            self._pending_reloads.add(item)
+        else:
+            # 插件目录本身变化：新增或删除了插件包
+            self._pending_reloads.update(self.plugin_manager.changed_packages())
+        self._reload_timer.start()
+
+    def _reload_changed_plugins(self):
+        """热重载有变化的插件包，只替换受影响的标签页"""
+        items, self._pending_reloads = sorted(self._pending_reloads), set()
+        for item in items:
+            for plugin_id, plugin in self.plugin_manager.reload_package(item).items():
+                self._replace_plugin_tab(plugin_id, plugin)
+        self._watch_plugin_files()
+        if items:
+            self.statusBar().showMessage(f"已重新加载插件: {', '.join(items)}")
+
+    def _find_plugin_tab(self, plugin_id):
+        """插件标签页的索引，不存在时返回 -1"""
+        for index in range(self.tab_widget.count()):
+            data = self.tab_widget.tabBar().tabData(index)
+            if data and data['plugin_id'] == plugin_id:
+                return index
+        return -1
+
+    def _replace_plugin_tab(self, plugin_id, plugin):
+        """用重载后的插件界面替换标签页；插件已删除时移除标签页，新插件添加标签页"""
+        index = self._find_plugin_tab(plugin_id)
+        info = self.plugin_manager.get_plugin_info(plugin_id)
+        current = self.tab_widget.currentIndex()
+
+        self.tab_widget.blockSignals(True)
+        if info is None:
+            if index >= 0:
+                widget = self.tab_widget.widget(index)
+                self.tab_widget.removeTab(index)
+                widget.deleteLater()
+        elif index < 0:
+            self._add_plugin_tab(plugin_id)
+            self.tab_widget.setCurrentIndex(current)
+        else:
+            # 加载失败或原本未加载时放占位页，打开时再加载
+            ui = plugin.get_ui() if plugin else None
+            old = self.tab_widget.widget(index)
+            self.tab_widget.removeTab(index)
+            self.tab_widget.insertTab(index, ui or self._create_placeholder(info.name), info.name)
+            self.tab_widget.tabBar().setTabData(index, {'plugin_id': plugin_id, 'placeholder': ui is None})
+            self.tab_widget.setCurrentIndex(current)
+            old.deleteLater()
+        self.tab_widget.blockSignals(False)
+
+        if self.tab_widget.currentIndex() != current or (info is not None and index == current):
+            self._on_tab_changed(self.tab_widget.currentIndex())
+
+    def _on_tab_changed(self, index):
+        """标签页切换"""
+        data = self.tab_widget.tabBar().tabData(index)
+        if data:
+            if data.get('placeholder'):
+                if not self.plugin_manager.is_prepared(data['plugin_id']):
+                    # 还在后台准备，保留占位页，准备完成后由 _on_plugin_prepared 激活
+                    return
+                self._activate_plugin_tab(index, data['plugin_id'])
+            self.plugin_manager.tab_selected(data['plugin_id'])
+
+    def _on_plugin_prepared(self, plugin_id):
+        """插件后台准备完成 - 若它是当前仍为占位页的标签页则立即创建界面"""
+        index = self.tab_widget.currentIndex()
+        data = self.tab_widget.tabBar().tabData(index)
+        if data and data.get('placeholder') and data['plugin_id'] == plugin_id:
+            self._on_tab_changed(index)
+
     def _add_welcome_tab(self):
         """添加欢迎页面"""
         from PyQt6.QtWidgets import QLabel, QVBoxLayout, QFrame
@@ -583,49 +958,168 @@ class MainWindow(QMainWindow):
             self._add_welcome_tab()
 
     def search_plugins(self, query: str):
-        """搜索插件"""
+        """全局搜索 - 在数据库工作线程查询全文索引（插件名称/描述及插件登记的数据），结果以菜单列出"""
+        from .search import PLUGIN_SOURCE
+
+        query = query.strip()
         if not query:
             return
 
-        # 在标签页中搜索
+        def show_results(hits):
+            # 只保留已发现插件的结果
+            hits = [hit for hit in hits
+                    if hit.plugin_id is None or self.plugin_manager.get_plugin_info(hit.plugin_id)]
+            if not hits:
+                self.statusBar().showMessage(f"未找到: {query}")
+                return
+
+            menu = QMenu(self)
+            for hit in hits:
+                info = self.plugin_manager.get_plugin_info(hit.plugin_id) if hit.plugin_id else None
+                label = hit.title or hit.snippet
+                if info is not None and hit.source != PLUGIN_SOURCE:
+                    label = f"{label}  —  {info.name}"
+                action = menu.addAction(label)
+                action.setToolTip(hit.snippet)
+                action.triggered.connect(lambda checked=False, h=hit: self._open_search_hit(h))
+            menu.setToolTipsVisible(True)
+            edit = self.header.search_edit
+            menu.popup(edit.mapToGlobal(edit.rect().bottomLeft()))
+            self.statusBar().showMessage(f"搜索: {query}，{len(hits)} 条结果")
+
+        self.async_db.submit(self.db.search.search, query, callback=show_results,
+                             error_callback=lambda e: self.statusBar().showMessage(f"搜索失败: {e}"))
+
+    def _open_search_hit(self, hit):
+        """切换到搜索结果所属插件的标签页，并通知插件定位结果"""
+        from .search import PLUGIN_SOURCE
+
+        if not hit.plugin_id:
+            return
         for i in range(self.tab_widget.count()):
-            tab_text = self.tab_widget.tabText(i)
-            if query.lower() in tab_text.lower():
+            data = self.tab_widget.tabBar().tabData(i)
+            if data and data['plugin_id'] == hit.plugin_id:
                 self.tab_widget.setCurrentIndex(i)
                 break
-
-        self.statusBar().showMessage(f"搜索: {query}")
+        plugin = self.plugin_manager.get_plugin(hit.plugin_id)
+        if plugin is not None and hit.source != PLUGIN_SOURCE:
+            plugin.on_search_result(hit)
 
     def refresh_plugins(self):
         """刷新插件"""
-        # 清除所有标签页
+        # 清除所有标签页（占位页随之销毁，已加载插件的界面保留复用）
+        self.tab_widget.blockSignals(True)
         while self.tab_widget.count() > 0:
+            data = self.tab_widget.tabBar().tabData(0)
+            widget = self.tab_widget.widget(0)
             self.tab_widget.removeTab(0)
+            if not data or data.get('placeholder'):
+                widget.deleteLater()
+        self.tab_widget.blockSignals(False)
 
         # 重新加载插件
         self._load_plugins()
         self.statusBar().showMessage("插件已刷新")
 
     def export_data(self):
-        """导出数据"""
+        """导出数据 - 在线备份，可选 gzip 压缩"""
         from PyQt6.QtWidgets import QFileDialog
-        from .database import DatabaseManager
+        from .backup import backup_database
+
+        # 弹出导出对话框
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "导出数据", "game_assistant_backup.db",
+            "SQLite Database (*.db);;压缩备份 (*.db.gz);;All Files (*)"
+        )
+        if not file_path:
+            return
+        if selected_filter.startswith("压缩备份") and not file_path.endswith(".gz"):
+            file_path += ".gz"
 
-        db = DatabaseManager()
+        self._run_backup_task(
+            "正在导出数据...", backup_database, file_path,
+            lambda path: QMessageBox.information(self, "成功", f"数据已导出到: {path}")
+        )
 
-        # 获取所有插件数据
-        plugins = self.plugin_manager.get_all_plugins()
+    def incremental_backup(self):
+        """增量备份 - 只导出上次备份以来变化的数据，需要先导出一次完整备份"""
+        from datetime import datetime
+        from PyQt6.QtWidgets import QFileDialog
+        from .backup import incremental_backup
 
-        # 弹出导出对话框
         file_path, _ = QFileDialog.getSaveFileName(
-            self, "导出数据", "game_assistant_backup.db",
-            "SQLite Database (*.db);;All Files (*)"
+            self, "增量备份", f"game_assistant_incr_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db.gz",
+            "压缩备份 (*.db.gz);;SQLite Database (*.db);;All Files (*)"
+        )
+        if not file_path:
+            return
+
+        self._run_backup_task(
+            "正在增量备份...", incremental_backup, file_path,
+            lambda path: QMessageBox.information(self, "成功", f"增量备份已保存到: {path}")
+        )
+
+    def import_data(self):
+        """导入数据 - 从完整备份（可同时选择其后的增量备份）恢复，覆盖当前数据"""
+        from PyQt6.QtWidgets import QFileDialog
+        from .backup import restore_files
+
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "导入数据（完整备份 + 增量备份）", "",
+            "数据库备份 (*.db *.db.gz);;All Files (*)"
+        )
+        if not file_paths:
+            return
+
+        reply = QMessageBox.question(
+            self, "导入数据", "导入将覆盖当前所有数据，是否继续？",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
 
-        if file_path:
-            import shutil
-            shutil.copy(db.db_path, file_path)
-            QMessageBox.information(self, "成功", f"数据已导出到: {file_path}")
+        def on_restored(path):
+            self.header.load_data()
+            self.refresh_plugins()
+            names = "、".join(os.path.basename(p) for p in file_paths)
+            QMessageBox.information(self, "成功", f"已从 {names} 恢复数据")
+
+        def restore(db, path, **kwargs):
+            restore_files(db, file_paths, **kwargs)
+
+        self._run_backup_task("正在导入数据...", restore, file_paths[0], on_restored)
+
+    def _run_backup_task(self, label, task, path, on_success):
+        """在后台线程执行备份/恢复，显示进度条，可取消"""
+        from PyQt6.QtWidgets import QProgressDialog
+
+        dialog = QProgressDialog(label, "取消", 0, 100, self)
+        dialog.setWindowTitle("数据备份")
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(0)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+
+        worker = BackupWorker(task, self.db, path, self)
+
+        def on_progress(done, total):
+            dialog.setMaximum(max(total, 1))
+            dialog.setValue(done)
+
+        def on_finished():
+            dialog.close()
+            worker.deleteLater()
+            self._backup_worker = None
+
+        worker.progress.connect(on_progress)
+        worker.succeeded.connect(lambda p: (on_finished(), on_success(p)))
+        worker.failed.connect(lambda e: (on_finished(), QMessageBox.warning(self, "失败", f"操作失败: {e}")))
+        worker.cancelled.connect(lambda: (on_finished(), self.statusBar().showMessage("已取消")))
+        dialog.canceled.connect(worker.cancel)
+
+        # 保持引用，避免线程对象被回收
+        self._backup_worker = worker
+        worker.start()
 
     def open_settings(self):
         """打开设置"""
@@ -653,6 +1147,14 @@ class MainWindow(QMainWindow):
         auto_refresh.addItems(["关闭", "每分钟", "每5分钟", "每30分钟"])
         layout.addRow("自动刷新:", auto_refresh)
 
+        # 数据库性能档位
+        profile_combo = QComboBox()
+        profiles = [("safe", "安全（每次提交同步磁盘）"), ("balanced", "均衡（推荐）"), ("fast", "极速（不等待磁盘同步）")]
+        for name, label in profiles:
+            profile_combo.addItem(label, name)
+        profile_combo.setCurrentIndex(profile_combo.findData(self.db.get_performance_profile()))
+        layout.addRow("数据库性能:", profile_combo)
+
         # 按钮
         btn_layout = QHBoxLayout()
         save_btn = QPushButton("保存")
@@ -665,7 +1167,14 @@ class MainWindow(QMainWindow):
         layout.addRow(btn_layout)
 
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            QMessageBox.information(self, "设置", "设置已保存（重启生效）")
+            # 性能档位立即生效
+            self.db.set_performance_profile(profile_combo.currentData())
+            QMessageBox.information(self, "设置", "设置已保存，数据库性能档位已立即生效")
+
+    def open_diagnostics(self):
+        """打开数据库诊断窗口"""
+        dialog = DiagnosticsDialog(self.db, self)
+        dialog.exec()
 
     def show_about(self):
         """显示关于对话框"""
@@ -679,14 +1188,22 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         """关闭窗口事件"""
-        # 卸载所有插件
+        from .process_host import ProcessHost
+
+        # 停止插件后台准备，卸载所有插件
+        self.plugin_manager.shutdown()
         for plugin in self.plugin_manager.get_all_plugins():
             try:
                 plugin.on_unload()
             except Exception:
                 pass
 
-        # 关闭数据库
+        # 等待排队中的数据库操作完成后关闭数据库
+        self._maintenance_timer.stop()
+        self._reload_timer.stop()
+        self.db_notifier.close()
+        ProcessHost.shutdown_instance(wait=False)
+        self.async_db.shutdown(wait=True)
         self.db.close()
 
         event.accept()
@@ -1,13 +1,54 @@
 """
 插件系统 - 动态加载和管理插件
+
+发现插件时不导入插件模块：元数据来自插件目录下的 plugin.json 清单，
+没有清单时用 AST 解析 __init__.py 中插件类的 PLUGIN_* 常量。
+解析结果按源文件指纹（修改时间 + 大小）缓存在数据库中，未变化的插件直接使用缓存。
+
+启动时 prepare_plugins 按 PLUGIN_REQUIRES 依赖图的拓扑顺序在线程池中并行导入插件模块，
+并执行插件的非界面初始化（prepare：建表、预热数据）；界面（create_ui）在标签页首次打开时
+于 GUI 线程中创建。
+
+reload_package 热重载单个插件包：清除该包及其子模块的导入缓存后重新读取元数据，
+已加载的插件（连同依赖它的插件）卸载后重新加载，其他插件不受影响。
 """
 import os
 import sys
+import ast
+import json
 import importlib
 import inspect
-from typing import Type, Dict, List, Optional, Any
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Type, Dict, List, NamedTuple, Optional, Any, Tuple
 from abc import ABC, abstractmethod
 
+# 插件清单文件名
+MANIFEST_FILE = "plugin.json"
+# 发现缓存格式版本，PluginInfo 字段或指纹格式变化时递增使旧缓存失效
+_CACHE_VERSION = 3
+# 清单键 -> 插件类常量
+_MANIFEST_KEYS = {
+    'id': 'PLUGIN_ID',
+    'name': 'PLUGIN_NAME',
+    'version': 'PLUGIN_VERSION',
+    'author': 'PLUGIN_AUTHOR',
+    'description': 'PLUGIN_DESCRIPTION',
+    'requires': 'PLUGIN_REQUIRES',
+}
+
+
+class PluginInfo(NamedTuple):
+    """发现阶段得到的插件元数据（不需要导入插件模块）"""
+    plugin_id: str
+    name: str
+    version: str
+    author: str
+    description: str
+    module: str                 # 插件模块名，如 plugins.rate_history
+    class_name: Optional[str]   # 插件类名，未知时导入后按 PLUGIN_ID 查找
+    requires: Tuple[str, ...] = ()  # 依赖的插件 ID
+
 
 class BasePlugin(ABC):
     """插件基类 - 所有插件必须继承此类"""
@@ -18,11 +59,17 @@ class BasePlugin(ABC):
     PLUGIN_VERSION = "1.0.0"            # 版本号
     PLUGIN_AUTHOR = "Unknown"           # 作者
     PLUGIN_DESCRIPTION = ""             # 插件描述
+    SCHEMA_VERSION = 1                  # 插件表结构版本，表结构变化时递增
+    PLUGIN_REQUIRES: List[str] = []     # 依赖的插件 ID，依赖先于本插件初始化和加载
+    PLUGIN_ISOLATION = "thread"         # run_compute 的执行位置："thread" 数据库工作线程，"process" 计算进程池
 
     def __init__(self, db_manager, main_window):
         """
         初始化插件
 
+        重写了 create_ui 的插件在后台线程中实例化并执行 prepare，__init__ 中不能创建 Qt 控件；
+        未重写 create_ui 的插件（在 __init__ 中创建界面）在 GUI 线程中实例化
+
         Args:
             db_manager: 数据库管理器实例
             main_window: 主窗口实例（可用于访问全局数据等）
@@ -30,6 +77,7 @@ class BasePlugin(ABC):
         self.db = db_manager
         self.main_window = main_window
         self._enabled = True
+        self._change_subscriptions = []
 
         # 注册插件
         self.db.register_plugin(
@@ -44,6 +92,15 @@ class BasePlugin(ABC):
         """插件是否启用"""
         return self._enabled
 
+    @property
+    def async_db(self):
+        """
+        异步数据库接口 - 在工作线程执行查询，结果回调到 GUI 线程
+        用于加载大量数据，避免阻塞界面绘制
+        """
+        from .async_db import AsyncDatabase
+        return AsyncDatabase(self.db)
+
     @abstractmethod
     def get_ui(self):
         """
@@ -52,6 +109,22 @@ class BasePlugin(ABC):
         """
         pass
 
+    def prepare(self):
+        """
+        非界面初始化（建表、迁移、预热数据） - 在后台线程中执行，不能创建 Qt 控件 - 可重写
+        依赖的插件已先完成 prepare；只有重写了 create_ui 的插件才会调用
+        """
+        pass
+
+    def create_ui(self):
+        """在 GUI 线程中创建界面，prepare 之后调用 - 可重写"""
+        pass
+
+    @classmethod
+    def builds_ui_separately(cls) -> bool:
+        """是否把界面创建放在 create_ui 中（可在后台线程实例化）"""
+        return cls.create_ui is not BasePlugin.create_ui
+
     def on_load(self):
         """插件加载时调用 - 可重写"""
         self.db.update_plugin_last_used(self.PLUGIN_ID)
@@ -64,6 +137,69 @@ class BasePlugin(ABC):
         """当插件所在标签页被选中时调用 - 可重写"""
         pass
 
+    def on_search_result(self, hit):
+        """
+        用户在全局搜索中打开了本插件的结果时调用（标签页已切换） - 可重写
+        hit 为 core.search.SearchHit，hit.ref 是表来源中行的 rowid
+        """
+        pass
+
+    def ensure_table(self, table_name: str, columns: Dict[str, str]):
+        """
+        确保插件的数据表存在 - 缺少的列自动补齐，并登记 SCHEMA_VERSION
+        版本升级时会调用 on_schema_upgrade
+        """
+        self.db.ensure_table(
+            table_name, columns,
+            owner=self.PLUGIN_ID,
+            version=self.SCHEMA_VERSION,
+            migrate=lambda old, new: self.on_schema_upgrade(table_name, old, new)
+        )
+
+    def on_schema_upgrade(self, table_name: str, old_version: int, new_version: int):
+        """
+        表结构版本升级时调用 - 可重写，用于回填新列等数据迁移
+        在与补齐列相同的事务中执行，抛出异常会回滚整个升级
+        """
+        pass
+
+    def run_compute(self, fn, *args, callback=None, error_callback=None, **kwargs) -> Future:
+        """
+        执行计算密集的函数，结果回调到界面线程
+
+        PLUGIN_ISOLATION = "process" 时在计算进程池中执行（不占用界面进程的 GIL，可用多核），
+        fn 必须是模块顶层函数，参数和返回值须可 pickle，较大的 NumPy 数组经共享内存传递；
+        否则在数据库工作线程中执行
+        """
+        if self.PLUGIN_ISOLATION == "process":
+            from .process_host import ProcessHost
+            return self.async_db.deliver(ProcessHost().submit(fn, *args, **kwargs), callback, error_callback)
+        return self.async_db.submit(fn, *args, callback=callback, error_callback=error_callback, **kwargs)
+
+    def subscribe_changes(self, callback, table_name: str = None):
+        """
+        订阅数据变更 - 表被写入并提交后在界面线程调用 callback(event)
+        event 为 core.events.ChangeEvent(table, op, rowids, keys, since)；插件卸载时自动取消
+        """
+        notifier = getattr(self.main_window, "db_notifier", None)
+        if notifier is not None:
+            self._change_subscriptions.append(notifier.subscribe(callback, table_name))
+
+    def unsubscribe_changes(self):
+        """取消本插件的所有变更订阅"""
+        for unsubscribe in self._change_subscriptions:
+            unsubscribe()
+        self._change_subscriptions.clear()
+
+    def register_search(self, table_name: str, columns: List[str], title_column: str = None):
+        """
+        登记可被全局搜索的表列 - 在数据库工作线程建立全文索引，之后随写入增量更新
+        title_column 作为结果标题，默认 columns 的第一列
+        """
+        self.async_db.submit(self.db.search.register_table, table_name, list(columns),
+                             title_column, self.PLUGIN_ID,
+                             error_callback=lambda e: print(f"登记搜索索引失败 {table_name}: {e}"))
+
     def get_global_data(self, key: str, default: Any = None) -> Any:
         """获取全局数据"""
         return self.db.get_global_data(key, default)
@@ -84,81 +220,399 @@ class BasePlugin(ABC):
 class PluginManager:
     """插件管理器"""
 
-    def __init__(self, db_manager, main_window):
+    def __init__(self, db_manager, main_window, plugins_dir: str = None):
         self.db = db_manager
         self.main_window = main_window
         self._plugins: Dict[str, BasePlugin] = {}
         self._plugin_classes: Dict[str, Type[BasePlugin]] = {}
-
-        # 插件目录
-        self.plugins_dir = os.path.join(
+        self._plugin_infos: Dict[str, PluginInfo] = {}
+        # 后台准备（导入 + prepare）的结果：Future 的值为已准备好的插件实例，
+        # 在 __init__ 中创建界面的插件为 None（只完成导入）
+        self._prepare_futures: Dict[str, Future] = {}
+        self._prepare_executors: List[ThreadPoolExecutor] = []
+        # 每个插件一把导入锁，避免后台线程和 GUI 线程同时导入同一模块
+        self._import_locks: Dict[str, threading.Lock] = {}
+        self._import_locks_guard = threading.Lock()
+
+        # 插件目录，可用环境变量 MHTOOLS_PLUGINS_DIR 指定（目录名须为 plugins 且其上级在 sys.path 中）
+        self.plugins_dir = plugins_dir or os.environ.get("MHTOOLS_PLUGINS_DIR") or os.path.join(
             os.path.dirname(os.path.dirname(__file__)), "plugins"
         )
 
+    # ==================== 插件发现 ====================
+
     def discover_plugins(self) -> List[str]:
-        """发现并加载插件"""
+        """发现插件 - 只读取清单/解析源码，不导入插件模块"""
         plugin_ids = []
+        self._plugin_infos.clear()
+        # 未加载插件的类缓存和准备结果作废，刷新后重新导入
+        self._plugin_classes = {pid: cls for pid, cls in self._plugin_classes.items() if pid in self._plugins}
+        self._prepare_futures = {pid: f for pid, f in self._prepare_futures.items() if pid in self._plugins}
 
         if not os.path.exists(self.plugins_dir):
             os.makedirs(self.plugins_dir, exist_ok=True)
             return plugin_ids
 
+        cache = self.db.get_plugin_cache()
+        changed = {}
+        items = sorted(os.listdir(self.plugins_dir))
+
         # 遍历插件目录
-        for item in os.listdir(self.plugins_dir):
+        for item in items:
             plugin_path = os.path.join(self.plugins_dir, item)
+            init_file = os.path.join(plugin_path, "__init__.py")
 
             # 检查是否是有效的插件目录
-            if os.path.isdir(plugin_path):
-                init_file = os.path.join(plugin_path, "__init__.py")
+            fingerprint = self._fingerprint(plugin_path)
+            if fingerprint is None:
+                continue
+
+            cached = cache.get(item)
+            infos = self._infos_from_cache(cached[1]) if cached and cached[0] == fingerprint else None
+            if infos is None:
+                try:
+                    infos = self._read_plugin_package(item, plugin_path, init_file)
+                except Exception as e:
+                    print(f"读取插件 {item} 失败: {e}")
+                    continue
+                changed[item] = (fingerprint, [info._asdict() for info in infos])
+
+            for info in infos:
+                self._plugin_infos[info.plugin_id] = info
+                plugin_ids.append(info.plugin_id)
+                print(f"发现插件: {info.name} v{info.version}")
+
+        removed = {item: cache[item][1] for item in cache if item not in items}
+        self._store_discovery(changed, removed)
+
+        return self._check_dependencies(plugin_ids)
+
+    def _read_plugin_package(self, item: str, plugin_path: str, init_file: str) -> List[PluginInfo]:
+        """读取插件包的元数据：清单 > AST 解析 > 导入模块"""
+        infos = self._read_manifest(item, plugin_path) or self._parse_plugin_source(item, init_file)
+        if not infos:
+            # 元数据不是字面量，只能导入模块读取
+            infos = self._import_plugin_infos(item)
+        return infos
+
+    def _store_discovery(self, changed: Dict[str, Tuple[str, List[Dict[str, Any]]]],
+                         removed: Dict[str, List[Dict[str, Any]]]):
+        """
+        保存发现结果到缓存，并更新全局搜索中的插件文档
+
+        Args:
+            changed: {插件目录名: (指纹, 元数据列表)}
+            removed: {已删除的插件目录名: 原元数据列表}
+        """
+        if not changed and not removed:
+            return
+        # 插件名称和描述参与全局搜索（未加载的插件也能搜到），只更新有变化的插件
+        from .search import PLUGIN_SOURCE
+        with self.db.transaction():
+            self.db.update_plugin_cache(changed, list(removed))
+            for metadata in removed.values():
+                for entry in metadata:
+                    self.db.search.remove_document(PLUGIN_SOURCE, entry['plugin_id'])
+            for _, metadata in changed.values():
+                for entry in metadata:
+                    self.db.search.index_document(PLUGIN_SOURCE, entry['plugin_id'], entry['name'],
+                                                  entry['description'])
+
+    def _check_dependencies(self, plugin_ids: List[str]) -> List[str]:
+        """剔除依赖缺失或存在循环依赖的插件"""
+        resolved = set(self.resolve_order(plugin_ids))
+        valid = [pid for pid in plugin_ids if pid in resolved]
+        for pid in set(plugin_ids) - set(valid):
+            self._plugin_infos.pop(pid, None)
+        return valid
+
+    def resolve_order(self, plugin_ids: List[str]) -> List[str]:
+        """
+        按依赖关系排序（依赖在前），依赖缺失或处于循环中的插件不出现在结果中
+        """
+        order: List[str] = []
+        state: Dict[str, str] = {}   # visiting / done / bad
+
+        def visit(pid: str, path: List[str]) -> bool:
+            if state.get(pid) == 'done':
+                return True
+            if state.get(pid) == 'bad':
+                return False
+            if state.get(pid) == 'visiting':
+                print(f"插件循环依赖: {' -> '.join(path + [pid])}")
+                return False
+            info = self._plugin_infos.get(pid)
+            if info is None:
+                if path:
+                    print(f"插件 {path[-1]} 依赖的插件 {pid} 不存在")
+                else:
+                    print(f"插件 {pid} 不存在")
+                return False
+            state[pid] = 'visiting'
+            ok = all([visit(dep, path + [pid]) for dep in info.requires])
+            state[pid] = 'done' if ok else 'bad'
+            if ok:
+                order.append(pid)
+            return ok
+
+        for pid in plugin_ids:
+            visit(pid, [])
+        return order
+
+    @staticmethod
+    def _fingerprint(plugin_path: str) -> Optional[str]:
+        """
+        插件源文件指纹（包内所有 .py 文件与清单的路径、修改时间和大小），不是插件目录时返回 None
+        元数据回退到导入模块读取时可能来自子模块，因此子模块变化也会使缓存失效
+        """
+        if not os.path.isfile(os.path.join(plugin_path, "__init__.py")):
+            return None
+        parts = [f"v{_CACHE_VERSION}"]
+        for root, dirs, files in os.walk(plugin_path):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                if not (name.endswith(".py") or name == MANIFEST_FILE):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                parts.append(f"{os.path.relpath(path, plugin_path)}:{stat.st_mtime_ns}:{stat.st_size}")
+        return "|".join(parts)
+
+    @staticmethod
+    def _infos_from_cache(metadata: List[Dict[str, Any]]) -> Optional[List[PluginInfo]]:
+        """缓存的元数据还原为 PluginInfo，格式不符时返回 None（重新解析）"""
+        try:
+            return [PluginInfo(**dict(entry, requires=tuple(entry['requires']))) for entry in metadata]
+        except (TypeError, KeyError):
+            return None
+
+    @staticmethod
+    def _make_info(item: str, meta: Dict[str, Any], class_name: Optional[str]) -> Optional[PluginInfo]:
+        """由 PLUGIN_* 常量构造元数据，缺少 PLUGIN_ID 时返回 None"""
+        plugin_id = meta.get('PLUGIN_ID')
+        if not plugin_id:
+            return None
+        return PluginInfo(
+            plugin_id=plugin_id,
+            name=meta.get('PLUGIN_NAME', plugin_id),
+            version=meta.get('PLUGIN_VERSION', BasePlugin.PLUGIN_VERSION),
+            author=meta.get('PLUGIN_AUTHOR', BasePlugin.PLUGIN_AUTHOR),
+            description=meta.get('PLUGIN_DESCRIPTION', ""),
+            module=f"plugins.{item}",
+            class_name=class_name,
+            requires=tuple(meta.get('PLUGIN_REQUIRES', ())),
+        )
 
-                if os.path.exists(init_file):
+    def _read_manifest(self, item: str, plugin_path: str) -> List[PluginInfo]:
+        """读取 plugin.json 清单；清单可选，键为 id/name/version/author/description/class"""
+        manifest_file = os.path.join(plugin_path, MANIFEST_FILE)
+        if not os.path.isfile(manifest_file):
+            return []
+        with open(manifest_file, encoding="utf-8") as f:
+            manifest = json.load(f)
+        meta = {const: manifest[key] for key, const in _MANIFEST_KEYS.items() if key in manifest}
+        info = self._make_info(item, meta, manifest.get('class'))
+        if info is None:
+            raise ValueError(f"{MANIFEST_FILE} 缺少 id")
+        return [info]
+
+    def _parse_plugin_source(self, item: str, init_file: str) -> List[PluginInfo]:
+        """
+        用 AST 解析 __init__.py，读取类体中以字面量赋值（含带注解的赋值）的 PLUGIN_* 常量
+        有 PLUGIN_* 常量不是字面量时返回空列表，由调用方导入模块读取，避免遗漏依赖等元数据
+        """
+        with open(init_file, "rb") as f:
+            tree = ast.parse(f.read(), filename=init_file)
+
+        infos = []
+        for node in tree.body:
+            if not isinstance(node, ast.ClassDef):
+                continue
+            meta = {}
+            for stmt in node.body:
+                if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+                    target, value = stmt.targets[0], stmt.value
+                elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+                    target, value = stmt.target, stmt.value
+                else:
+                    continue
+                if isinstance(target, ast.Name) and target.id.startswith("PLUGIN_"):
                     try:
-                        # 动态导入插件模块
-                        module_name = f"plugins.{item}"
+                        meta[target.id] = ast.literal_eval(value)
+                    except ValueError:
+                        return []
+            info = self._make_info(item, meta, node.name)
+            if info is not None:
+                infos.append(info)
+        return infos
+
+    def _import_plugin_infos(self, item: str) -> List[PluginInfo]:
+        """导入插件模块获取元数据（无清单且 AST 无法解析时的后备方式）"""
+        infos = []
+        for plugin_class in self._import_plugin_classes(f"plugins.{item}"):
+            self._plugin_classes[plugin_class.PLUGIN_ID] = plugin_class
+            meta = {const: getattr(plugin_class, const) for const in _MANIFEST_KEYS.values()}
+            infos.append(self._make_info(item, meta, plugin_class.__name__))
+        return infos
+
+    @staticmethod
+    def _purge_modules(module_name: str):
+        """清除插件包及其子模块的导入缓存，下次导入时重新执行源码"""
+        for name in [name for name in sys.modules if name == module_name or name.startswith(module_name + ".")]:
+            del sys.modules[name]
+        importlib.invalidate_caches()
+
+    @classmethod
+    def _import_plugin_classes(cls, module_name: str) -> List[Type[BasePlugin]]:
+        """导入插件模块（清除旧的模块缓存），返回其中的插件类"""
+        cls._purge_modules(module_name)
+        module = importlib.import_module(module_name)
+        return [obj for _, obj in inspect.getmembers(module, inspect.isclass)
+                if issubclass(obj, BasePlugin) and obj is not BasePlugin and hasattr(obj, 'PLUGIN_ID')]
+
+    def _get_plugin_class(self, plugin_id: str) -> Optional[Type[BasePlugin]]:
+        """插件类 - 首次需要时才导入插件模块（线程安全）"""
+        with self._import_locks_guard:
+            lock = self._import_locks.setdefault(plugin_id, threading.Lock())
+        with lock:
+            plugin_class = self._plugin_classes.get(plugin_id)
+            if plugin_class is not None:
+                return plugin_class
+            info = self._plugin_infos.get(plugin_id)
+            if info is None:
+                return None
+
+            for cls in self._import_plugin_classes(info.module):
+                if cls.PLUGIN_ID == plugin_id and (info.class_name is None or cls.__name__ == info.class_name):
+                    self._plugin_classes[plugin_id] = cls
+                    return cls
+            print(f"插件模块 {info.module} 中没有 PLUGIN_ID 为 {plugin_id} 的插件类")
+            return None
+
+    def get_plugin_info(self, plugin_id: str) -> Optional[PluginInfo]:
+        """获取已发现插件的元数据"""
+        return self._plugin_infos.get(plugin_id)
+
+    def get_plugin_infos(self) -> List[PluginInfo]:
+        """获取所有已发现插件的元数据"""
+        return list(self._plugin_infos.values())
 
-                        # 刷新时先清除旧的模块缓存
-                        if module_name in sys.modules:
-                            del sys.modules[module_name]
+    # ==================== 后台准备 ====================
 
-                        # 使用 importlib 直接导入
-                        module = importlib.import_module(module_name)
+    def prepare_plugins(self, plugin_ids: List[str] = None, max_workers: int = None,
+                        on_ready=None) -> Dict[str, Future]:
+        """
+        在线程池中按依赖拓扑顺序并行准备插件：导入模块，对重写了 create_ui 的插件
+        实例化并执行 prepare。插件在其依赖准备完成后才开始，依赖失败时一并失败
+
+        Args:
+            on_ready: on_ready(plugin_id) 在插件准备完成（成功或失败）时于工作线程中调用
+        Returns:
+            {插件ID: Future}
+        """
+        if plugin_ids is None:
+            plugin_ids = list(self._plugin_infos)
+        order = [pid for pid in self.resolve_order(plugin_ids)
+                 if pid not in self._plugins and pid not in self._prepare_futures]
+        if not order:
+            return {}
+
+        # 导入和 prepare 多为文件/数据库 IO，线程数不按 CPU 核数限制
+        executor = ThreadPoolExecutor(max_workers=max_workers or min(8, len(order)),
+                                      thread_name_prefix="plugin-prepare")
+        futures = {}
+        # 按拓扑顺序提交：任务开始执行时，它的依赖都已在执行或已完成，等待依赖不会死锁
+        for pid in order:
+            deps = [self._prepare_futures[dep] for dep in self._plugin_infos[pid].requires
+                    if dep in self._prepare_futures]
+            future = executor.submit(self._prepare_in_worker, pid, deps)
+            if on_ready is not None:
+                future.add_done_callback(lambda f, pid=pid: on_ready(pid))
+            self._prepare_futures[pid] = futures[pid] = future
+        executor.shutdown(wait=False)
+        self._prepare_executors.append(executor)
+        return futures
+
+    def _prepare_in_worker(self, plugin_id: str, deps: List[Future]) -> Optional[BasePlugin]:
+        """工作线程中执行 - 等待依赖后准备插件，结束时释放本线程的数据库连接"""
+        try:
+            for dep in deps:
+                dep.result()
+            return self._prepare(plugin_id)
+        finally:
+            self.db.release_connection()
+
+    def _prepare(self, plugin_id: str) -> Optional[BasePlugin]:
+        """导入插件类；界面单独创建的插件实例化并执行 prepare"""
+        plugin_class = self._get_plugin_class(plugin_id)
+        if plugin_class is None:
+            raise ImportError(f"找不到插件类 {plugin_id}")
+        if not plugin_class.builds_ui_separately():
+            return None
+        # 插件初始化期间的查询归属到该插件
+        with self.db.plugin_context(plugin_id):
+            plugin = plugin_class(self.db, self.main_window)
+            plugin.prepare()
+        return plugin
 
-                        # 查找插件类
-                        for name, obj in inspect.getmembers(module, inspect.isclass):
-                            if (issubclass(obj, BasePlugin) and
-                                obj != BasePlugin and
-                                hasattr(obj, 'PLUGIN_ID')):
-                                self._plugin_classes[obj.PLUGIN_ID] = obj
-                                plugin_ids.append(obj.PLUGIN_ID)
-                                print(f"发现插件: {obj.PLUGIN_NAME} v{obj.PLUGIN_VERSION}")
+    def is_prepared(self, plugin_id: str) -> bool:
+        """插件是否可以立即加载（后台准备已结束或未在后台准备）"""
+        future = self._prepare_futures.get(plugin_id)
+        return future is None or future.done()
 
-                    except Exception as e:
-                        print(f"加载插件 {item} 失败: {e}")
+    def shutdown(self):
+        """取消尚未开始的后台准备并等待进行中的完成 - 关闭数据库前调用"""
+        for future in self._prepare_futures.values():
+            future.cancel()
+        while self._prepare_executors:
+            self._prepare_executors.pop().shutdown(wait=True)
 
-        return plugin_ids
+    # ==================== 加载与卸载 ====================
 
     def load_plugin(self, plugin_id: str) -> Optional[BasePlugin]:
-        """加载指定插件"""
+        """
+        加载指定插件（GUI 线程） - 先加载依赖，使用后台准备的结果（尚未完成时等待），
+        没有后台准备时就地导入并初始化，然后创建界面
+        """
         if plugin_id in self._plugins:
             return self._plugins[plugin_id]
 
-        plugin_class = self._plugin_classes.get(plugin_id)
-        if not plugin_class:
-            return None
+        info = self._plugin_infos.get(plugin_id)
+        for dep in info.requires if info else ():
+            if self.load_plugin(dep) is None:
+                print(f"插件 {plugin_id} 的依赖 {dep} 加载失败")
+                return None
 
         try:
-            # 创建插件实例
-            plugin = plugin_class(self.db, self.main_window)
-            self._plugins[plugin_id] = plugin
+            future = self._prepare_futures.get(plugin_id)
+            plugin = future.result() if future is not None else self._prepare(plugin_id)
+        except Exception as e:
+            print(f"准备插件 {plugin_id} 失败: {e}")
+            self._prepare_futures.pop(plugin_id, None)
+            return None
 
-            # 调用加载回调
-            plugin.on_load()
+        try:
+            # 插件初始化期间的查询归属到该插件
+            with self.db.plugin_context(plugin_id):
+                if plugin is None:
+                    # 在 __init__ 中创建界面的插件只能在 GUI 线程实例化
+                    plugin = self._plugin_classes[plugin_id](self.db, self.main_window)
+                else:
+                    plugin.create_ui()
+                self._plugins[plugin_id] = plugin
+
+                # 调用加载回调
+                plugin.on_load()
 
             print(f"插件 {plugin.PLUGIN_NAME} 加载成功")
             return plugin
 
         except Exception as e:
             print(f"实例化插件 {plugin_id} 失败: {e}")
+            self._prepare_futures.pop(plugin_id, None)
             return None
 
     def unload_plugin(self, plugin_id: str):
@@ -166,9 +620,13 @@ class PluginManager:
         plugin = self._plugins.get(plugin_id)
         if plugin:
             try:
-                plugin.on_unload()
+                with self.db.plugin_context(plugin_id):
+                    plugin.on_unload()
             except Exception as e:
                 print(f"插件卸载回调失败: {e}")
+            plugin.unsubscribe_changes()
+            self.db.search.unregister_plugin(plugin_id)
+            self._prepare_futures.pop(plugin_id, None)
 
             del self._plugins[plugin_id]
             print(f"插件 {plugin.PLUGIN_NAME} 已卸载")
@@ -182,18 +640,133 @@ class PluginManager:
         return self._plugins.get(plugin_id)
 
     def reload_plugin(self, plugin_id: str) -> Optional[BasePlugin]:
-        """重新加载插件"""
-        self.unload_plugin(plugin_id)
-        return self.load_plugin(plugin_id)
+        """重新加载插件 - 重新导入插件所在的包（见 reload_package）"""
+        info = self._plugin_infos.get(plugin_id)
+        if info is None:
+            return None
+        return self.reload_package(info.module.rsplit(".", 1)[-1]).get(plugin_id)
+
+    # ==================== 热重载 ====================
+
+    def package_for_path(self, path: str) -> Optional[str]:
+        """文件或目录所属的插件包（插件目录下的一级目录名），不在插件包内时返回 None"""
+        try:
+            relative = os.path.relpath(os.path.abspath(path), os.path.abspath(self.plugins_dir))
+        except ValueError:
+            return None
+        item = relative.split(os.sep)[0]
+        if item in (os.curdir, os.pardir, "") or item == "__pycache__":
+            return None
+        return item
+
+    def changed_packages(self) -> List[str]:
+        """插件目录中新增或删除的插件包（与当前已发现的插件比较）"""
+        known = {info.module.rsplit(".", 1)[-1] for info in self._plugin_infos.values()}
+        try:
+            present = {item for item in os.listdir(self.plugins_dir)
+                       if os.path.isfile(os.path.join(self.plugins_dir, item, "__init__.py"))}
+        except OSError:
+            present = set()
+        return sorted(known ^ present)
+
+    def watch_paths(self) -> List[str]:
+        """需要监视的路径：插件目录、各插件包的目录（含子目录）和其中的 .py 与清单文件"""
+        paths = [self.plugins_dir]
+        if not os.path.isdir(self.plugins_dir):
+            return paths
+        for item in os.listdir(self.plugins_dir):
+            plugin_path = os.path.join(self.plugins_dir, item)
+            if not os.path.isfile(os.path.join(plugin_path, "__init__.py")):
+                continue
+            for root, dirs, files in os.walk(plugin_path):
+                dirs[:] = [d for d in dirs if d != "__pycache__"]
+                paths.append(root)
+                paths.extend(os.path.join(root, name) for name in files
+                             if name.endswith(".py") or name == MANIFEST_FILE)
+        return paths
+
+    def reload_package(self, item: str) -> Dict[str, Optional[BasePlugin]]:
+        """
+        热重载插件包 - 清除该包及其子模块的导入缓存并重新读取元数据；
+        包内已加载的插件和依赖它们的已加载插件先卸载，再用新代码重新加载。
+        其他插件的实例、界面和缓存保持不变
+
+        Args:
+            item: 插件目录名
+        Returns:
+            {受影响的插件ID: 新的插件实例}，未加载、加载失败或已删除的插件为 None
+        """
+        module = f"plugins.{item}"
+        old_ids = [pid for pid, info in self._plugin_infos.items() if info.module == module]
+
+        # 依赖包内插件的插件引用着旧模块中的对象，一并重载
+        affected = list(old_ids)
+        for pid in self.resolve_order(list(self._plugin_infos)):
+            if pid not in affected and set(self._plugin_infos[pid].requires) & set(affected):
+                affected.append(pid)
+        reload_ids = [pid for pid in affected if pid in self._plugins]
+        for pid in reversed(reload_ids):
+            self.unload_plugin(pid)
+
+        # 等待进行中的后台准备结束，避免它用旧代码写回类缓存
+        pending = [self._prepare_futures.pop(pid) for pid in affected if pid in self._prepare_futures]
+        wait(pending)
+        for module_name in {self._plugin_infos[pid].module for pid in affected}:
+            self._purge_modules(module_name)
+        for pid in affected:
+            self._plugin_classes.pop(pid, None)
+        # 计算进程中缓存着旧模块，重启进程池
+        from .process_host import ProcessHost
+        ProcessHost.restart_instance()
+        for pid in old_ids:
+            del self._plugin_infos[pid]
+
+        # 重新读取元数据并更新发现缓存
+        plugin_path = os.path.join(self.plugins_dir, item)
+        fingerprint = self._fingerprint(plugin_path)
+        new_infos = []
+        if fingerprint is not None:
+            try:
+                new_infos = self._read_plugin_package(item, plugin_path, os.path.join(plugin_path, "__init__.py"))
+            except Exception as e:
+                print(f"读取插件 {item} 失败: {e}")
+        for info in new_infos:
+            self._plugin_infos[info.plugin_id] = info
+        self._check_dependencies(list(self._plugin_infos))
+        new_ids = [info.plugin_id for info in new_infos]
+        gone = {item: [{'plugin_id': pid} for pid in old_ids if pid not in new_ids]}
+        if new_infos:
+            self._store_discovery({item: (fingerprint, [info._asdict() for info in new_infos])}, {})
+            # 包仍在，只移除不再存在的插件的搜索文档
+            from .search import PLUGIN_SOURCE
+            for entry in gone[item]:
+                self.db.search.remove_document(PLUGIN_SOURCE, entry['plugin_id'])
+        else:
+            self._store_discovery({}, gone)
+
+        result: Dict[str, Optional[BasePlugin]] = {}
+        for pid in dict.fromkeys(affected + new_ids):
+            result[pid] = self.load_plugin(pid) if pid in reload_ids and pid in self._plugin_infos else None
+        print(f"插件包 {item} 已重新加载")
+        return result
 
     def get_plugin_tabs(self) -> List[Dict]:
         """获取所有插件的标签页信息"""
         tabs = []
         for plugin in self._plugins.values():
+            with self.db.plugin_context(plugin.PLUGIN_ID):
+                ui = plugin.get_ui()
             tabs.append({
                 'id': plugin.PLUGIN_ID,
                 'name': plugin.PLUGIN_NAME,
                 'description': plugin.PLUGIN_DESCRIPTION,
-                'ui': plugin.get_ui()
+                'ui': ui
             })
         return tabs
+
+    def tab_selected(self, plugin_id: str):
+        """通知插件其标签页被选中"""
+        plugin = self._plugins.get(plugin_id)
+        if plugin:
+            with self.db.plugin_context(plugin_id):
+                plugin.on_tab_selected()
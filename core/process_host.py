@@ -0,0 +1,206 @@
+"""
+插件计算进程宿主 - PLUGIN_ISOLATION = "process" 的插件把计算密集的函数放到进程池中执行，
+计算不占用 GUI 进程的 GIL，界面保持流畅，多个计算可同时使用多个 CPU 核
+
+较大的 NumPy 数组参数和返回值经 multiprocessing.shared_memory 传递：发送方把数组复制进共享内存，
+只把 (名称, 形状, dtype) 通过管道发给对方，接收方直接映射读取，不做 pickle 序列化。
+计算函数必须是模块顶层函数（子进程按模块名导入），不能是 lambda、闭包或绑定方法。
+"""
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 没有 numpy 时所有参数都经 pickle 传递
+    np = None
+
+
+# 不小于该字节数的数组经共享内存传递，更小的数组 pickle 更快
+SHARED_MEMORY_MIN_BYTES = 64 * 1024
+
+
+class SharedArray(NamedTuple):
+    """共享内存中的数组描述，代替数组本身在进程间传递"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+# ==================== 共享内存编解码 ====================
+
+def _share(array) -> Tuple[SharedArray, SharedMemory]:
+    """把数组复制到新建的共享内存"""
+    shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return SharedArray(shm.name, array.shape, array.dtype.str), shm
+
+
+def _attach(ref: SharedArray) -> Tuple[Any, SharedMemory]:
+    """映射共享内存中的数组（不复制）"""
+    shm = SharedMemory(name=ref.name)
+    return np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=shm.buf), shm
+
+
+def _pack(value, segments: List[SharedMemory]):
+    """把 value（及其中 tuple/list/dict 的元素）里的大数组换成 SharedArray，新建的共享内存加入 segments"""
+    if np is None:
+        return value
+    if isinstance(value, np.ndarray):
+        if value.nbytes < SHARED_MEMORY_MIN_BYTES or value.dtype.hasobject:
+            return value
+        ref, shm = _share(value)
+        segments.append(shm)
+        return ref
+    if isinstance(value, SharedArray):
+        return value
+    if isinstance(value, (tuple, list)):
+        packed = [_pack(item, segments) for item in value]
+        return type(value)(packed) if type(value) in (tuple, list) else type(value)(*packed)
+    if isinstance(value, dict):
+        return {key: _pack(item, segments) for key, item in value.items()}
+    return value
+
+
+def _unpack(value, segments: List[SharedMemory], copy: bool = False):
+    """把 value 中的 SharedArray 换回数组；copy=False 时是共享内存的视图，打开的共享内存加入 segments"""
+    if isinstance(value, SharedArray):
+        array, shm = _attach(value)
+        segments.append(shm)
+        return array.copy() if copy else array
+    if isinstance(value, (tuple, list)):
+        unpacked = [_unpack(item, segments, copy) for item in value]
+        return type(value)(unpacked) if type(value) in (tuple, list) else type(value)(*unpacked)
+    if isinstance(value, dict):
+        return {key: _unpack(item, segments, copy) for key, item in value.items()}
+    return value
+
+
+def _close(segments: List[SharedMemory], unlink: bool = False):
+    """关闭（并删除）共享内存"""
+    for shm in segments:
+        try:
+            shm.close()
+        except BufferError:
+            # 计算函数仍持有视图（如存进了全局变量），映射随进程退出释放
+            pass
+        if unlink:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _run_in_worker(fn: Callable, args: tuple, kwargs: dict):
+    """子进程中执行 - 映射共享内存参数，调用计算函数，大数组结果写入新的共享内存"""
+    inputs: List[SharedMemory] = []
+    outputs: List[SharedMemory] = []
+    try:
+        result = fn(*_unpack(args, inputs), **_unpack(kwargs, inputs))
+        # 结果的共享内存由主进程读取后删除，这里只关闭本进程的映射
+        packed = _pack(result, outputs)
+        del result
+        return packed
+    finally:
+        _close(inputs)
+        _close(outputs)
+
+
+# ==================== 进程宿主 ====================
+
+class ProcessHost:
+    """
+    插件计算进程池（单例）
+
+    submit() 返回 concurrent.futures.Future，结果中的共享内存数组在主进程中复制为普通数组。
+    进程池在首次提交时才启动；子进程用 spawn 方式创建，不继承 GUI 进程的 Qt 状态。
+
+    示例:
+        future = ProcessHost().submit(compute_indicators, closes, periods=(7, 30))
+    """
+
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self, max_workers: int = None):
+        if self._initialized:
+            return
+        self._initialized = True
+
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """在子进程中执行 fn(*args, **kwargs)"""
+        inputs: List[SharedMemory] = []
+        try:
+            packed_args = _pack(args, inputs)
+            packed_kwargs = _pack(kwargs, inputs)
+            task = self._get_executor().submit(_run_in_worker, fn, packed_args, packed_kwargs)
+        except BaseException:
+            _close(inputs, unlink=True)
+            raise
+
+        future = Future()
+        future.set_running_or_notify_cancel()
+        task.add_done_callback(lambda f: self._finish(f, future, inputs))
+        return future
+
+    @staticmethod
+    def _finish(task: Future, future: Future, inputs: List[SharedMemory]):
+        """结果回到主进程 - 删除参数的共享内存，把结果中的共享内存数组复制出来后删除"""
+        _close(inputs, unlink=True)
+        if task.cancelled():
+            future.set_exception(RuntimeError("计算进程池已关闭"))
+            return
+        error = task.exception()
+        if error is not None:
+            future.set_exception(error)
+            return
+        outputs: List[SharedMemory] = []
+        try:
+            future.set_result(_unpack(task.result(), outputs, copy=True))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            _close(outputs, unlink=True)
+
+    def restart(self):
+        """
+        重启进程池 - 插件热重载后调用，子进程中缓存的旧模块随旧进程退出；
+        进行中的计算在旧进程中继续完成
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @classmethod
+    def restart_instance(cls):
+        """重启已创建的进程宿主的进程池（未创建过时不做任何事）"""
+        if cls._instance is not None:
+            cls._instance.restart()
+
+    def shutdown(self, wait: bool = True):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        ProcessHost._instance = None
+
+    @classmethod
+    def shutdown_instance(cls, wait: bool = True):
+        """关闭已创建的进程宿主（未创建过时不做任何事）"""
+        if cls._instance is not None:
+            cls._instance.shutdown(wait)
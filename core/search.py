@@ -0,0 +1,289 @@
+"""
+全文检索 - 基于 SQLite FTS5 的跨插件搜索索引
+
+索引由若干"来源"组成：
+- 表来源：register_table 登记插件表的若干文本列，首次登记（或列定义变化）时整表建索引，
+  之后通过变更事件总线按 rowid 增量更新（insert/update/delete），批量写入时补齐新行或重建
+- 文档来源：index_document / remove_document 直接写入任意文档，如插件名称和描述
+
+文档与 FTS 行的对应关系保存在 _system_search_docs（source, ref -> id），FTS 的 rowid 即文档 id，
+增删单个文档只需按唯一索引定位，不扫描 FTS 表。
+中文没有空格分词：写入时在每个汉字两侧插入零宽空格，unicode61 分词器会把每个汉字作为单独的词，
+查询时把查询词同样切分后作为短语匹配，即可用索引完成任意长度的中文子串匹配。
+索引是可重建的派生数据，不参与增量备份的变更跟踪。
+
+示例:
+    db.search.register_table("inventory_items", ["name", "note"], title_column="name",
+                             plugin_id="inventory_plugin")
+    hits = db.search.search("强化石")
+"""
+import json
+import re
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from .database import SEARCH_DOCS_TABLE, SEARCH_SOURCES_TABLE, SEARCH_TABLE, _IDENTIFIER_RE
+
+# 插件名称/描述所在的来源，ref 为插件 ID
+PLUGIN_SOURCE = "plugins"
+
+# 汉字（CJK 统一表意文字及扩展 A、兼容表意文字）和写入索引时插入的分隔符
+_CJK_RE = re.compile(r'([\u3400-\u9fff\uf900-\ufaff])')
+_SEPARATOR = '\u200b'
+
+# bm25 列权重：标题命中比正文重要
+_RANK_WEIGHTS = (10.0, 1.0)
+
+
+def segment(text: Any) -> str:
+    """把文本转换为索引形式 - 每个汉字两侧加零宽空格"""
+    if text is None:
+        return ""
+    return _CJK_RE.sub(_SEPARATOR + r'\1' + _SEPARATOR, str(text))
+
+
+def _display(text: str) -> str:
+    """索引形式还原为显示文本"""
+    return (text or "").replace(_SEPARATOR, "")
+
+
+class SearchHit(NamedTuple):
+    """一条搜索结果"""
+    source: str
+    ref: Any
+    title: str
+    snippet: str
+    plugin_id: Optional[str]
+    rank: float
+
+
+class SearchIndex:
+    """FTS5 全文检索索引"""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        # {来源: (登记信息, 取消变更订阅的函数)}
+        self._sources: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._init_tables()
+
+    def _init_tables(self):
+        conn = self._conn()
+        with self.db.transaction():
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)).fetchone()
+            if not exists:
+                conn.execute(f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING "
+                             f"fts5(title, body, tokenize='unicode61 remove_diacritics 2')")
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {SEARCH_DOCS_TABLE} (
+                    id INTEGER PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    ref NOT NULL,
+                    UNIQUE (source, ref)
+                )
+            ''')
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {SEARCH_SOURCES_TABLE} (
+                    source TEXT PRIMARY KEY,
+                    plugin_id TEXT,
+                    signature TEXT
+                )
+            ''')
+
+    def _conn(self):
+        """当前线程的连接，注册建索引用的 SQL 函数 search_segment()"""
+        conn = self.db._get_conn()
+        conn.create_function("search_segment", 1, segment, deterministic=True)
+        return conn
+
+    # ==================== 表来源 ====================
+
+    def register_table(self, table_name: str, columns: Sequence[str], title_column: str = None,
+                       plugin_id: str = None, source: str = None):
+        """
+        登记可搜索的表 - 索引其中的文本列并随写入自动更新
+
+        Args:
+            columns: 参与检索的列
+            title_column: 作为结果标题的列，默认 columns 的第一列
+            plugin_id: 所属插件，点击结果时切换到该插件
+            source: 来源名，默认为表名
+        """
+        columns = list(columns)
+        title_column = title_column or columns[0]
+        for name in [table_name, title_column] + columns:
+            if not _IDENTIFIER_RE.match(name):
+                raise ValueError(f"非法表名/列名: {name!r}")
+        if not self.db.get_table_schema(table_name):
+            raise ValueError(f"表不存在: {table_name}")
+        source = source or table_name
+        spec = {'table': table_name, 'title': title_column, 'plugin_id': plugin_id,
+                'body': [c for c in columns if c != title_column]}
+
+        self.unregister(source)
+        row = self.db.fetch_one(f"SELECT signature FROM {SEARCH_SOURCES_TABLE} WHERE source = ?", (source,))
+        if row is None or row['signature'] != self._signature(spec):
+            self._rebuild(source, spec)
+        else:
+            # 上次运行之后可能有新增的行（如插件未加载时写入）
+            self._index_new_rows(source, spec)
+
+        unsubscribe = self.db.changes.subscribe(lambda event: self._on_change(source, spec, event), table_name)
+        with self._lock:
+            self._sources[source] = (spec, unsubscribe)
+
+    def unregister(self, source: str):
+        """停止跟踪来源的写入（已建立的索引保留）"""
+        with self._lock:
+            entry = self._sources.pop(source, None)
+        if entry:
+            entry[1]()
+
+    def unregister_plugin(self, plugin_id: str):
+        """停止跟踪某插件登记的所有表来源 - 插件卸载时调用"""
+        with self._lock:
+            sources = [s for s, (spec, _) in self._sources.items() if spec['plugin_id'] == plugin_id]
+        for source in sources:
+            self.unregister(source)
+
+    def rebuild(self, source: str):
+        """重建已登记来源的索引（例如绕过 DatabaseManager 直接执行 SQL 修改了表之后）"""
+        with self._lock:
+            spec = self._sources[source][0]
+        self._rebuild(source, spec)
+
+    @staticmethod
+    def _signature(spec: dict) -> str:
+        """索引定义的签名，变化时需要重建"""
+        return json.dumps([spec['table'], spec['title'], spec['body']])
+
+    def rebuild_all(self):
+        """重建所有已登记来源的索引，未登记的来源在下次登记时重建（从备份恢复后调用）"""
+        with self._lock:
+            registered = {source: spec for source, (spec, _) in self._sources.items()}
+        marks = ", ".join("?" * len(registered))
+        self.db.execute(f"UPDATE {SEARCH_SOURCES_TABLE} SET signature = NULL "
+                        f"WHERE source NOT IN ({marks})", tuple(registered))
+        for source, spec in registered.items():
+            self._rebuild(source, spec)
+
+    @staticmethod
+    def _row_values(spec: dict) -> str:
+        """源表行（别名 t）的 (标题, 正文) 表达式"""
+        body = " || ' ' || ".join(f"COALESCE(t.{c}, '')" for c in spec['body']) or "''"
+        return f"search_segment(t.{spec['title']}), search_segment({body})"
+
+    def _insert_rows(self, conn, source: str, spec: dict, condition: str, params: tuple):
+        """把源表中满足 condition 的行写入文档表和 FTS"""
+        conn.execute(f"INSERT OR IGNORE INTO {SEARCH_DOCS_TABLE} (source, ref) "
+                     f"SELECT ?, t.rowid FROM {spec['table']} t WHERE {condition}", (source,) + params)
+        conn.execute(f'''
+            INSERT INTO {SEARCH_TABLE} (rowid, title, body)
+            SELECT d.id, {self._row_values(spec)} FROM {spec['table']} t
+            JOIN {SEARCH_DOCS_TABLE} d ON d.source = ? AND d.ref = t.rowid
+            WHERE {condition}
+        ''', (source,) + params)
+
+    def _delete_docs(self, conn, source: str, condition: str = "1", params: tuple = ()):
+        """删除来源下满足 condition（作用于文档表 d）的文档"""
+        conn.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN "
+                     f"(SELECT d.id FROM {SEARCH_DOCS_TABLE} d WHERE d.source = ? AND {condition})",
+                     (source,) + params)
+        conn.execute(f"DELETE FROM {SEARCH_DOCS_TABLE} AS d WHERE d.source = ? AND {condition}",
+                     (source,) + params)
+
+    def _rebuild(self, source: str, spec: dict):
+        conn = self._conn()
+        with self.db.transaction():
+            self._delete_docs(conn, source)
+            self._insert_rows(conn, source, spec, "1", ())
+            conn.execute(f'''
+                INSERT INTO {SEARCH_SOURCES_TABLE} (source, plugin_id, signature) VALUES (?, ?, ?)
+                ON CONFLICT(source) DO UPDATE SET plugin_id = excluded.plugin_id, signature = excluded.signature
+            ''', (source, spec['plugin_id'], self._signature(spec)))
+
+    def _index_new_rows(self, source: str, spec: dict):
+        """索引 rowid 大于已索引最大值的行（批量插入没有逐行 rowid 时使用）"""
+        conn = self._conn()
+        with self.db.transaction():
+            last = conn.execute(f"SELECT MAX(ref) FROM {SEARCH_DOCS_TABLE} WHERE source = ?",
+                                (source,)).fetchone()[0]
+            self._insert_rows(conn, source, spec, "t.rowid > ?", (last or 0,))
+
+    def _reindex_rows(self, source: str, spec: dict, rowids: Sequence[int]):
+        conn = self._conn()
+        with self.db.transaction():
+            for start in range(0, len(rowids), 500):
+                chunk = tuple(rowids[start:start + 500])
+                marks = ", ".join("?" * len(chunk))
+                self._delete_docs(conn, source, f"d.ref IN ({marks})", chunk)
+                self._insert_rows(conn, source, spec, f"t.rowid IN ({marks})", chunk)
+
+    def _on_change(self, source: str, spec: dict, event):
+        """写入线程中执行 - 按事件增量维护索引"""
+        if event.rowids:
+            # 删除的行在源表中已不存在，_reindex_rows 只会移除其文档
+            self._reindex_rows(source, spec, event.rowids)
+        elif event.op == 'insert':
+            self._index_new_rows(source, spec)
+        else:
+            self._rebuild(source, spec)
+
+    # ==================== 文档来源 ====================
+
+    def index_document(self, source: str, ref: Any, title: str, body: str = ""):
+        """写入（或替换）一个文档"""
+        conn = self._conn()
+        with self.db.transaction():
+            doc_id = conn.execute(f'''
+                INSERT INTO {SEARCH_DOCS_TABLE} (source, ref) VALUES (?, ?)
+                ON CONFLICT(source, ref) DO UPDATE SET ref = excluded.ref
+                RETURNING id
+            ''', (source, ref)).fetchone()[0]
+            conn.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = ?", (doc_id,))
+            conn.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (?, ?, ?)",
+                         (doc_id, segment(title), segment(body)))
+
+    def remove_document(self, source: str, ref: Any):
+        """删除一个文档"""
+        conn = self._conn()
+        with self.db.transaction():
+            self._delete_docs(conn, source, "d.ref = ?", (ref,))
+
+    # ==================== 查询 ====================
+
+    def search(self, query: str, limit: int = 20, source: str = None) -> List[SearchHit]:
+        """
+        搜索 - 空格分隔的多个词需同时命中，按相关度（bm25，标题加权）排序
+
+        Args:
+            source: 只在指定来源中搜索
+        """
+        # 每个词作为短语（汉字逐字切分）；以字母数字结尾时最后一个词允许前缀匹配
+        phrases = ['"' + segment(term).replace('"', '""') + '"' + ("" if _CJK_RE.match(term[-1]) else " *")
+                   for term in query.split()]
+        if not phrases:
+            return []
+        where = f"{SEARCH_TABLE} MATCH ? AND rank MATCH ?"
+        params = [" ".join(phrases), f"bm25({_RANK_WEIGHTS[0]}, {_RANK_WEIGHTS[1]})"]
+        if source is not None:
+            where += f" AND rowid IN (SELECT id FROM {SEARCH_DOCS_TABLE} WHERE source = ?)"
+            params.append(source)
+        params.append(int(limit))
+
+        # 先在 FTS 内按相关度取前 limit 条，再关联文档表，摘要只为这些结果生成
+        rows = self.db.fetch_all(f'''
+            SELECT d.source, d.ref, s.title, s.snippet, src.plugin_id, s.rank
+            FROM (
+                SELECT rowid, title, snippet({SEARCH_TABLE}, 1, '[', ']', '…', 12) AS snippet, rank
+                FROM {SEARCH_TABLE} WHERE {where}
+                ORDER BY rank LIMIT ?
+            ) s
+            JOIN {SEARCH_DOCS_TABLE} d ON d.id = s.rowid
+            LEFT JOIN {SEARCH_SOURCES_TABLE} src ON src.source = d.source
+            ORDER BY s.rank
+        ''', tuple(params))
+        return [SearchHit(row['source'], row['ref'], _display(row['title']), _display(row['snippet']),
+                          row['ref'] if row['source'] == PLUGIN_SOURCE else row['plugin_id'],
+                          row['rank'])
+                for row in rows]
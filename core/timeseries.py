@@ -0,0 +1,522 @@
+"""
+时间序列存储 - 按块保存 (时间戳, 数值) 序列
+
+每个序列按时间切分成若干块，每块最多 BLOCK_SIZE 个点，时间戳（int64 秒级
+epoch）和数值（float64）分别打包为小端二进制 BLOB。按 (series, start_ts) 建
+唯一索引，范围读取只需取出少量块并拼接，不需要逐行构造 Python 对象。
+安装了 NumPy 时读取结果为连续的 numpy 数组，否则为 array.array。
+
+保留策略：为序列设置原始数据保留时长后，后台维护（run_maintenance）把原始点
+汇总为小时/天/周 OHLC，删除超出保留期的原始点并用 incremental_vacuum 回收空间。
+resample 自动从满足分辨率要求的最粗汇总读取，尚未汇总的部分由原始点补齐。
+
+示例:
+    ts = db.timeseries
+    ts.append("rate_history", int(time.time()), 7.21)
+    stamps, values = ts.range("rate_history", start, end)
+    ts.set_retention("rate_history", raw_max_age=90 * DAY)
+    bars = ts.resample("rate_history", start, end, DAY)   # {'bucket', 'open', 'high', 'low', 'close', ...}
+"""
+import bisect
+import json
+import sys
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 是可选依赖
+    np = None
+
+TS_TABLE = "_system_ts_blocks"
+ROLLUP_TABLE = "_system_ts_rollups"
+POLICY_TABLE = "_system_ts_policies"
+
+# 汇总分辨率（秒）
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+DEFAULT_RESOLUTIONS = (HOUR, DAY, WEEK)
+
+# OHLC 汇总的列，按时间排序的行可以逐级再汇总
+OHLC_COLUMNS = ('bucket', 'first_ts', 'last_ts', 'open', 'high', 'low', 'close', 'count')
+
+
+def _pack(typecode: str, values) -> bytes:
+    arr = array(typecode, values)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _unpack(typecode: str, blob: bytes) -> array:
+    arr = array(typecode)
+    arr.frombytes(blob)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+class TimeSeriesStore:
+    """
+    块式时间序列存储
+
+    同一时间戳重复写入时新值覆盖旧值。块表保留 rowid（而不是 WITHOUT ROWID），
+    这样增量备份可以按块追踪变化。
+    """
+
+    # 每块最多的点数
+    BLOCK_SIZE = 1024
+
+    def __init__(self, db):
+        self.db = db
+        # 天/周按本地时区的零点对齐
+        self.utc_offset = int(datetime.now().astimezone().utcoffset().total_seconds())
+        self.db.execute(f'''
+            CREATE TABLE IF NOT EXISTS {TS_TABLE} (
+                series TEXT NOT NULL,
+                start_ts INTEGER NOT NULL,
+                end_ts INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                ts BLOB NOT NULL,
+                vals BLOB NOT NULL
+            )
+        ''')
+        self.db.execute(f'''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_{TS_TABLE}_series_start_ts
+            ON {TS_TABLE} (series, start_ts)
+        ''')
+        self.db.execute(f'''
+            CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+                series TEXT NOT NULL,
+                resolution INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                first_ts INTEGER NOT NULL,
+                last_ts INTEGER NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                count INTEGER NOT NULL
+            )
+        ''')
+        self.db.execute(f'''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_{ROLLUP_TABLE}_series_resolution_bucket
+            ON {ROLLUP_TABLE} (series, resolution, bucket)
+        ''')
+        # rolled_upto: 早于它的原始点已汇总；pruned_before: 早于它的原始点已删除
+        self.db.execute(f'''
+            CREATE TABLE IF NOT EXISTS {POLICY_TABLE} (
+                series TEXT PRIMARY KEY,
+                raw_max_age INTEGER NOT NULL,
+                resolutions TEXT NOT NULL,
+                rolled_upto INTEGER,
+                pruned_before INTEGER,
+                last_run TEXT
+            )
+        ''')
+        for table in (TS_TABLE, ROLLUP_TABLE, POLICY_TABLE):
+            self.db._refresh_table_schema(table)
+        if self.db.is_change_tracking_enabled():
+            self.db.enable_change_tracking()
+
+    # ==================== 写入 ====================
+
+    def append(self, series: str, timestamp: int, value: float):
+        """写入一个点"""
+        self.extend(series, [(timestamp, value)])
+
+    def extend(self, series: str, points: Iterable[Tuple[int, float]]):
+        """
+        批量写入点 [(时间戳, 数值), ...]，顺序不限
+        与已有块重叠时合并重写这些块；末尾未满的块会被继续填满
+        """
+        new_points: Dict[int, float] = {int(t): float(v) for t, v in points}
+        if not new_points:
+            return
+        lo, hi = min(new_points), max(new_points)
+
+        with self.db.transaction() as conn:
+            blocks = conn.execute(f'''
+                SELECT start_ts, count, ts, vals FROM {TS_TABLE}
+                WHERE series = ? AND end_ts >= ? AND start_ts <= ?
+            ''', (series, lo, hi)).fetchall()
+            # 前一个未满的块一并合并，避免追加时产生大量小块
+            previous = conn.execute(f'''
+                SELECT start_ts, count, ts, vals FROM {TS_TABLE}
+                WHERE series = ? AND start_ts < ? ORDER BY start_ts DESC LIMIT 1
+            ''', (series, lo)).fetchone()
+            if previous is not None and previous['count'] < self.BLOCK_SIZE and \
+                    all(b['start_ts'] != previous['start_ts'] for b in blocks):
+                blocks.append(previous)
+
+            merged: Dict[int, float] = {}
+            for block in blocks:
+                merged.update(zip(_unpack('q', block['ts']), _unpack('d', block['vals'])))
+            merged.update(new_points)
+
+            if blocks:
+                conn.executemany(f"DELETE FROM {TS_TABLE} WHERE series = ? AND start_ts = ?",
+                                 [(series, b['start_ts']) for b in blocks])
+            self._write_blocks(conn, series, sorted(merged.items()))
+            self._rewind(conn, series, lo)
+            self.db._notify(TS_TABLE, 'insert', keys=(series,), since=lo)
+
+    def _write_blocks(self, conn, series: str, points: List[Tuple[int, float]]):
+        """按 BLOCK_SIZE 切分已排序的点并写入"""
+        rows = []
+        for i in range(0, len(points), self.BLOCK_SIZE):
+            chunk = points[i:i + self.BLOCK_SIZE]
+            rows.append((
+                series, chunk[0][0], chunk[-1][0], len(chunk),
+                _pack('q', (t for t, _ in chunk)), _pack('d', (v for _, v in chunk)),
+            ))
+        conn.executemany(f'''
+            INSERT INTO {TS_TABLE} (series, start_ts, end_ts, count, ts, vals)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+    def delete_range(self, series: str, start: Optional[int] = None, end: Optional[int] = None) -> int:
+        """删除 [start, end] 区间内的点，返回删除的点数"""
+        lo = -(1 << 63) if start is None else int(start)
+        hi = (1 << 63) - 1 if end is None else int(end)
+        removed = 0
+        with self.db.transaction() as conn:
+            blocks = conn.execute(f'''
+                SELECT start_ts, end_ts, count, ts, vals FROM {TS_TABLE}
+                WHERE series = ? AND end_ts >= ? AND start_ts <= ?
+            ''', (series, lo, hi)).fetchall()
+            kept: List[Tuple[int, float]] = []
+            for block in blocks:
+                if lo <= block['start_ts'] and block['end_ts'] <= hi:
+                    removed += block['count']
+                    continue
+                for t, v in zip(_unpack('q', block['ts']), _unpack('d', block['vals'])):
+                    if lo <= t <= hi:
+                        removed += 1
+                    else:
+                        kept.append((t, v))
+            if blocks:
+                conn.executemany(f"DELETE FROM {TS_TABLE} WHERE series = ? AND start_ts = ?",
+                                 [(series, b['start_ts']) for b in blocks])
+            if kept:
+                self._write_blocks(conn, series, kept)
+            if blocks:
+                self._rewind(conn, series, lo)
+                self.db._notify(TS_TABLE, 'delete', keys=(series,), since=lo)
+        return removed
+
+    @staticmethod
+    def _rewind(conn, series: str, timestamp: int):
+        """
+        已汇总区间内的原始点被修改时回退汇总进度，下次维护重算这些区间
+        不会回退到已清理的边界之前（那部分由维护时合并处理）
+        """
+        conn.execute(f'''
+            UPDATE {POLICY_TABLE} SET rolled_upto = MAX(?, COALESCE(pruned_before, ?))
+            WHERE series = ? AND rolled_upto > ?
+        ''', (timestamp, timestamp, series, timestamp))
+
+    def drop(self, series: str):
+        """删除整个序列（含汇总数据和保留策略）"""
+        with self.db.transaction() as conn:
+            for table in (TS_TABLE, ROLLUP_TABLE, POLICY_TABLE):
+                conn.execute(f"DELETE FROM {table} WHERE series = ?", (series,))
+
+    # ==================== 读取 ====================
+
+    @staticmethod
+    def _concat(blocks) -> Tuple:
+        """把若干块拼接为 (时间戳数组, 数值数组)"""
+        if np is not None:
+            if not blocks:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+            stamps = np.concatenate([np.frombuffer(b['ts'], dtype='<i8') for b in blocks])
+            values = np.concatenate([np.frombuffer(b['vals'], dtype='<f8') for b in blocks])
+            return stamps.astype(np.int64, copy=False), values.astype(np.float64, copy=False)
+
+        stamps, values = array('q'), array('d')
+        for b in blocks:
+            stamps.extend(_unpack('q', b['ts']))
+            values.extend(_unpack('d', b['vals']))
+        return stamps, values
+
+    def range(self, series: str, start: Optional[int] = None, end: Optional[int] = None) -> Tuple:
+        """
+        读取 [start, end] 区间内的点（按时间升序），None 表示不限
+
+        Returns:
+            (时间戳数组, 数值数组)，有 NumPy 时为 int64/float64 的 ndarray
+        """
+        lo = -(1 << 63) if start is None else int(start)
+        hi = (1 << 63) - 1 if end is None else int(end)
+        blocks = self.db.fetch_all(f'''
+            SELECT ts, vals FROM {TS_TABLE}
+            WHERE series = ? AND end_ts >= ? AND start_ts <= ?
+            ORDER BY start_ts
+        ''', (series, lo, hi))
+        stamps, values = self._concat(blocks)
+
+        # 首尾的块可能只有部分落在区间内
+        if np is not None:
+            i, j = np.searchsorted(stamps, lo, 'left'), np.searchsorted(stamps, hi, 'right')
+        else:
+            i, j = bisect.bisect_left(stamps, lo), bisect.bisect_right(stamps, hi)
+        return stamps[i:j], values[i:j]
+
+    def last(self, series: str, n: int) -> Tuple:
+        """读取最近的 n 个点（按时间升序）"""
+        blocks = []
+        total = 0
+        for block in self.db.iter_select(TS_TABLE, "count, ts, vals", where="series = ?",
+                                         where_params=(series,), order_by="start_ts DESC", batch_size=8):
+            blocks.append(block)
+            total += block['count']
+            if total >= n:
+                break
+        blocks.reverse()
+        stamps, values = self._concat(blocks)
+        if n <= 0:
+            return stamps[:0], values[:0]
+        return stamps[-n:], values[-n:]
+
+    def count(self, series: str) -> int:
+        """序列中的点数"""
+        row = self.db.fetch_one(f"SELECT COALESCE(SUM(count), 0) AS n FROM {TS_TABLE} WHERE series = ?",
+                                (series,))
+        return row['n']
+
+    def bounds(self, series: str) -> Optional[Tuple[int, int]]:
+        """序列的 (最早时间戳, 最晚时间戳)，包括已清理原始点但保留在汇总中的部分；序列为空返回 None"""
+        row = self.db.fetch_one(f'''
+            SELECT MIN(lo) AS lo, MAX(hi) AS hi FROM (
+                SELECT MIN(start_ts) AS lo, MAX(end_ts) AS hi FROM {TS_TABLE} WHERE series = ?
+                UNION ALL
+                SELECT MIN(first_ts), MAX(last_ts) FROM {ROLLUP_TABLE} WHERE series = ?
+            )
+        ''', (series, series))
+        if row is None or row['lo'] is None:
+            return None
+        return row['lo'], row['hi']
+
+    def series(self) -> List[str]:
+        """所有序列名"""
+        return [row['series'] for row in self.db.fetch_all(f"SELECT DISTINCT series FROM {TS_TABLE}")]
+
+    # ==================== 汇总与保留策略 ====================
+
+    def set_retention(self, series: str, raw_max_age: int,
+                      resolutions: Sequence[int] = DEFAULT_RESOLUTIONS):
+        """
+        设置序列的保留策略（可重复调用，已有的汇总进度保留）
+
+        Args:
+            raw_max_age: 原始点保留时长（秒），更早的点汇总后删除
+            resolutions: 汇总分辨率（秒），默认小时/天/周
+        """
+        resolutions = sorted(set(int(r) for r in resolutions))
+        self.db.execute(f'''
+            INSERT INTO {POLICY_TABLE} (series, raw_max_age, resolutions) VALUES (?, ?, ?)
+            ON CONFLICT(series) DO UPDATE SET
+                raw_max_age = excluded.raw_max_age, resolutions = excluded.resolutions
+        ''', (series, int(raw_max_age), json.dumps(resolutions)))
+
+    def get_retention(self, series: str) -> Optional[Dict[str, Any]]:
+        """序列的保留策略与汇总进度，未设置返回 None"""
+        row = self.db.fetch_one(f"SELECT * FROM {POLICY_TABLE} WHERE series = ?", (series,))
+        if row is None:
+            return None
+        policy = dict(row)
+        policy['resolutions'] = json.loads(policy['resolutions'])
+        return policy
+
+    def bucket_start(self, timestamp: int, resolution: int) -> int:
+        """时间戳所在汇总区间的起点；天按本地零点对齐，周从周一开始"""
+        shift = self.utc_offset + (3 * DAY if resolution % WEEK == 0 else 0)
+        return (timestamp + shift) // resolution * resolution - shift
+
+    def _bucketize(self, stamps, resolution: int):
+        if np is not None:
+            shift = self.utc_offset + (3 * DAY if resolution % WEEK == 0 else 0)
+            return (stamps + shift) // resolution * resolution - shift
+        return [self.bucket_start(t, resolution) for t in stamps]
+
+    def _raw_as_ohlc(self, stamps, values) -> Dict[str, Any]:
+        """把原始点看作每点一行的 OHLC"""
+        if np is not None:
+            return {'first_ts': stamps, 'last_ts': stamps, 'open': values, 'high': values,
+                    'low': values, 'close': values, 'count': np.ones(len(stamps), dtype=np.int64)}
+        return {'first_ts': list(stamps), 'last_ts': list(stamps), 'open': list(values),
+                'high': list(values), 'low': list(values), 'close': list(values),
+                'count': [1] * len(stamps)}
+
+    def _aggregate(self, rows: Dict[str, Any], resolution: int) -> Dict[str, Any]:
+        """
+        把按时间排序的 OHLC 行汇总到 resolution
+        每行必须整体落在一个目标区间内（原始点，或分辨率能整除 resolution 的汇总行）
+        """
+        buckets = self._bucketize(rows['first_ts'], resolution)
+        if np is not None:
+            n = len(buckets)
+            if not n:
+                return {col: np.empty(0, dtype=np.float64 if col in ('open', 'high', 'low', 'close') else np.int64)
+                        for col in OHLC_COLUMNS}
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            ends = np.r_[starts[1:], n] - 1
+            return {
+                'bucket': buckets[starts],
+                'first_ts': rows['first_ts'][starts],
+                'last_ts': rows['last_ts'][ends],
+                'open': rows['open'][starts],
+                'high': np.maximum.reduceat(rows['high'], starts),
+                'low': np.minimum.reduceat(rows['low'], starts),
+                'close': rows['close'][ends],
+                'count': np.add.reduceat(rows['count'], starts),
+            }
+
+        result = {col: [] for col in OHLC_COLUMNS}
+        for i, bucket in enumerate(buckets):
+            if result['bucket'] and result['bucket'][-1] == bucket:
+                result['last_ts'][-1] = rows['last_ts'][i]
+                result['high'][-1] = max(result['high'][-1], rows['high'][i])
+                result['low'][-1] = min(result['low'][-1], rows['low'][i])
+                result['close'][-1] = rows['close'][i]
+                result['count'][-1] += rows['count'][i]
+            else:
+                result['bucket'].append(bucket)
+                for col in OHLC_COLUMNS[1:]:
+                    result[col].append(rows[col][i])
+        return result
+
+    @staticmethod
+    def _concat_ohlc(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if np is not None:
+            return {col: np.concatenate([np.asarray(p[col]) for p in parts])
+                    for col in OHLC_COLUMNS[1:]}
+        return {col: [v for p in parts for v in p[col]] for col in OHLC_COLUMNS[1:]}
+
+    def _read_rollups(self, series: str, resolution: int, start: int, end: int) -> Dict[str, Any]:
+        """读取 [start, end) 区间内已保存的汇总行"""
+        rows = self.db.fetch_all(f'''
+            SELECT bucket, first_ts, last_ts, open, high, low, close, count FROM {ROLLUP_TABLE}
+            WHERE series = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+            ORDER BY bucket
+        ''', (series, resolution, start, end))
+        columns = {col: [row[col] for row in rows] for col in OHLC_COLUMNS}
+        if np is not None:
+            columns = {col: np.array(values, dtype=np.float64 if col in ('open', 'high', 'low', 'close') else np.int64)
+                       for col, values in columns.items()}
+        return columns
+
+    def resample(self, series: str, start: Optional[int], end: Optional[int], resolution: int) -> Dict[str, Any]:
+        """
+        按 resolution（秒）读取 OHLC 数据
+
+        自动选择能整除 resolution 的最粗汇总；最近尚未汇总的部分从原始点实时汇总。
+        Returns:
+            {'bucket', 'first_ts', 'last_ts', 'open', 'high', 'low', 'close', 'count'}，
+            每列为按 bucket 升序的数组
+        """
+        lo = self.bucket_start(-(1 << 62) if start is None else int(start), resolution)
+        hi = (1 << 62) if end is None else int(end)
+
+        policy = self.get_retention(series)
+        usable = [r for r in (policy['resolutions'] if policy else ()) if resolution % r == 0]
+        if not usable or policy['rolled_upto'] is None:
+            stamps, values = self.range(series, lo, hi)
+            return self._aggregate(self._raw_as_ohlc(stamps, values), resolution)
+
+        rollup_res = max(usable)
+        # 汇总只覆盖 rolled_upto 之前完整的区间，之后的部分用原始点
+        split = self.bucket_start(policy['rolled_upto'], rollup_res)
+        parts = []
+        if lo < split:
+            parts.append(self._read_rollups(series, rollup_res, lo, min(split, hi + 1)))
+        if hi >= split:
+            stamps, values = self.range(series, max(lo, split), hi)
+            parts.append(self._raw_as_ohlc(stamps, values))
+        return self._aggregate(self._concat_ohlc(parts), resolution)
+
+    def _write_rollups(self, conn, series: str, resolution: int, rollups: Dict[str, Any], merge: bool = False):
+        """保存汇总行；merge 时与已有行合并（用于补写到已清理区间的点）"""
+        rows = list(zip(*(rollups[col].tolist() if np is not None else rollups[col] for col in OHLC_COLUMNS)))
+        if merge:
+            merged = []
+            for bucket, first_ts, last_ts, open_, high, low, close, count in rows:
+                old = conn.execute(f'''
+                    SELECT first_ts, last_ts, open, high, low, close, count FROM {ROLLUP_TABLE}
+                    WHERE series = ? AND resolution = ? AND bucket = ?
+                ''', (series, resolution, bucket)).fetchone()
+                if old is not None:
+                    if old['first_ts'] < first_ts:
+                        first_ts, open_ = old['first_ts'], old['open']
+                    if old['last_ts'] > last_ts:
+                        last_ts, close = old['last_ts'], old['close']
+                    high, low = max(high, old['high']), min(low, old['low'])
+                    count += old['count']
+                merged.append((bucket, first_ts, last_ts, open_, high, low, close, count))
+            rows = merged
+        conn.executemany(f'''
+            INSERT OR REPLACE INTO {ROLLUP_TABLE}
+                (series, resolution, bucket, first_ts, last_ts, open, high, low, close, count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(series, resolution) + row for row in rows])
+
+    def _maintain(self, series: str, policy: Dict[str, Any], now: int) -> int:
+        """对单个序列执行汇总和清理，返回删除的原始点数"""
+        resolutions = policy['resolutions']
+        coarsest = max(resolutions)
+        rolled_upto, pruned_before = policy['rolled_upto'], policy['pruned_before']
+
+        with self.db.transaction() as conn:
+            # 补写到已清理区间的点：原始数据已不完整，只能与已有汇总合并
+            if pruned_before is not None:
+                stamps, values = self.range(series, None, pruned_before - 1)
+                if len(stamps):
+                    raw = self._raw_as_ohlc(stamps, values)
+                    for resolution in resolutions:
+                        self._write_rollups(conn, series, resolution, self._aggregate(raw, resolution), merge=True)
+
+            # 从最粗区间的边界开始重算，保证跨越上次进度的区间完整
+            start = None if rolled_upto is None else self.bucket_start(rolled_upto, coarsest)
+            stamps, values = self.range(series, start, now)
+            if len(stamps):
+                raw = self._raw_as_ohlc(stamps, values)
+                for resolution in resolutions:
+                    self._write_rollups(conn, series, resolution, self._aggregate(raw, resolution))
+                rolled_upto = int(stamps[-1]) + 1
+
+            # 只删除整个最粗区间都已汇总且超出保留期的原始点
+            removed = 0
+            if rolled_upto is not None:
+                cutoff = self.bucket_start(min(now - policy['raw_max_age'], rolled_upto), coarsest)
+                if pruned_before is None or cutoff > pruned_before:
+                    removed = self.delete_range(series, None, cutoff - 1)
+                    pruned_before = cutoff
+                elif pruned_before is not None:
+                    removed = self.delete_range(series, None, pruned_before - 1)
+
+            conn.execute(f'''
+                UPDATE {POLICY_TABLE} SET rolled_upto = ?, pruned_before = ?, last_run = ? WHERE series = ?
+            ''', (rolled_upto, pruned_before, datetime.now().isoformat(), series))
+        return removed
+
+    def run_maintenance(self, now: Optional[int] = None) -> Dict[str, int]:
+        """
+        对所有设置了保留策略的序列执行汇总、清理，并回收空闲页
+        耗时与上次维护以来的新增数据量成正比，适合在后台线程定期调用
+
+        Returns:
+            {序列名: 删除的原始点数}
+        """
+        now = int(time.time()) if now is None else int(now)
+        removed = {}
+        for row in self.db.fetch_all(f"SELECT series FROM {POLICY_TABLE}"):
+            policy = self.get_retention(row['series'])
+            removed[row['series']] = self._maintain(row['series'], policy, now)
+
+        if any(removed.values()):
+            self.db.reclaim_space()
+        return removed
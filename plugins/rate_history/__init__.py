@@ -3,6 +3,7 @@
 显示汇率变化趋势，支持鼠标交互操作
 """
 from core.plugin_system import BasePlugin
+from core.timeseries import DAY, TS_TABLE
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QButtonGroup, QSpacerItem, QSizePolicy
 from PyQt6.QtCore import Qt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
@@ -22,6 +23,15 @@ class RateHistoryPlugin(BasePlugin):
     PLUGIN_AUTHOR = "MHTools"
     PLUGIN_DESCRIPTION = "汇率历史图表，支持鼠标交互和均线显示"
 
+    # 时间序列名
+    SERIES = "rate_history"
+
+    # 最长均线周期，加载数据时多取这么多天，使首个显示点的均线也完整
+    MA_MAX = 30
+
+    # 原始点保留天数，更早的数据只保留小时/日/周汇总
+    RAW_RETENTION_DAYS = 90
+
     # 颜色配置
     COLORS = {
         'line': '#26a69a',    # 价格线绿色
@@ -36,42 +46,36 @@ class RateHistoryPlugin(BasePlugin):
 
     def __init__(self, db, main_window):
         super().__init__(db, main_window)
+        # 后台准备好的首屏数据，create_ui 时直接绘制
+        self._initial_data = None
+
+    def prepare(self):
+        """后台线程中执行 - 初始化时间序列并预先加载默认周期的数据"""
         self._init_database()
-        self._create_ui()
         self._generate_test_data()
-        self._update_chart()
+        self._initial_data = self._load_data()
+
+    def create_ui(self):
+        """界面线程中执行 - 创建界面并绘制预加载的数据"""
+        self._create_ui()
+        self._draw_chart(self._initial_data)
+        self._initial_data = None
+        # 汇率写入（含顶部全局栏修改汇率）后只增量加载变化的尾部
+        self.subscribe_changes(self._on_data_changed, TS_TABLE)
 
     def _init_database(self):
-        """初始化数据库表（幂等操作）"""
-        try:
-            existing = self.db.select_one("sqlite_master",
-                where="type=? AND name=?",
-                where_params=("table", "rate_history"))
-            if existing:
-                return
-        except Exception:
-            pass
-
-        try:
-            self.db.execute_sql("""
-                CREATE TABLE IF NOT EXISTS rate_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL UNIQUE,
-                    price REAL NOT NULL
-                )
-            """)
-        except Exception:
-            try:
-                self.db.execute_sql("DROP TABLE IF EXISTS rate_history")
-                self.db.execute_sql("""
-                    CREATE TABLE rate_history (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        date TEXT NOT NULL UNIQUE,
-                        price REAL NOT NULL
-                    )
-                """)
-            except Exception as e:
-                print(f"创建 rate_history 表失败: {e}")
+        """初始化时间序列；旧版 rate_history 表中的数据首次启动时迁移过来（保留原表）"""
+        self._ts = self.db.timeseries
+        self._ts.set_retention(self.SERIES, raw_max_age=self.RAW_RETENTION_DAYS * DAY)
+        if self._ts.bounds(self.SERIES) or not self.db.get_table_schema("rate_history"):
+            return
+
+        points = [
+            (int(datetime.strptime(row['date'], "%Y-%m-%d").timestamp()), row['price'])
+            for row in self.db.iter_select("rate_history", "date, price")
+        ]
+        self._ts.extend(self.SERIES, points)
+        print(f"汇率历史已迁移到时间序列存储: {len(points)} 条")
 
     def _create_ui(self):
         """创建UI"""
@@ -160,73 +164,109 @@ class RateHistoryPlugin(BasePlugin):
         self._pan_start_x = None
         self._last_xlim = None
         self._current_period = 7
+        # 当前图表的完整数据（含均线前置数据），用于增量刷新
+        self._data = None
 
     def _generate_test_data(self):
         """生成测试数据"""
-        existing = self.db.select("rate_history", order_by="date DESC", limit=1)
-        if existing:
+        if self._ts.bounds(self.SERIES):
             return
 
-        # 生成60天随机测试数据
+        # 生成60天随机测试数据，时间戳为当天零点
         base_rate = 7.2
         data_count = 60
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
 
-        for i in range(data_count):
-            date = datetime.now() - timedelta(days=data_count - i)
-            price = round(base_rate + np.random.uniform(-0.3, 0.3), 4)
-
-            self.db.insert("rate_history", {
-                "date": date.strftime("%Y-%m-%d"),
-                "price": price
-            })
+        self._ts.extend(self.SERIES, [
+            (int((today - timedelta(days=data_count - i)).timestamp()),
+             round(base_rate + np.random.uniform(-0.3, 0.3), 4))
+            for i in range(data_count)
+        ])
 
     def _load_data(self, days=7):
-        """加载指定天数的数据"""
-        data = self.db.select(
-            "rate_history",
-            order_by="date ASC",
-            limit=days
-        )
-        return data if data else []
+        """
+        加载最近 days 天的日线收盘价及计算均线所需的前置数据（在数据库工作线程中执行）
+        已汇总的日期直接读取日线汇总，不扫描原始点
+
+        Returns:
+            (日期时间戳数组, 收盘价数组, 首个显示日期)，无数据时为 None
+        """
+        bounds = self._ts.bounds(self.SERIES)
+        if bounds is None:
+            return None
+        last_day = self._ts.bucket_start(bounds[1], DAY)
+        start = last_day - (days + self.MA_MAX - 2) * DAY
+        bars = self._ts.resample(self.SERIES, start, bounds[1], DAY)
+        return bars['bucket'], bars['close'], last_day - (days - 1) * DAY
+
+    def _load_tail(self, since):
+        """加载 since 所在日及之后的日线（在数据库工作线程中执行）"""
+        return self._ts.resample(self.SERIES, self._ts.bucket_start(since, DAY), None, DAY)
+
+    def _merge_tail(self, bars):
+        """把新加载的尾部日线并入当前数据并重绘"""
+        if self._data is None or not len(bars['bucket']):
+            self._update_chart()
+            return
+        stamps, prices, _ = self._data
+        keep = int(np.searchsorted(stamps, bars['bucket'][0]))
+        stamps = np.concatenate([stamps[:keep], bars['bucket']])
+        prices = np.concatenate([np.asarray(prices[:keep], dtype=np.float64), bars['close']])
+
+        last_day = int(stamps[-1])
+        first_loaded = int(np.searchsorted(stamps, last_day - (self._current_period + self.MA_MAX - 2) * DAY))
+        self._draw_chart((stamps[first_loaded:], prices[first_loaded:],
+                          last_day - (self._current_period - 1) * DAY))
+
+    def _on_data_changed(self, event):
+        """时间序列变更 - 只改动了最后一天及以后时增量加载，否则整体重新加载"""
+        if self.SERIES not in event.keys:
+            return
+        if (self._data is None or event.since is None
+                or event.since < self._data[0][-1] or event.op != 'insert'):
+            self._update_chart()
+            return
+        self.async_db.submit(self._load_tail, event.since, callback=self._merge_tail)
 
     def _calculate_ma(self, prices, period):
-        """计算移动平均线"""
-        if len(prices) < period:
-            return [np.nan] * len(prices)
-        ma_values = []
-        for i in range(len(prices)):
-            if i < period - 1:
-                ma_values.append(np.nan)
-            else:
-                ma_values.append(np.mean(prices[i-period+1:i+1]))
-        return ma_values
+        """计算移动平均线，前 period-1 个点为 NaN"""
+        ma = np.full(len(prices), np.nan)
+        if len(prices) >= period:
+            ma[period - 1:] = np.convolve(prices, np.ones(period) / period, mode='valid')
+        return ma
 
     def _update_chart(self, days=None):
-        """更新图表"""
+        """更新图表 - 在数据库工作线程加载数据，完成后回到界面线程绘制"""
         if days is None:
             days = self._current_period
 
-        data = self._load_data(days)
-        if not data:
+        self.async_db.submit(self._load_data, days, callback=self._draw_chart)
+
+    def _draw_chart(self, data):
+        """绘制图表 - data 为 _load_data 的结果"""
+        self._data = data
+        if data is None or not len(data[0]):
+            self._data = None
             self._ax.clear()
             self._ax.text(0.5, 0.5, "暂无数据", ha='center', va='center', transform=self._ax.transAxes)
             self._canvas.draw()
             return
 
-        # 提取数据
-        dates = [datetime.strptime(row[1], "%Y-%m-%d") for row in data]
-        prices = [row[2] for row in data]
-
-        # 计算均线
+        # 均线基于包含前置数据的完整序列计算，再截取要显示的部分
+        stamps, prices, first_shown = data
+        prices = np.asarray(prices, dtype=np.float64)
         ma7 = self._calculate_ma(prices, 7)
         ma15 = self._calculate_ma(prices, 15)
         ma30 = self._calculate_ma(prices, 30)
+        shown = slice(int(np.searchsorted(stamps, first_shown)), None)
+        stamps, prices = stamps[shown], prices[shown]
+        ma7, ma15, ma30 = ma7[shown], ma15[shown], ma30[shown]
 
         # 清除图表
         self._ax.clear()
         self._ax.set_facecolor(self.COLORS['bg'])
 
-        x_positions = np.arange(len(dates))
+        x_positions = np.arange(len(stamps))
 
         # 绘制价格折线
         self._ax.plot(x_positions, prices, color=self.COLORS['line'], linewidth=2, label='价格', alpha=0.9)
@@ -240,14 +280,16 @@ class RateHistoryPlugin(BasePlugin):
         self._ax.plot(x_positions, ma30, color=self.COLORS['ma30'], linewidth=1.5, label='MA30', alpha=0.9)
 
         # 设置坐标轴
-        self._ax.set_xlim(-0.5, len(dates) - 0.5)
-        y_min = min(prices) * 0.998
-        y_max = max(prices) * 1.002
+        self._ax.set_xlim(-0.5, len(stamps) - 0.5)
+        y_min = prices.min() * 0.998
+        y_max = prices.max() * 1.002
         self._ax.set_ylim(y_min, y_max)
 
         # 格式化x轴日期
-        self._ax.set_xticks(x_positions[::max(1, len(dates)//7)])
-        self._ax.set_xticklabels([d.strftime("%m-%d") for d in dates[::max(1, len(dates)//7)]], rotation=45)
+        self._ax.set_xticks(x_positions[::max(1, len(stamps)//7)])
+        # 只为刻度位置做时间戳到日期的转换
+        self._ax.set_xticklabels([datetime.fromtimestamp(t).strftime("%m-%d")
+                                  for t in stamps[::max(1, len(stamps)//7)]], rotation=45)
 
         # 图例
         legend_elements = [
@@ -267,7 +309,7 @@ class RateHistoryPlugin(BasePlugin):
 
         # 保存当前数据引用用于tooltip
         self._chart_data = {
-            'dates': dates,
+            'stamps': stamps,
             'prices': prices,
             'ma7': ma7,
             'ma15': ma15,
@@ -293,9 +335,9 @@ class RateHistoryPlugin(BasePlugin):
             return
 
         idx = int(round(x))
-        if 0 <= idx < len(self._chart_data['dates']):
+        if 0 <= idx < len(self._chart_data['stamps']):
             data = self._chart_data
-            date_str = data['dates'][idx].strftime("%Y-%m-%d")
+            date_str = datetime.fromtimestamp(data['stamps'][idx]).strftime("%Y-%m-%d")
             price = data['prices'][idx]
 
             ma7_val = data['ma7'][idx]
@@ -337,7 +379,7 @@ class RateHistoryPlugin(BasePlugin):
 
         if new_range < 3:
             return
-        if new_range > len(self._chart_data['dates']) * 1.5:
+        if new_range > len(self._chart_data['stamps']) * 1.5:
             return
 
         new_xlim = [x_data - new_range * (x_data - current_xlim[0]) / x_range,
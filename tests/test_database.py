@@ -0,0 +1,110 @@
+"""
+DatabaseManager 回归测试
+
+运行: python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import DatabaseManager
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """每个测试使用独立的临时数据库"""
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        DatabaseManager._instance = None
+        self.db = DatabaseManager(os.path.join(self._dir, "test.db"))
+        self.db.ensure_table("t", {"v": "INTEGER"})
+
+    def tearDown(self):
+        self.db.close()
+        DatabaseManager._instance = None
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def run_in_thread(self, fn, wait: float = None):
+        """在另一个线程（另一个连接）中执行 fn，返回 (线程, 异常列表)"""
+        errors = []
+
+        def target():
+            try:
+                fn()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                self.db.release_connection()
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join(wait)
+        return thread, errors
+
+
+class TransactionTest(DatabaseTestCase):
+
+    def test_read_then_write_after_concurrent_commit(self):
+        """事务先读后写，期间其他连接尝试提交写入：两边都应成功，不出现 database is locked"""
+        self.db.insert("t", {"v": 1})
+        with self.db.transaction():
+            n = self.db.count("t")
+            # 另一线程的写入等待本事务提交（旧实现中它会先提交，使下面的写入失败）
+            thread, errors = self.run_in_thread(lambda: self.db.insert("t", {"v": 0}), wait=0.2)
+            self.db.insert("t", {"v": n + 1})
+        thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.db.count("t"), 3)
+
+
+class CacheVisibilityTest(DatabaseTestCase):
+
+    def test_transaction_reads_own_global_write(self):
+        """事务中写入后，即使其他线程把已提交的旧值读进缓存，本线程仍读到自己的新值"""
+        self.db.set_global_data("x", 1)
+        with self.db.transaction():
+            self.db.set_global_data("x", 5)
+            self.run_in_thread(lambda: self.assertEqual(self.db.get_global_data("x"), 1))
+            self.assertEqual(self.db.get_global_data("x"), 5)
+            self.assertEqual(self.db.get_many(["x"]), {"x": 5})
+        self.assertEqual(self.db.get_global_data("x"), 5)
+
+    def test_transaction_reads_own_dynamic_write(self):
+        self.db.set_dynamic_data("c", "k", "old")
+        with self.db.transaction():
+            self.db.set_dynamic_data("c", "k", "new")
+            self.run_in_thread(lambda: self.db.get_dynamic_data("c", "k"))
+            self.assertEqual(self.db.get_dynamic_data("c", "k"), "new")
+        self.assertEqual(self.db.get_dynamic_data("c", "k"), "new")
+
+    def test_group_commit_reads_own_new_key(self):
+        """组提交挂起期间，其他线程读过（缓存为不存在）的新键，写入线程仍能读到"""
+        self.db.set_group_commit(60)
+        try:
+            self.db.set_global_data("fresh", {"a": 1})
+            self.run_in_thread(lambda: self.db.get_global_data("fresh"))
+            self.assertEqual(self.db.get_global_data("fresh"), {"a": 1})
+        finally:
+            self.db.set_group_commit(None)
+        self.assertEqual(self.db.get_global_data("fresh"), {"a": 1})
+
+
+class CategoryPrefixTest(DatabaseTestCase):
+
+    def test_prefix_ending_with_max_code_point(self):
+        top = chr(0x10FFFF)
+        for key in ("a", "a" + top, "a" + top + "x", "b", top, top + top):
+            self.db.set_dynamic_data("c", key, key)
+        self.assertEqual(list(self.db.get_category_prefix("c", "a" + top)), ["a" + top, "a" + top + "x"])
+        self.assertEqual(list(self.db.get_category_prefix("c", top)), [top, top + top])
+        self.assertEqual(list(self.db.get_category_prefix("c", top + top)), [top + top])
+
+
+if __name__ == "__main__":
+    unittest.main()